@@ -0,0 +1,247 @@
+"""Command-line interface to the 5/1 ARM vs fixed-rate Monte Carlo engine.
+
+Runs without a display, for example:
+
+    python -m arm_cli --loan-amount 400000 --fixed-rate 6.5 --num-simulations 100000 --json
+
+Paths saved with --store can be plotted later without simulating them again:
+
+    python -m arm_cli --plot-store DIR
+"""
+import argparse
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+from arm_engine import (calculate_fixed_cost, calculate_fixed_horizon_costs, fixed_cost_rate_derivative,
+                        format_horizons, format_precision, format_results, format_sensitivities, json_ready,
+                        run_arm_simulation_incremental, sampling_efficiency, sensitivity_rows, standard_errors,
+                        summarize_arm_costs, validate_inputs)
+from arm_progress import ProgressReporter
+from arm_sampling import SAMPLING_MODES, check_sampling_mode
+from instrumentation import Instrumentation, RunProfile
+from path_store import PathStore, create_path_store
+from rate_data import HistoricalRateModel, load_historical_rates
+from result_cache import ResultCache, simulation_key
+from synthetic_rates import MEAN_RATE, MEAN_REVERSION, VOLATILITY, SyntheticRateModel
+
+# Options that do not change the results, left out of the parameters in the JSON output
+OUTPUT_ONLY_OPTIONS = ("json", "workers", "progress", "streaming", "no_cache", "diagnostics", "profile", "store",
+                       "plot_store")
+
+# Name of the figure --plot-store saves in the store directory
+STORE_PLOT_FILE = "plot.png"
+
+
+def build_parser():
+    """Argument parser with the same parameters and defaults as the GUI entry fields."""
+    parser = argparse.ArgumentParser(
+        prog="python -m arm_cli",
+        description="Compare a 5/1 ARM against a fixed-rate mortgage with a Monte Carlo simulation.")
+    parser.add_argument("--loan-amount", type=float, default=300000, help="loan amount ($)")
+    parser.add_argument("--loan-term", type=int, default=30, help="loan term (years)")
+    parser.add_argument("--fixed-rate", type=float, default=6.75, help="fixed rate (%%)")
+    parser.add_argument("--arm-rate", type=float, default=6.25, help="5/1 ARM initial rate (%%)")
+    parser.add_argument("--arm-margin", type=float, default=2.75, help="ARM margin (%%)")
+    parser.add_argument("--initial-cap", type=float, default=2, help="initial adjustment cap (%%)")
+    parser.add_argument("--annual-cap", type=float, default=2, help="annual adjustment cap (%%)")
+    parser.add_argument("--lifetime-cap", type=float, default=5, help="lifetime cap (%%)")
+    parser.add_argument("--num-simulations", type=int, default=1000,
+                        help="number of Monte Carlo simulations")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of CPUs)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--data", choices=["live", "embedded", "synthetic"], default="live",
+                        help="historical index data to sample from (default: live, falling back to embedded)")
+    parser.add_argument("--synthetic-histories", type=int, metavar="N", default=None,
+                        help="instead of bootstrapping the data, follow N synthetic index histories that start "
+                             "at the current index rate")
+    parser.add_argument("--mean-rate", type=float, default=MEAN_RATE,
+                        help="long-run index rate of the synthetic histories (%%)")
+    parser.add_argument("--volatility", type=float, default=VOLATILITY,
+                        help="annual volatility of the synthetic histories (%%)")
+    parser.add_argument("--mean-reversion", type=float, default=MEAN_REVERSION,
+                        help="monthly mean reversion of the synthetic histories")
+    parser.add_argument("--shock-probability", type=float, default=0.0,
+                        help="monthly probability of a synthetic history entering a high- or low-rate regime")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default="random",
+                        help="how index changes are drawn: independently (random, the default) or with a "
+                             "variance-reduction mode (antithetic, stratified, or scrambled Sobol, which needs SciPy)")
+    parser.add_argument("--sensitivities", action="store_true",
+                        help="also estimate how the mean ARM cost changes with the ARM rate, margin and caps, "
+                             "from pathwise derivatives in the same simulation")
+    parser.add_argument("--median-tolerance", type=float, default=None,
+                        help="stop early once the standard error of the median cost is below this ($)")
+    parser.add_argument("--prob-tolerance", type=float, default=None,
+                        help="stop early once the standard error of the probability the ARM is cheaper "
+                             "is below this (percentage points)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="keep only bounded-memory statistics (for very large path counts)")
+    parser.add_argument("--store", metavar="DIR",
+                        help="write every simulated rate path with its monthly balances and payments to "
+                             "memory-mapped .npy files in DIR")
+    parser.add_argument("--plot-store", metavar="DIR",
+                        help="instead of simulating, plot the paths saved in DIR with --store and save the figure "
+                             f"as DIR/{STORE_PLOT_FILE}")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not reuse or store results of seeded runs")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="report per-stage timings (in the JSON output with --json, else on stderr)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="profile the run in a single process with cProfile and tracemalloc, save the "
+                             "cProfile data to PATH and print a summary on stderr")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--progress", action="store_true", help="report progress on stderr")
+    return parser
+
+
+def plot_path_store(directory):
+    """Draw the result plots of every path in a store made with --store and save them in
+    the store directory. Returns the path of the image.
+    """
+    # Imported here so runs that do not plot do not need matplotlib
+    from matplotlib.figure import Figure
+
+    from arm_plots import ComparisonFigure, PlotData
+
+    store = PathStore(directory)
+    if not len(store):
+        raise ValueError(f"No paths were written to the store in {directory}")
+    parameters = store.parameters
+    fixed_cost = calculate_fixed_cost(parameters['loan_amount'], parameters['fixed_rate'], store.loan_term)
+    summary = summarize_arm_costs(fixed_cost, store.costs)
+    data = PlotData.from_path_store(store, fixed_cost, parameters['fixed_rate'], parameters['arm_rate'], summary)
+
+    fig = Figure(figsize=(10, 8), dpi=100)
+    ComparisonFigure(fig).update(data)
+    path = os.path.join(directory, STORE_PLOT_FILE)
+    fig.savefig(path)
+    return path
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.plot_store is not None:
+        try:
+            path = plot_path_store(args.plot_store)
+        except (OSError, ValueError) as e:
+            parser.error(f"Cannot plot the path store: {e}")
+        print(f"Saved the plots of {args.plot_store} to {path}", file=sys.stderr)
+        return 0
+
+    try:
+        validate_inputs(args.loan_amount, args.loan_term, args.fixed_rate, args.arm_rate, args.arm_margin,
+                        args.initial_cap, args.annual_cap, args.lifetime_cap, args.num_simulations)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers <= 0:
+        parser.error("Number of worker processes must be positive")
+    if any(tolerance is not None and tolerance <= 0 for tolerance in (args.median_tolerance, args.prob_tolerance)):
+        parser.error("Standard error tolerances must be positive")
+    if args.synthetic_histories is not None and args.synthetic_histories <= 0:
+        parser.error("Number of synthetic histories must be positive")
+    try:
+        check_sampling_mode(args.sampling)
+    except ValueError as e:
+        parser.error(str(e))
+
+    instrumentation = Instrumentation()
+
+    # Status messages go to stderr so stdout only holds the results
+    with instrumentation.stage("data loading"):
+        historical_rates = load_historical_rates(args.data, status=lambda message: print(message, file=sys.stderr))
+        rate_model = HistoricalRateModel(historical_rates)
+        if args.synthetic_histories is not None:
+            rate_model = SyntheticRateModel.generate(
+                args.synthetic_histories, args.loan_term, rate_model.current_index_rate, seed=args.seed,
+                mean_rate=args.mean_rate, volatility=args.volatility, mean_reversion=args.mean_reversion,
+                shock_probability=args.shock_probability)
+
+    progress = None
+    if args.progress:
+        progress = ProgressReporter(0.5, lambda done, total, message: print(message, file=sys.stderr))
+
+    # A profiled run stays in this process so cProfile sees all of it
+    profile = RunProfile() if args.profile else None
+    num_workers = 1 if profile is not None else args.workers
+
+    with profile if profile is not None else nullcontext():
+        fixed_cost = calculate_fixed_cost(args.loan_amount, args.fixed_rate, args.loan_term)
+        fixed_horizon_costs = calculate_fixed_horizon_costs(args.loan_amount, args.fixed_rate, args.loan_term)
+        # Seeded runs are reproducible, so their results can be reused. Storing the
+        # paths needs them simulated again.
+        cache = None
+        run = None
+        if args.seed is not None and not args.no_cache and args.store is None:
+            cache = ResultCache()
+            cache_key = simulation_key(
+                args.loan_amount, args.loan_term, args.fixed_rate, args.arm_rate, args.arm_margin, args.initial_cap,
+                args.annual_cap, args.lifetime_cap, args.num_simulations, args.seed, rate_model.fingerprint,
+                median_tolerance=args.median_tolerance, prob_tolerance=args.prob_tolerance, streaming=args.streaming,
+                sampling=args.sampling, sensitivities=args.sensitivities)
+            run = cache.get(cache_key)
+
+        if run is None:
+            if args.store is not None:
+                create_path_store(
+                    args.store, args.num_simulations, args.loan_term, loan_amount=args.loan_amount,
+                    fixed_rate=args.fixed_rate, arm_rate=args.arm_rate, arm_margin=args.arm_margin,
+                    initial_cap=args.initial_cap, annual_cap=args.annual_cap, lifetime_cap=args.lifetime_cap,
+                    seed=args.seed, data=rate_model.fingerprint)
+            with instrumentation.stage("simulation"):
+                run = run_arm_simulation_incremental(
+                    fixed_cost, args.loan_amount, args.loan_term, args.arm_rate, args.arm_margin, args.initial_cap,
+                    args.annual_cap, args.lifetime_cap, args.num_simulations, rate_model, num_workers, args.seed,
+                    progress, args.median_tolerance, args.prob_tolerance, streaming=args.streaming,
+                    instrumentation=instrumentation, store_directory=args.store, sampling=args.sampling,
+                    fixed_horizon_costs=fixed_horizon_costs, sensitivities=args.sensitivities)
+            if cache is not None:
+                cache.put(cache_key, run)
+        with instrumentation.stage("results"):
+            summary = run.statistics()
+            fixed_rate_derivative = fixed_cost_rate_derivative(args.loan_amount, args.fixed_rate, args.loan_term)
+
+    if profile is not None:
+        profile.dump_stats(args.profile)
+        print(profile.report(), file=sys.stderr)
+
+    if args.json:
+        parameters = {name: value for name, value in vars(args).items() if name not in OUTPUT_ONLY_OPTIONS}
+        median_error, prob_error = standard_errors(run.summary, args.sampling)
+        convergence = {
+            'stop_reason': run.stop_reason,
+            'simulations_run': run.num_simulations,
+            'median_standard_error': median_error,
+            'prob_standard_error': prob_error,
+            'block_standard_errors': run.summary.replicates.standard_errors(),
+            'sampling_efficiency': sampling_efficiency(run.summary),
+        }
+        output = {'parameters': parameters, 'results': summary, 'convergence': convergence,
+                  'horizons': run.summary.horizons.rows(args.sampling)}
+        if args.sensitivities:
+            output['sensitivities'] = sensitivity_rows(run.summary.sensitivities, fixed_rate_derivative, args.sampling)
+        if args.diagnostics:
+            output['diagnostics'] = instrumentation.snapshot()
+        json.dump(json_ready(output), sys.stdout, indent=2, allow_nan=False)
+        print()
+    else:
+        print(format_results(args.fixed_rate, args.arm_rate, summary))
+        if run.stop_reason != 'completed' or args.sampling != "random":
+            print()
+            print(format_precision(run.summary, run.stop_reason, args.sampling))
+        print()
+        print("If the loan is repaid (sold or refinanced) after:")
+        print(format_horizons(run.summary.horizons, args.sampling))
+        if args.sensitivities:
+            print()
+            print(format_sensitivities(run.summary.sensitivities, fixed_rate_derivative, args.sampling))
+        if args.diagnostics:
+            print(instrumentation.format_table(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
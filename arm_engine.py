@@ -0,0 +1,1061 @@
+"""Monte Carlo engine comparing a 5/1 ARM against a fixed-rate mortgage.
+
+Pure functions with no GUI or plotting dependencies.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+import numpy as np
+
+import arm_kernels
+from arm_sampling import SAMPLING_BLOCK_SIZE, empirical_draws, sampling_uniforms
+from arm_stats import HorizonSummary, SensitivitySummary, StreamingCostSummary
+from instrumentation import Instrumentation, timed
+from path_store import finish_path_store, write_path_chunk
+
+# Number of paths simulated per batch in run_simulation. Each batch draws from its
+# own random stream, so results for a given seed depend on this but not on the
+# number of worker processes.
+SIMULATION_CHUNK_SIZE = 10000
+
+# Chunk size for Sobol sampling: whole sampling blocks, so that only the last block
+# of a run can fall short of the power of two that keeps a Sobol point set balanced
+SOBOL_CHUNK_SIZE = SIMULATION_CHUNK_SIZE // SAMPLING_BLOCK_SIZE * SAMPLING_BLOCK_SIZE
+
+# Every Nth simulated rate path is kept for visualization
+RATE_PATH_SAMPLE_INTERVAL = 50
+
+# Runs that stop on convergence simulate at least this many paths first
+MIN_CONVERGENCE_PATHS = 20000
+
+# ARM inputs (all in %) whose pathwise sensitivities arm_cost_sensitivities computes
+SENSITIVITY_PARAMETERS = ('arm_initial_rate', 'arm_margin', 'initial_cap', 'annual_cap', 'lifetime_cap')
+
+
+def calculate_fixed_payment(principal, annual_rate, years):
+    """Calculate the monthly payment for a fixed-rate mortgage."""
+    monthly_rate = annual_rate / 100 / 12
+    num_payments = years * 12
+
+    if monthly_rate == 0:
+        return principal / num_payments
+
+    monthly_payment = principal * (monthly_rate * (1 + monthly_rate) ** num_payments) / ((1 + monthly_rate) ** num_payments - 1)
+    return monthly_payment
+
+
+def calculate_fixed_cost(principal, annual_rate, years):
+    """Calculate total cost of a fixed-rate mortgage."""
+    monthly_payment = calculate_fixed_payment(principal, annual_rate, years)
+    return monthly_payment * 12 * years
+
+
+def calculate_fixed_horizon_costs(principal, annual_rate, years):
+    """Cost of a fixed-rate mortgage repaid at the end of each year: the payments so far
+    plus the remaining balance. Returns an array of length years whose last entry is
+    calculate_fixed_cost.
+    """
+    monthly_rate = annual_rate / 100 / 12
+    monthly_payment = calculate_fixed_payment(principal, annual_rate, years)
+    months = 12 * np.arange(1, years + 1)
+
+    if monthly_rate == 0:
+        balances = principal - monthly_payment * months
+    else:
+        growth = (1 + monthly_rate) ** months
+        balances = principal * growth - monthly_payment * (growth - 1) / monthly_rate
+    balances[-1] = 0  # Paid off, up to rounding
+    return monthly_payment * months + balances
+
+
+def fixed_cost_rate_derivative(principal, annual_rate, years):
+    """Change in calculate_fixed_cost per percentage point of annual_rate (exact derivative)."""
+    monthly_rate = annual_rate / 100 / 12
+    num_payments = years * 12
+    if monthly_rate == 0:
+        payment_derivative = (num_payments + 1) / (2 * num_payments)
+    else:
+        growth = (1 + monthly_rate) ** num_payments
+        growth_derivative = num_payments * growth / (1 + monthly_rate)
+        payment_derivative = (growth * (growth - 1) - monthly_rate * growth_derivative) / (growth - 1) ** 2
+    return principal * payment_derivative * num_payments / 1200
+
+
+def simulate_arm_rates(rate_model, initial_rate, margin, initial_cap, annual_cap, lifetime_cap, years=30):
+    """Simulate future ARM rates based on historical patterns.
+    rate_model is a HistoricalRateModel, or None to keep the initial rate.
+    """
+    # First 5 years are at the fixed initial rate
+    annual_rates = [initial_rate] * 5
+
+    # For the remaining years, simulate rates based on historical changes
+    if rate_model is not None and rate_model.annual_changes is not None:
+        # Randomly sample from historical changes
+        num_remaining_years = years - 5
+        sampled_changes = np.random.choice(rate_model.annual_changes, size=num_remaining_years, replace=True)
+
+        # Current index rate (most recent historical value)
+        current_index_rate = rate_model.current_index_rate
+
+        # Calculate future rates (index + margin)
+        future_index_rate = current_index_rate
+        last_arm_rate = initial_rate
+
+        for year, annual_change in enumerate(sampled_changes):
+            # Apply the sampled change to the index rate
+            future_index_rate += annual_change
+            future_index_rate = max(0.5, future_index_rate)  # Floor at 0.5%
+
+            # Calculate new ARM rate (index + margin)
+            new_arm_rate = future_index_rate + margin
+
+            # Apply caps
+            if year == 0:  # First adjustment after fixed period
+                # Apply initial adjustment cap
+                max_increase = initial_cap
+                max_decrease = float('inf')  # No limit on decreases
+            else:  # Subsequent adjustments
+                # Apply periodic adjustment cap
+                max_increase = annual_cap
+                max_decrease = float('inf')  # No limit on decreases
+
+            # Apply caps
+            if new_arm_rate > last_arm_rate + max_increase:
+                new_arm_rate = last_arm_rate + max_increase
+
+            # Apply lifetime cap
+            lifetime_max = initial_rate + lifetime_cap
+            if new_arm_rate > lifetime_max:
+                new_arm_rate = lifetime_max
+
+            annual_rates.append(new_arm_rate)
+            last_arm_rate = new_arm_rate
+
+    # Ensure we have exactly 'years' years
+    annual_rates = annual_rates[:years]
+    if len(annual_rates) < years:
+        # If we don't have enough data, repeat the last value
+        annual_rates.extend([annual_rates[-1]] * (years - len(annual_rates)))
+
+    # Convert annual rates to monthly rates
+    monthly_rates = []
+    for annual_rate in annual_rates:
+        monthly_rates.extend([annual_rate / 100 / 12] * 12)
+
+    return monthly_rates, annual_rates
+
+
+def calculate_arm_cost(principal, monthly_rates):
+    """Calculate the total cost of a 5/1 ARM mortgage over time."""
+    # Rates change once a year, so amortize in yearly blocks
+    return amortize_arm_path(principal, monthly_rates[::12])
+
+
+def sample_index_paths(annual_changes, current_index_rate, num_paths, num_years, rng=np.random,
+                       sampling="random"):
+    """Sample annual index rate paths by bootstrapping historical year-over-year changes.
+    sampling is one of arm_sampling.SAMPLING_MODES; modes other than 'random' need rng
+    to be a numpy.random.Generator. Returns an array of shape (num_paths, num_years).
+    """
+    if sampling == "random":
+        sampled_changes = rng.choice(annual_changes, size=(num_paths, num_years), replace=True)
+    else:
+        sampled_changes = empirical_draws(annual_changes, sampling_uniforms(sampling, num_paths, num_years, rng))
+    if arm_kernels.use_compiled():
+        return arm_kernels.floor_index_paths(sampled_changes, float(current_index_rate), 0.5)
+    index_paths = np.empty((num_paths, num_years))
+
+    # The floor makes each year depend on the previous one, so step through the
+    # years and vectorize across paths
+    index_rate = np.full(num_paths, float(current_index_rate))
+    for year in range(num_years):
+        index_rate = np.maximum(0.5, index_rate + sampled_changes[:, year])  # Floor at 0.5%
+        index_paths[:, year] = index_rate
+
+    return index_paths
+
+
+def draw_index_scenarios(index_scenarios, num_paths, num_years, rng=np.random, sampling="random"):
+    """Draw num_paths annual index paths from a set of precomputed scenarios, such as
+    synthetic_rates.SyntheticRateModel.index_scenarios. Scenarios shorter than
+    num_years keep their last rate. With a sampling mode other than 'random', the
+    choice of scenarios is spread by that mode. Returns an array of shape (num_paths, num_years).
+    """
+    if sampling == "random":
+        rows = rng.integers(0, len(index_scenarios), size=num_paths)
+    else:
+        uniforms = sampling_uniforms(sampling, num_paths, 1, rng)[:, 0]
+        rows = np.minimum((uniforms * len(index_scenarios)).astype(np.int64), len(index_scenarios) - 1)
+    columns = np.minimum(np.arange(num_years), index_scenarios.shape[1] - 1)
+    return index_scenarios[rows[:, None], columns]
+
+
+def sample_index_levels(index_levels, num_paths, num_years, rng=np.random, sampling="random"):
+    """Sample annual index rate paths by drawing every year's index independently from
+    historical rate levels, as rate_data.HistoricalLevelModel describes, floored at 0.5%.
+    Returns an array of shape (num_paths, num_years).
+    """
+    if sampling == "random":
+        sampled_levels = rng.choice(index_levels, size=(num_paths, num_years), replace=True)
+    else:
+        sampled_levels = empirical_draws(index_levels, sampling_uniforms(sampling, num_paths, num_years, rng))
+    return np.maximum(0.5, sampled_levels)
+
+
+def apply_arm_caps(index_paths, initial_rate, margin, initial_cap, annual_cap, lifetime_cap, years=30, fixed_years=5):
+    """Turn index rate paths into annual ARM rates (index + margin) subject to the rate caps.
+    Returns an array of shape (num_paths, years).
+    """
+    if arm_kernels.use_compiled():
+        return arm_kernels.cap_arm_rates(np.ascontiguousarray(index_paths, dtype=float), float(initial_rate),
+                                         float(margin), float(initial_cap), float(annual_cap), float(lifetime_cap),
+                                         years, fixed_years)
+
+    num_paths = index_paths.shape[0]
+    annual_rates = np.full((num_paths, years), float(initial_rate))
+
+    last_arm_rate = annual_rates[:, 0]
+    lifetime_max = initial_rate + lifetime_cap
+
+    for year in range(min(index_paths.shape[1], years - fixed_years)):
+        # Initial adjustment cap on the first adjustment, periodic cap afterwards.
+        # There is no limit on decreases.
+        max_increase = initial_cap if year == 0 else annual_cap
+
+        new_arm_rate = index_paths[:, year] + margin
+        new_arm_rate = np.minimum(new_arm_rate, last_arm_rate + max_increase)
+        new_arm_rate = np.minimum(new_arm_rate, lifetime_max)
+
+        annual_rates[:, fixed_years + year] = new_arm_rate
+        last_arm_rate = new_arm_rate
+
+    return annual_rates
+
+
+def arm_rate_adjoints(annual_rates, rate_gradient, initial_rate, initial_cap, annual_cap, lifetime_cap,
+                      fixed_years=5):
+    """Carry the gradient of a cost with respect to each annual rate of paths from
+    apply_arm_caps back to each of SENSITIVITY_PARAMETERS, holding the index paths fixed.
+
+    Each adjusted rate is the smallest of index + margin, the last rate + cap and
+    the lifetime maximum, so it moves with whichever bound it equals. The bounds are
+    recomputed with the same floating-point sums as in apply_arm_caps, and a minimum
+    is always one of its operands, so == finds the bound that was taken without a
+    tolerance. Where two bounds are equal the rate has a kink; such ties go to the
+    lifetime maximum, then the cap, then the index, which gives the derivative on one
+    side of the kink. With continuous index changes ties have probability zero.
+    rate_gradient has the shape of annual_rates. Returns an array of shape
+    (len(SENSITIVITY_PARAMETERS), num_paths).
+    """
+    initial, margin, first_cap, later_cap, lifetime = range(len(SENSITIVITY_PARAMETERS))
+    rates = np.ascontiguousarray(annual_rates.T)
+    rate_adjoint = np.array(rate_gradient, dtype=float).T.copy()
+    derivatives = np.empty((len(SENSITIVITY_PARAMETERS), rates.shape[1]))
+
+    # Which bound holds each adjusted rate, ties in order of priority
+    max_increases = np.full((len(rates) - fixed_years, 1), float(annual_cap))
+    max_increases[0] = initial_cap
+    at_lifetime = rates[fixed_years:] == initial_rate + lifetime_cap
+    at_cap = ~at_lifetime & (rates[fixed_years:] == rates[fixed_years - 1:-1] + max_increases)
+
+    # A rate held by the cap moves with the rate before it
+    for year in range(len(rates) - 1, fixed_years - 1, -1):
+        rate_adjoint[year - 1] += rate_adjoint[year] * at_cap[year - fixed_years]
+
+    adjusted = rate_adjoint[fixed_years:]
+    derivatives[margin] = np.sum(adjusted * ~(at_lifetime | at_cap), axis=0)
+    derivatives[lifetime] = np.sum(adjusted * at_lifetime, axis=0)
+    derivatives[initial] = derivatives[lifetime] + rate_adjoint[:fixed_years].sum(axis=0)
+    derivatives[first_cap] = adjusted[0] * at_cap[0]
+    derivatives[later_cap] = np.sum(adjusted[1:] * at_cap[1:], axis=0)
+    return derivatives
+
+
+def simulate_arm_rate_paths(annual_changes, current_index_rate, initial_rate, margin, initial_cap,
+                            annual_cap, lifetime_cap, years=30, num_paths=1, rng=np.random,
+                            index_scenarios=None, sampling="random", index_levels=None):
+    """Simulate many ARM annual rate paths at once.
+    Produces the same paths as consecutive calls to simulate_arm_rates
+    when drawing from the same random state. If index_scenarios are given, the index
+    paths are drawn from them instead of bootstrapped, and if index_levels are given,
+    every year's index is drawn from those levels. If none is available, every
+    path stays at the initial rate. sampling selects the variance-reduction mode.
+    """
+    if index_levels is not None:
+        index_paths = sample_index_levels(index_levels, num_paths, years - 5, rng, sampling)
+    elif index_scenarios is not None:
+        index_paths = draw_index_scenarios(index_scenarios, num_paths, years - 5, rng, sampling)
+    elif annual_changes is not None:
+        index_paths = sample_index_paths(annual_changes, current_index_rate, num_paths, years - 5, rng, sampling)
+    else:
+        return np.full((num_paths, years), float(initial_rate))
+
+    return apply_arm_caps(index_paths, initial_rate, margin, initial_cap, annual_cap, lifetime_cap, years)
+
+
+def _amortization_factors(monthly_rates):
+    """Per-year factors of the closed-form yearly amortization, for rates of shape
+    (num_paths, years): the monthly rates, the months left at the start of each year,
+    the growth of a balance over the year and over the remaining term, the payment per
+    dollar of balance, and a year of payments accumulated with interest. The months
+    have shape (years, 1) and the rest (years, num_paths).
+    """
+    rates = np.ascontiguousarray(monthly_rates.T)
+    zero_rate = rates == 0
+
+    # Growth factors for one year and for the remaining term at each year
+    log_growth = np.log1p(rates)
+    annual_growth = np.exp(12 * log_growth)
+    remaining_months = 12 * np.arange(len(rates), 0, -1)[:, np.newaxis]
+    term_growth = np.exp(remaining_months * log_growth)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment_factor = rates * term_growth / (term_growth - 1)
+        payment_growth = (annual_growth - 1) / rates
+    if zero_rate.any():
+        payment_factor[zero_rate] = np.broadcast_to(1 / remaining_months, zero_rate.shape)[zero_rate]
+        payment_growth[zero_rate] = 12
+    return rates, remaining_months, annual_growth, term_growth, payment_factor, payment_growth
+
+
+def _amortize_forward(principal, annual_growth, payment_factor, payment_growth, fixed_years):
+    """The yearly recurrence shared by the NumPy amortizations, stepped over all paths
+    at once. Returns the payment of every year and the balance at its end, arrays of
+    shape (years, num_paths).
+    """
+    years, num_paths = annual_growth.shape
+    payments = np.empty((years, num_paths))
+    balances = np.empty((years, num_paths))
+    remaining_principal = np.full(num_paths, float(principal))
+    current_payment = np.empty(num_paths)
+
+    for year in range(years):
+        # Recalculate payment at start and annually after fixed period
+        if year == 0 or year >= fixed_years:
+            np.multiply(remaining_principal, payment_factor[year], out=current_payment)
+
+        remaining_principal *= annual_growth[year]
+        remaining_principal -= current_payment * payment_growth[year]
+        # Once the loan is paid off the balance stays at zero, and the payment
+        # recalculated at the next adjustment is zero as well
+        remaining_principal[remaining_principal < 0.01] = 0
+
+        payments[year] = current_payment
+        balances[year] = remaining_principal
+
+    return payments, balances
+
+
+def amortize_arm_yearly(principal, monthly_rates, fixed_years=5):
+    """Amortize ARM rate paths in yearly blocks instead of month by month.
+
+    monthly_rates has shape (num_paths, years) and holds the monthly rate for each year.
+    The payment is set at the start of the loan and recalculated annually after the fixed
+    period. Within a year the rate and payment are constant, so the balance after the
+    12 payments has the closed form B * (1 + r)^12 - A * ((1 + r)^12 - 1) / r.
+    Returns the total paid on each path, the last column of amortize_arm_horizons.
+    """
+    return amortize_arm_horizons(principal, monthly_rates, fixed_years)[:, -1].copy()
+
+
+def amortize_arm_horizons(principal, monthly_rates, fixed_years=5):
+    """Cost of ARM rate paths for every holding period, amortized as in amortize_arm_yearly.
+
+    Column h holds what the borrower has paid after h + 1 years plus the balance
+    that repaying the loan (on a sale or refinance) would take then. The last column
+    is the total cost over the full term. Returns an array of shape (num_paths, years).
+    """
+    if arm_kernels.use_compiled():
+        return arm_kernels.amortize_horizons(float(principal), np.ascontiguousarray(monthly_rates, dtype=float),
+                                             fixed_years)
+
+    _, _, annual_growth, _, payment_factor, payment_growth = _amortization_factors(monthly_rates)
+    payments, balances = _amortize_forward(principal, annual_growth, payment_factor, payment_growth, fixed_years)
+
+    # Payments so far are a running sum over the years
+    horizon_costs = 12 * np.cumsum(payments, axis=0)
+    horizon_costs += balances
+    return horizon_costs.T
+
+
+def calculate_arm_horizon_costs(principal, annual_rates, fixed_years=5):
+    """Calculate the cost of a 5/1 ARM for every rate path and holding period in years."""
+    return amortize_arm_horizons(principal, annual_rates / 100 / 12, fixed_years)
+
+
+def amortize_arm_adjoint(principal, monthly_rates, fixed_years=5):
+    """Total paid on each path, as amortize_arm_yearly, and its gradient with respect to
+    the monthly rate of every year, by reverse-mode differentiation of the same yearly
+    recurrence: one pass forward keeping the balances and payments, one pass back.
+    Returns arrays of shapes (num_paths,) and (num_paths, years).
+    """
+    if arm_kernels.use_compiled():
+        return arm_kernels.amortize_adjoint(float(principal), np.ascontiguousarray(monthly_rates, dtype=float),
+                                            fixed_years)
+
+    num_paths, years = monthly_rates.shape
+    (rates, remaining_months, annual_growth, term_growth, payment_factor,
+     payment_growth) = _amortization_factors(monthly_rates)
+    zero_rate = rates == 0
+
+    # Derivatives of the factors with respect to the rate
+    annual_growth_derivative = 12 * annual_growth / (1 + rates)
+    term_growth_derivative = remaining_months * term_growth / (1 + rates)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment_factor_derivative = ((term_growth * (term_growth - 1) - rates * term_growth_derivative)
+                                     / (term_growth - 1) ** 2)
+        payment_growth_derivative = (annual_growth_derivative * rates - (annual_growth - 1)) / rates ** 2
+    if zero_rate.any():
+        months = np.broadcast_to(remaining_months, zero_rate.shape)[zero_rate]
+        payment_factor_derivative[zero_rate] = (months + 1) / (2 * months)
+        payment_growth_derivative[zero_rate] = 66  # Sum of 0..11
+
+    payments, balances = _amortize_forward(principal, annual_growth, payment_factor, payment_growth, fixed_years)
+    start_balances = np.vstack([np.full(num_paths, float(principal)), balances[:-1]])
+    # Balances below a cent are set to zero, so zero marks the years the loan was paid off
+    paid_off = balances == 0
+
+    # Back through the years: balance_adjoint is the derivative of the total paid with
+    # respect to the balance at the end of the year, payment_carry that with respect to
+    # a payment carried over from the year before
+    rate_gradient = np.empty((years, num_paths))
+    balance_adjoint = np.zeros(num_paths)
+    payment_carry = np.zeros(num_paths)
+    for year in range(years - 1, -1, -1):
+        balance_adjoint[paid_off[year]] = 0
+        payment_adjoint = 12 + payment_carry - balance_adjoint * payment_growth[year]
+        rate_gradient[year] = balance_adjoint * (start_balances[year] * annual_growth_derivative[year]
+                                                 - payments[year] * payment_growth_derivative[year])
+        balance_adjoint *= annual_growth[year]
+
+        if year == 0 or year >= fixed_years:
+            balance_adjoint += payment_adjoint * payment_factor[year]
+            rate_gradient[year] += payment_adjoint * start_balances[year] * payment_factor_derivative[year]
+            payment_carry = np.zeros(num_paths)
+        else:
+            payment_carry = payment_adjoint
+
+    return 12 * payments.sum(axis=0), rate_gradient.T
+
+
+def arm_cost_sensitivities(principal, annual_rates, initial_rate, initial_cap, annual_cap, lifetime_cap,
+                           fixed_years=5):
+    """Pathwise derivatives of the cost of each ARM path with respect to each of
+    SENSITIVITY_PARAMETERS, per percentage point, with the index paths held fixed.
+    annual_rates must come from apply_arm_caps with the same parameters.
+    Returns the costs, as calculate_arm_costs, and an array of shape
+    (len(SENSITIVITY_PARAMETERS), num_paths) of derivatives.
+    """
+    arm_costs, rate_gradient = amortize_arm_adjoint(principal, annual_rates / 100 / 12, fixed_years)
+    derivatives = arm_rate_adjoints(annual_rates, rate_gradient / 1200, initial_rate, initial_cap, annual_cap,
+                                    lifetime_cap, fixed_years)
+    return arm_costs, derivatives
+
+
+def amortization_schedules(principal, monthly_rates, fixed_years=5):
+    """Balance after every monthly payment and the payments themselves, for ARM rate paths.
+
+    monthly_rates is as for amortize_arm_yearly, and the payments are set the same way.
+    Within each year the closed form is evaluated after every payment instead of only
+    the last. The payments on a path therefore add up to its total cost. Returns two
+    arrays of shape (num_paths, 12 * years).
+    """
+    num_paths, years = monthly_rates.shape
+    balances = np.empty((num_paths, 12 * years))
+    payments = np.empty((num_paths, 12 * years))
+    months = np.arange(1, 13)
+
+    remaining_principal = np.full(num_paths, float(principal))
+    current_payment = np.zeros(num_paths)
+
+    for year in range(years):
+        rate = monthly_rates[:, year]
+        zero_rate = rate == 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Recalculate payment at start and annually after fixed period
+            if year == 0 or year >= fixed_years:
+                term_growth = (1 + rate) ** (12 * (years - year))
+                current_payment = np.where(zero_rate, remaining_principal / (12 * (years - year)),
+                                           remaining_principal * rate * term_growth / (term_growth - 1))
+
+            growth = (1 + rate[:, np.newaxis]) ** months
+            payment_growth = np.where(zero_rate[:, np.newaxis], months, (growth - 1) / rate[:, np.newaxis])
+        block = remaining_principal[:, np.newaxis] * growth - current_payment[:, np.newaxis] * payment_growth
+        block[block < 0.01] = 0
+
+        balances[:, 12 * year:12 * (year + 1)] = block
+        payments[:, 12 * year:12 * (year + 1)] = current_payment[:, np.newaxis]
+        remaining_principal = block[:, -1]
+
+    return balances, payments
+
+
+def amortize_arm_path(principal, rates_by_year, fixed_years=5):
+    """Single-path version of amortize_arm_yearly on plain floats."""
+    years = len(rates_by_year)
+    remaining_principal = principal
+    total_paid = 0
+    current_payment = None
+
+    for year, rate in enumerate(rates_by_year):
+        # Recalculate payment at start and annually after fixed period
+        if year == 0 or year >= fixed_years:
+            remaining_months = (years - year) * 12
+            if rate == 0:
+                current_payment = remaining_principal / remaining_months
+            else:
+                term_growth = (1 + rate) ** remaining_months
+                current_payment = remaining_principal * (rate * term_growth) / (term_growth - 1)
+
+        if rate == 0:
+            remaining_principal -= 12 * current_payment
+        else:
+            growth = (1 + rate) ** 12
+            remaining_principal = remaining_principal * growth - current_payment * (growth - 1) / rate
+        total_paid += 12 * current_payment
+
+        if remaining_principal < 0.01:
+            remaining_principal = 0
+
+    return total_paid
+
+
+def calculate_arm_costs(principal, annual_rates, fixed_years=5):
+    """Calculate the total cost of a 5/1 ARM for every rate path in annual_rates."""
+    return amortize_arm_yearly(principal, annual_rates / 100 / 12, fixed_years)
+
+
+def calculate_arm_cost_monthly(principal, monthly_rates):
+    """Reference month-by-month amortization of a single ARM path.
+    Kept to check amortize_arm_yearly against; use calculate_arm_costs for simulations.
+    """
+    remaining_principal = principal
+    total_paid = 0
+
+    # Payment recalculation months (at beginning and then annually after fixed period)
+    recalc_months = {0, *range(5*12, len(monthly_rates), 12)}
+
+    current_payment = None
+
+    for month, rate in enumerate(monthly_rates):
+        # Recalculate payment at start and annually after fixed period
+        if month in recalc_months:
+            remaining_months = len(monthly_rates) - month
+
+            if rate == 0:
+                current_payment = remaining_principal / remaining_months
+            else:
+                current_payment = remaining_principal * (rate * (1 + rate) ** remaining_months) / ((1 + rate) ** remaining_months - 1)
+
+        # Calculate interest and principal payment
+        interest = remaining_principal * rate
+        principal_payment = min(current_payment - interest, remaining_principal)
+
+        # Update remaining principal
+        remaining_principal -= principal_payment
+
+        # Update total paid
+        total_paid += current_payment
+
+        # Handle final payment rounding issues
+        if remaining_principal < 0.01:
+            remaining_principal = 0
+
+    return total_paid
+
+
+def arm_cost_bounds(loan_amount, loan_term, arm_initial_rate, arm_margin, lifetime_cap, fixed_years=5):
+    """Lowest and highest total cost any simulated ARM path can have.
+    Cost rises with every year's rate, so the extremes are paths that adjust to the
+    lowest reachable rate (the index floor plus margin) or to the lifetime cap.
+    """
+    lifetime_max = arm_initial_rate + lifetime_cap
+    extreme_rates = np.full((2, loan_term), float(arm_initial_rate))
+    extreme_rates[0, fixed_years:] = min(arm_initial_rate, 0.5 + arm_margin, lifetime_max)
+    extreme_rates[1, fixed_years:] = max(arm_initial_rate, lifetime_max)
+    cost_low, cost_high = calculate_arm_costs(loan_amount, extreme_rates)
+    return float(cost_low), float(cost_high)
+
+
+def simulate_arm_chunk(annual_changes, current_index_rate, loan_amount, loan_term, arm_initial_rate,
+                       arm_margin, initial_cap, annual_cap, lifetime_cap, first_path, num_paths, seed_sequence,
+                       summary_args=None, instrument=False, index_scenarios=None, store_directory=None,
+                       sampling="random", fixed_horizon_costs=None, sensitivities=False, index_levels=None):
+    """Simulate one chunk of paths with its own random stream.
+    Returns the ARM costs, the rate paths kept for visualization and a dict of the
+    chunk's optional statistics ('horizons' and 'sensitivities', as the attributes
+    of StreamingCostSummary), or, if summary_args are given, a
+    StreamingCostSummary(*summary_args) of the chunk.
+    With instrument=True, returns that result and an Instrumentation snapshot of the
+    chunk's stages. If store_directory is given, every path of the chunk is also
+    written there with its monthly schedule (see path_store). sampling is the
+    variance-reduction mode of the index paths. fixed_horizon_costs, from
+    calculate_fixed_horizon_costs, makes the chunk compare the loans at every
+    holding period, in the same amortization pass as the total costs. With
+    sensitivities=True, the pathwise derivatives of the costs with respect to each of
+    SENSITIVITY_PARAMETERS are summarized as well. index_levels are the levels of a
+    rate_data.HistoricalLevelModel.
+    """
+    stages = Instrumentation() if instrument else None
+
+    with timed(stages, "rate path sampling"):
+        rng = np.random.default_rng(seed_sequence)
+        annual_rates = simulate_arm_rate_paths(
+            annual_changes, current_index_rate, arm_initial_rate, arm_margin,
+            initial_cap, annual_cap, lifetime_cap, loan_term, num_paths, rng, index_scenarios, sampling, index_levels)
+
+    horizon_costs = None
+    cost_derivatives = None
+    with timed(stages, "amortization"):
+        if fixed_horizon_costs is not None:
+            horizon_costs = calculate_arm_horizon_costs(loan_amount, annual_rates)
+            arm_costs = horizon_costs[:, -1]
+        elif not sensitivities:
+            arm_costs = calculate_arm_costs(loan_amount, annual_rates)
+
+    if sensitivities:
+        with timed(stages, "sensitivities"):
+            sensitivity_costs, cost_derivatives = arm_cost_sensitivities(
+                loan_amount, annual_rates, arm_initial_rate, initial_cap, annual_cap, lifetime_cap)
+            if horizon_costs is None:
+                arm_costs = sensitivity_costs
+
+    if store_directory is not None:
+        with timed(stages, "path storage"):
+            balances, payments = amortization_schedules(loan_amount, annual_rates / 100 / 12)
+            write_path_chunk(store_directory, first_path, annual_rates, balances, payments, arm_costs)
+
+    with timed(stages, "chunk statistics"):
+        if summary_args is not None:
+            summary = StreamingCostSummary(*summary_args, seed=seed_sequence.spawn(1)[0],
+                                           fixed_horizon_costs=fixed_horizon_costs,
+                                           sensitivity_parameters=SENSITIVITY_PARAMETERS if sensitivities else None)
+            summary.update(arm_costs, annual_rates, horizon_costs, cost_derivatives)
+            result = summary
+        else:
+            sampled_paths = annual_rates[-first_path % RATE_PATH_SAMPLE_INTERVAL::RATE_PATH_SAMPLE_INTERVAL]
+            statistics = {}
+            if horizon_costs is not None:
+                statistics['horizons'] = HorizonSummary(fixed_horizon_costs)
+                statistics['horizons'].update(horizon_costs)
+            if cost_derivatives is not None:
+                statistics['sensitivities'] = SensitivitySummary(SENSITIVITY_PARAMETERS)
+                statistics['sensitivities'].update(cost_derivatives)
+            result = arm_costs, sampled_paths, statistics
+
+    return (result, stages.snapshot()) if instrument else result
+
+
+def iter_arm_chunks(loan_amount, loan_term, arm_initial_rate, arm_margin, initial_cap, annual_cap,
+                    lifetime_cap, num_simulations, rate_model=None, num_workers=1, seed=None,
+                    summary_args=None, instrumentation=None, executor=None, store_directory=None,
+                    sampling="random", fixed_horizon_costs=None, sensitivities=False):
+    """Simulate paths in chunks of SIMULATION_CHUNK_SIZE (SOBOL_CHUNK_SIZE for Sobol
+    sampling) and yield the chunk results in order.
+
+    Each chunk draws from an independent child of numpy.random.SeedSequence(seed), so
+    the same seed gives the same results for any number of workers. With more than
+    one worker the chunks run on a process pool. executor, a
+    concurrent.futures.Executor shared between runs, is used instead of starting a
+    pool when given. If an Instrumentation is given, the stages of every chunk are
+    added to it, summed over the worker processes. store_directory, sampling,
+    fixed_horizon_costs and sensitivities are passed on to simulate_arm_chunk.
+    """
+    annual_changes = None
+    current_index_rate = None
+    index_scenarios = None
+    index_levels = None
+    if rate_model is not None:
+        annual_changes = rate_model.annual_changes
+        current_index_rate = rate_model.current_index_rate
+        index_scenarios = rate_model.index_scenarios
+        index_levels = rate_model.index_levels
+
+    chunk_size = SOBOL_CHUNK_SIZE if sampling == "sobol" else SIMULATION_CHUNK_SIZE
+    chunk_starts = range(0, num_simulations, chunk_size)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunk_starts))
+    chunk_args = [
+        (annual_changes, current_index_rate, loan_amount, loan_term, arm_initial_rate, arm_margin,
+         initial_cap, annual_cap, lifetime_cap, start,
+         min(chunk_size, num_simulations - start), seed_sequence, summary_args,
+         instrumentation is not None, index_scenarios, store_directory, sampling, fixed_horizon_costs,
+         sensitivities, index_levels)
+        for start, seed_sequence in zip(chunk_starts, seed_sequences)
+    ]
+
+    futures = []
+    own_executor = None
+    num_workers = min(num_workers or 1, len(chunk_args))
+    if executor is not None:
+        futures = [executor.submit(simulate_arm_chunk, *args) for args in chunk_args]
+        results = (future.result() for future in futures)
+    elif num_workers <= 1:
+        results = (simulate_arm_chunk(*args) for args in chunk_args)
+    else:
+        own_executor = ProcessPoolExecutor(max_workers=num_workers)
+        results = own_executor.map(simulate_arm_chunk, *zip(*chunk_args))
+    try:
+        for result in results:
+            if instrumentation is not None:
+                result, stages = result
+                instrumentation.merge(stages)
+            yield result
+    finally:
+        # If the caller stops early, drop the chunks that have not started
+        for future in futures:
+            future.cancel()
+        if own_executor is not None:
+            own_executor.shutdown(cancel_futures=True)
+
+
+def run_arm_simulation(loan_amount, loan_term, arm_initial_rate, arm_margin, initial_cap, annual_cap,
+                       lifetime_cap, num_simulations, rate_model=None, num_workers=1, seed=None,
+                       progress=None):
+    """Run the ARM Monte Carlo simulation, optionally across several worker processes.
+
+    See iter_arm_chunks for how paths are split and seeded. progress, if given, is
+    called as progress(done, total) as chunks finish.
+    Returns the array of ARM costs and the list of sampled annual rate paths.
+    """
+    arm_costs = np.empty(num_simulations)
+    arm_rate_paths = []
+    completed = 0
+
+    for costs, paths, _ in iter_arm_chunks(
+            loan_amount, loan_term, arm_initial_rate, arm_margin, initial_cap, annual_cap,
+            lifetime_cap, num_simulations, rate_model, num_workers, seed):
+        arm_costs[completed:completed + len(costs)] = costs
+        arm_rate_paths.extend(paths.tolist())
+        completed += len(costs)
+        if progress is not None:
+            progress(completed, num_simulations)
+
+    return arm_costs, arm_rate_paths
+
+
+def run_arm_simulation_streaming(fixed_cost, loan_amount, loan_term, arm_initial_rate, arm_margin,
+                                 initial_cap, annual_cap, lifetime_cap, num_simulations, rate_model=None,
+                                 num_workers=1, seed=None, progress=None):
+    """Run the ARM Monte Carlo simulation keeping only bounded-memory statistics.
+
+    Like run_arm_simulation, but each chunk is reduced to a StreamingCostSummary in the
+    worker and the summaries are merged in chunk order, so memory does not grow with
+    num_simulations. Returns the merged StreamingCostSummary.
+    """
+    cost_low, cost_high = arm_cost_bounds(loan_amount, loan_term, arm_initial_rate, arm_margin, lifetime_cap)
+    summary = None
+
+    for chunk_summary in iter_arm_chunks(
+            loan_amount, loan_term, arm_initial_rate, arm_margin, initial_cap, annual_cap,
+            lifetime_cap, num_simulations, rate_model, num_workers, seed,
+            summary_args=(fixed_cost, cost_low, cost_high)):
+        if summary is None:
+            summary = chunk_summary
+        else:
+            summary.merge(chunk_summary)
+        if progress is not None:
+            progress(summary.count, num_simulations)
+
+    return summary
+
+
+class SimulationRun:
+    """Outcome of run_arm_simulation_incremental.
+
+    summary is a StreamingCostSummary of every simulated path. arm_costs holds the
+    individual costs unless the run was streaming. stop_reason is 'completed',
+    'converged' or 'cancelled'.
+    """
+
+    def __init__(self, summary, arm_costs, arm_rate_paths, stop_reason):
+        self.summary = summary
+        self.arm_costs = arm_costs
+        self.arm_rate_paths = arm_rate_paths
+        self.stop_reason = stop_reason
+
+    @property
+    def num_simulations(self):
+        return self.summary.count if self.summary is not None else 0
+
+    def statistics(self):
+        """Statistics as from summarize_arm_costs, exact when the costs were kept."""
+        if self.arm_costs is not None:
+            return summarize_arm_costs(self.summary.fixed_cost, self.arm_costs)
+        return self.summary.summary()
+
+
+def standard_errors(summary, sampling="random"):
+    """Standard errors of the median cost ($) and of the probability the ARM is cheaper
+    (percentage points). Independent paths use the closed-form estimates of the
+    summary. The other sampling modes correlate paths, so their errors come from the
+    spread across sampling blocks instead.
+    """
+    if sampling == "random":
+        return summary.median_standard_error(), summary.prob_standard_error()
+    errors = summary.replicates.standard_errors()
+    return errors['arm_median'], errors['prob_arm_cheaper']
+
+
+def has_converged(summary, median_tolerance=None, prob_tolerance=None, sampling="random"):
+    """Whether the standard errors of the median cost ($) and of the probability the
+    ARM is cheaper (percentage points) are below the given tolerances.
+    Tolerances that are None are not checked; with neither given a run never converges.
+    """
+    if median_tolerance is None and prob_tolerance is None:
+        return False
+    if summary.count < MIN_CONVERGENCE_PATHS:
+        return False
+    median_error, prob_error = standard_errors(summary, sampling)
+    if median_tolerance is not None and not median_error <= median_tolerance:
+        return False
+    if prob_tolerance is not None and not prob_error <= prob_tolerance:
+        return False
+    return True
+
+
+def run_arm_simulation_incremental(fixed_cost, loan_amount, loan_term, arm_initial_rate, arm_margin,
+                                   initial_cap, annual_cap, lifetime_cap, num_simulations, rate_model=None,
+                                   num_workers=1, seed=None, progress=None, median_tolerance=None,
+                                   prob_tolerance=None, cancel_event=None, on_partial=None, streaming=False,
+                                   instrumentation=None, executor=None, store_directory=None, sampling="random",
+                                   fixed_horizon_costs=None, sensitivities=False):
+    """Run the ARM simulation chunk by chunk, stopping early once converged or cancelled.
+
+    num_simulations is the maximum number of paths. After every chunk, on_partial (if
+    given) is called with the StreamingCostSummary so far, and the run stops when
+    has_converged(summary, median_tolerance, prob_tolerance) or when cancel_event (a
+    threading.Event) is set. With streaming=True only bounded-memory statistics are
+    kept. instrumentation, an Instrumentation, records the stages of the run, and
+    executor is passed on to iter_arm_chunks. With store_directory, a store made by
+    path_store.create_path_store, every simulated path is written there as well.
+    sampling is one of arm_sampling.SAMPLING_MODES. With fixed_horizon_costs, from
+    calculate_fixed_horizon_costs, summary.horizons compares the loans for every
+    holding period, and with sensitivities=True, summary.sensitivities holds the
+    pathwise derivatives of the cost (see arm_cost_sensitivities). Returns a SimulationRun.
+    """
+    cost_low, cost_high = arm_cost_bounds(loan_amount, loan_term, arm_initial_rate, arm_margin, lifetime_cap)
+    summary_args = (fixed_cost, cost_low, cost_high)
+
+    summary = StreamingCostSummary(*summary_args, seed=seed, fixed_horizon_costs=fixed_horizon_costs,
+                                   sensitivity_parameters=SENSITIVITY_PARAMETERS if sensitivities else None)
+    cost_chunks = []
+    arm_rate_paths = []
+    stop_reason = 'completed'
+
+    chunks = iter_arm_chunks(
+        loan_amount, loan_term, arm_initial_rate, arm_margin, initial_cap, annual_cap, lifetime_cap,
+        num_simulations, rate_model, num_workers, seed, summary_args if streaming else None, instrumentation,
+        executor, store_directory, sampling, fixed_horizon_costs, sensitivities)
+    with closing(chunks):
+        for result in chunks:
+            with timed(instrumentation, "statistics"):
+                if streaming:
+                    summary.merge(result)
+                else:
+                    costs, paths, statistics = result
+                    summary.update(costs)
+                    for name, chunk_statistics in statistics.items():
+                        getattr(summary, name).merge(chunk_statistics)
+                    cost_chunks.append(costs)
+                    arm_rate_paths.extend(paths.tolist())
+
+            if progress is not None:
+                progress(summary.count, num_simulations)
+            if on_partial is not None:
+                with timed(instrumentation, "partial results"):
+                    on_partial(summary)
+
+            if cancel_event is not None and cancel_event.is_set():
+                stop_reason = 'cancelled'
+                break
+            if (summary.count < num_simulations
+                    and has_converged(summary, median_tolerance, prob_tolerance, sampling)):
+                stop_reason = 'converged'
+                break
+
+    if store_directory is not None:
+        # Chunks past an early stop may have been written too, but are not counted
+        finish_path_store(store_directory, summary.count)
+
+    if streaming:
+        arm_rate_paths = summary.rate_paths.paths.tolist() if summary.rate_paths.paths is not None else []
+        arm_costs = None
+    else:
+        arm_costs = np.concatenate(cost_chunks) if cost_chunks else np.empty(0)
+    return SimulationRun(summary, arm_costs, arm_rate_paths, stop_reason)
+
+
+def validate_inputs(loan_amount, loan_term, fixed_rate, arm_initial_rate, arm_margin, initial_cap,
+                    annual_cap, lifetime_cap, num_simulations):
+    """Raise ValueError if the simulation parameters are out of range."""
+    if loan_amount <= 0 or fixed_rate < 0 or arm_initial_rate < 0 or arm_margin < 0:
+        raise ValueError("Loan amount must be positive and rates cannot be negative")
+
+    if initial_cap < 0 or annual_cap < 0 or lifetime_cap < 0:
+        raise ValueError("Rate caps cannot be negative")
+
+    if loan_term <= 5:
+        raise ValueError("Loan term must be greater than 5 years for 5/1 ARM comparison")
+
+    if num_simulations <= 0:
+        raise ValueError("Number of simulations must be positive")
+
+
+def summarize_arm_costs(fixed_cost, arm_costs):
+    """Summary statistics of the simulated ARM costs against the fixed-rate cost."""
+    arm_costs = np.asarray(arm_costs)
+    arm_median = np.median(arm_costs)
+
+    return {
+        'fixed_cost': float(fixed_cost),
+        'arm_mean': float(np.mean(arm_costs)),
+        'arm_median': float(arm_median),
+        'arm_std': float(np.std(arm_costs)),
+        'arm_min': float(np.min(arm_costs)),
+        'arm_max': float(np.max(arm_costs)),
+        # 95% confidence interval
+        'arm_ci_low': float(np.percentile(arm_costs, 2.5)),
+        'arm_ci_high': float(np.percentile(arm_costs, 97.5)),
+        # Probability (%) that the ARM is cheaper
+        'prob_arm_cheaper': float(np.sum(arm_costs < fixed_cost) / len(arm_costs) * 100),
+        # Expected savings with the ARM
+        'expected_savings': float(fixed_cost - arm_median),
+    }
+
+
+def format_results(fixed_rate, arm_initial_rate, summary):
+    """Format a summary from summarize_arm_costs as the results text shown to users."""
+    fixed_cost = summary['fixed_cost']
+    arm_median = summary['arm_median']
+    prob_arm_cheaper = summary['prob_arm_cheaper']
+    expected_savings = summary['expected_savings']
+
+    # Determine which option is better based on median
+    if fixed_cost < arm_median:
+        conclusion = "Based on historical patterns, the fixed-rate mortgage is likely to be less expensive."
+        confidence_statement = f"The ARM was more expensive in {100-prob_arm_cheaper:.1f}% of simulations."
+    else:
+        conclusion = "Based on historical patterns, the 5/1 ARM is likely to be less expensive."
+        confidence_statement = f"The ARM was less expensive in {prob_arm_cheaper:.1f}% of simulations."
+
+    return (
+        f"Fixed-Rate ({fixed_rate}%) Total Cost: ${fixed_cost:,.2f}\n"
+        f"5/1 ARM (Initial: {arm_initial_rate}%) Median Cost: ${arm_median:,.2f}\n"
+        f"Expected Savings with {'ARM' if expected_savings > 0 else 'Fixed Rate'}: ${abs(expected_savings):,.2f}\n"
+        f"5/1 ARM 95% Confidence Interval: ${summary['arm_ci_low']:,.2f} to ${summary['arm_ci_high']:,.2f}\n\n"
+        f"{conclusion} {confidence_statement}"
+    )
+
+
+def sampling_efficiency(summary):
+    """How many times fewer paths the sampling mode needs than independent sampling for
+    the same standard error of the median cost and of the probability the ARM is
+    cheaper, from the ratio of the closed-form iid variances to the block variances.
+    """
+    errors = summary.replicates.standard_errors()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'arm_median': float((summary.median_standard_error() / errors['arm_median']) ** 2),
+            'prob_arm_cheaper': float((summary.prob_standard_error() / errors['prob_arm_cheaper']) ** 2),
+        }
+
+
+def json_ready(value):
+    """Copy of value (dicts, lists and numbers) with NaN and infinite numbers replaced by
+    None, e.g. the block standard errors of a run with fewer than two sampling blocks.
+    JSON has no NaN, so json.dump writes these as null instead of an invalid token.
+    """
+    if isinstance(value, dict):
+        return {key: json_ready(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_ready(item) for item in value]
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def format_precision(summary, stop_reason=None, sampling="random"):
+    """Describe how many paths a StreamingCostSummary covers and the standard errors of its
+    estimates. stop_reason is a SimulationRun.stop_reason, or None while still running.
+    For variance-reduced sampling the errors of the 95% interval bounds and the gain
+    over independent sampling are described as well.
+    """
+    stopped = {
+        'completed': "Completed",
+        'converged': "Converged",
+        'cancelled': "Cancelled",
+    }.get(stop_reason, "Running")
+    median_error, prob_error = standard_errors(summary, sampling)
+    text = (
+        f"{stopped} after {summary.count:,} simulations. Standard error: median ${median_error:,.2f}, "
+        f"probability ARM is cheaper {prob_error:.2f} points."
+    )
+    if sampling != "random":
+        errors = summary.replicates.standard_errors()
+        efficiency = sampling_efficiency(summary)
+        text += (
+            f"\n{sampling.capitalize()} sampling ({summary.replicates.num_blocks} blocks): standard errors of the 95% "
+            f"interval bounds ${errors['arm_ci_low']:,.2f} (low) and ${errors['arm_ci_high']:,.2f} (high); as precise as "
+            f"{efficiency['arm_median']:.1f}x (median) and {efficiency['prob_arm_cheaper']:.1f}x (probability) "
+            f"as many independent paths."
+        )
+    return text
+
+
+def format_horizons(horizons, sampling="random", years=None):
+    """Format a HorizonSummary as a table of the probability the ARM is cheaper and the
+    mean savings when the loan is repaid (sold or refinanced) after each holding period.
+    years limits the table to the given holding periods; all by default.
+    """
+    lines = ["Years  Fixed-Rate Cost   P(ARM cheaper)   Mean ARM Savings"]
+    for row in horizons.rows(sampling):
+        if years is not None and row['years'] not in years:
+            continue
+        lines.append(
+            f"{row['years']:>5}  ${row['fixed_cost']:>14,.0f}  {row['prob_arm_cheaper']:>6.1f}% ± {row['prob_standard_error']:.1f}"
+            f"  ${row['mean_savings']:>15,.0f}"
+        )
+    breakeven = horizons.breakeven_years()
+    if breakeven:
+        lines.append("The more likely cheaper loan changes for sales after "
+                     + ", ".join(f"{year} years" for year in breakeven) + ".")
+    return "\n".join(lines)
+
+
+def sensitivity_rows(sensitivities, fixed_rate_derivative, sampling="random"):
+    """One dict per input for a SensitivitySummary: the change in the mean ARM cost, its
+    standard error and 95% confidence interval, and the change in the mean savings with
+    the ARM, all per percentage point. fixed_rate_derivative, from
+    fixed_cost_rate_derivative, adds an exact row for the fixed rate.
+    """
+    rows = []
+    for parameter, mean, error in zip(sensitivities.parameters, sensitivities.means(),
+                                      sensitivities.standard_errors(sampling)):
+        rows.append({
+            'parameter': parameter, 'arm_cost': float(mean), 'standard_error': float(error),
+            'ci_low': float(mean - 1.96 * error), 'ci_high': float(mean + 1.96 * error), 'mean_savings': float(-mean),
+        })
+    rows.append({
+        'parameter': 'fixed_rate', 'arm_cost': 0.0, 'standard_error': 0.0, 'ci_low': 0.0, 'ci_high': 0.0,
+        'mean_savings': float(fixed_rate_derivative),
+    })
+    return rows
+
+
+def format_sensitivities(sensitivities, fixed_rate_derivative, sampling="random"):
+    """Format sensitivity_rows as a table of the effect of raising each input by one percentage point."""
+    labels = {
+        'arm_initial_rate': "ARM initial rate",
+        'arm_margin': "ARM margin",
+        'initial_cap': "Initial cap",
+        'annual_cap': "Annual cap",
+        'lifetime_cap': "Lifetime cap",
+        'fixed_rate': "Fixed rate",
+    }
+    lines = ["Per +1 point of      Mean ARM Cost   95% Confidence Interval      Mean ARM Savings"]
+    for row in sensitivity_rows(sensitivities, fixed_rate_derivative, sampling):
+        interval = (f"${row['ci_low']:>10,.0f} to ${row['ci_high']:>10,.0f}" if row['standard_error']
+                    else f"{'(exact)':>26}")
+        lines.append(f"{labels.get(row['parameter'], row['parameter']):<16}  ${row['arm_cost']:>+12,.0f}   {interval}"
+                     f"   ${row['mean_savings']:>+15,.0f}")
+    return "\n".join(lines)
@@ -0,0 +1,269 @@
+"""Optional compiled kernels for the sequential loops of the batch engine.
+
+The index floor, the rate caps, the amortization and the synthetic rate process all
+carry state from one year (or month) to the next, so NumPy has to step through
+time in Python. With Numba installed, these kernels compile each loop to machine code
+and run in parallel over paths. Otherwise the NumPy code in arm_engine and
+synthetic_rates is used.
+
+The backend is chosen by the MORTGAGE_KERNEL_BACKEND environment variable
+('auto', 'numba' or 'numpy'; 'auto' uses Numba when it is installed) or at
+runtime with set_backend(). The compiled code is cached on disk next to this module,
+or in Numba's user-wide cache directory if that is not writable. Later launches
+load it instead of compiling again.
+
+Numba's TBB threading layer deadlocks at exit once the process has forked,
+which the process pool does. Unless NUMBA_THREADING_LAYER says otherwise, the
+fork-safe workqueue layer is used instead. That layer does not allow concurrent
+launches, so kernel calls are serialized with a lock.
+
+Both backends draw the same random numbers. Results agree to rounding, because
+exp and log1p are implemented differently; tests/test_kernels.py checks every
+kernel against NumPy.
+"""
+import math
+import os
+import threading
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+else:
+    if "NUMBA_THREADING_LAYER" not in os.environ:
+        numba.config.THREADING_LAYER = "workqueue"
+
+KERNEL_BACKEND_ENV = "MORTGAGE_KERNEL_BACKEND"
+KERNEL_BACKENDS = ("numpy", "numba")
+
+_backend = None
+_kernel_lock = threading.Lock()
+
+
+def available_backends():
+    """The backends that can be used in this environment."""
+    return KERNEL_BACKENDS if numba is not None else ("numpy",)
+
+
+def resolve_backend(name):
+    """The backend that name selects. 'auto', and 'numba' without Numba installed, fall back to NumPy."""
+    name = (name or "auto").lower()
+    if name not in KERNEL_BACKENDS + ("auto",):
+        raise ValueError(f"Unknown kernel backend {name!r}; expected one of auto, {', '.join(KERNEL_BACKENDS)}")
+    if name == "numpy" or numba is None:
+        return "numpy"
+    return "numba"
+
+
+def get_backend():
+    """The backend in use, taken from MORTGAGE_KERNEL_BACKEND on first use."""
+    global _backend
+    if _backend is None:
+        _backend = resolve_backend(os.environ.get(KERNEL_BACKEND_ENV))
+    return _backend
+
+
+def set_backend(name):
+    """Switch backends and return the one selected. Worker processes started
+    afterwards use it as well.
+    """
+    global _backend
+    _backend = resolve_backend(name)
+    os.environ[KERNEL_BACKEND_ENV] = _backend
+    return _backend
+
+
+def use_compiled():
+    return get_backend() == "numba"
+
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _floor_index_paths(sampled_changes, current_index_rate, floor):
+        """Index paths from sampled annual changes, floored at floor each year."""
+        num_paths, num_years = sampled_changes.shape
+        index_paths = np.empty((num_paths, num_years))
+        for path in numba.prange(num_paths):
+            index_rate = current_index_rate
+            for year in range(num_years):
+                index_rate = max(floor, index_rate + sampled_changes[path, year])
+                index_paths[path, year] = index_rate
+        return index_paths
+
+    @numba.njit(parallel=True, cache=True)
+    def _cap_arm_rates(index_paths, initial_rate, margin, initial_cap, annual_cap, lifetime_cap, years,
+                      fixed_years):
+        """Annual ARM rates from index paths subject to the rate caps, as arm_engine.apply_arm_caps."""
+        num_paths = index_paths.shape[0]
+        adjustments = min(index_paths.shape[1], years - fixed_years)
+        lifetime_max = initial_rate + lifetime_cap
+        annual_rates = np.empty((num_paths, years))
+        for path in numba.prange(num_paths):
+            for year in range(years):
+                annual_rates[path, year] = initial_rate
+            last_arm_rate = initial_rate
+            for year in range(adjustments):
+                max_increase = initial_cap if year == 0 else annual_cap
+                new_arm_rate = min(index_paths[path, year] + margin, last_arm_rate + max_increase)
+                new_arm_rate = min(new_arm_rate, lifetime_max)
+                annual_rates[path, fixed_years + year] = new_arm_rate
+                last_arm_rate = new_arm_rate
+        return annual_rates
+
+    @numba.njit(cache=True)
+    def _amortize_year(remaining_principal, current_payment, rate, year, years, fixed_years):
+        """One year of the closed-form yearly blocks of arm_engine.amortize_arm_yearly, shared by the
+        amortization kernels. Returns the payment for the year, the balance at its end, the growth
+        of a balance over the year, and over the remaining term if the payment was recalculated
+        at a nonzero rate (else 0).
+        """
+        remaining_months = 12 * (years - year)
+        log_growth = math.log1p(rate)
+        annual_growth = math.exp(12 * log_growth)
+        term_growth = 0.0
+
+        if year == 0 or year >= fixed_years:
+            if rate == 0:
+                current_payment = remaining_principal * (1 / remaining_months)
+            else:
+                term_growth = math.exp(remaining_months * log_growth)
+                current_payment = remaining_principal * (rate * term_growth / (term_growth - 1))
+
+        payment_growth = 12.0 if rate == 0 else (annual_growth - 1) / rate
+        remaining_principal = remaining_principal * annual_growth - current_payment * payment_growth
+        if remaining_principal < 0.01:
+            remaining_principal = 0.0
+        return current_payment, remaining_principal, annual_growth, term_growth
+
+    @numba.njit(parallel=True, cache=True)
+    def _amortize_horizons(principal, monthly_rates, fixed_years):
+        """Cost of each path if the loan is repaid after every year, as arm_engine.amortize_arm_horizons.
+        The last column is the total paid.
+        """
+        num_paths, years = monthly_rates.shape
+        horizon_costs = np.empty((num_paths, years))
+        for path in numba.prange(num_paths):
+            remaining_principal = principal
+            paid = 0.0
+            current_payment = 0.0
+            for year in range(years):
+                current_payment, remaining_principal, _, _ = _amortize_year(
+                    remaining_principal, current_payment, monthly_rates[path, year], year, years, fixed_years)
+                paid += current_payment
+                horizon_costs[path, year] = 12 * paid + remaining_principal
+        return horizon_costs
+
+    @numba.njit(parallel=True, cache=True)
+    def _amortize_adjoint(principal, monthly_rates, fixed_years):
+        """Total paid on each path and its gradient with respect to each monthly rate, as
+        arm_engine.amortize_arm_adjoint.
+        """
+        num_paths, years = monthly_rates.shape
+        total_paid = np.empty(num_paths)
+        rate_gradient = np.empty((num_paths, years))
+        # The forward pass keeps what the backward pass needs, per path and year
+        start_balances = np.empty((num_paths, years))
+        payments = np.empty((num_paths, years))
+        annual_growths = np.empty((num_paths, years))
+        term_growths = np.empty((num_paths, years))
+        for path in numba.prange(num_paths):
+            remaining_principal = principal
+            paid = 0.0
+            current_payment = 0.0
+            for year in range(years):
+                start_balances[path, year] = remaining_principal
+                current_payment, remaining_principal, annual_growth, term_growth = _amortize_year(
+                    remaining_principal, current_payment, monthly_rates[path, year], year, years, fixed_years)
+                payments[path, year] = current_payment
+                term_growths[path, year] = term_growth
+                paid += current_payment
+                # Balances below a cent are set to zero; a negative growth marks the year the
+                # loan was paid off for the backward pass
+                annual_growths[path, year] = -annual_growth if remaining_principal == 0 else annual_growth
+            total_paid[path] = 12 * paid
+
+            balance_adjoint = 0.0
+            payment_carry = 0.0
+            for year in range(years - 1, -1, -1):
+                rate = monthly_rates[path, year]
+                annual_growth = annual_growths[path, year]
+                if annual_growth < 0:
+                    annual_growth = -annual_growth
+                    balance_adjoint = 0.0
+                annual_growth_derivative = 12 * annual_growth / (1 + rate)
+                if rate == 0:
+                    payment_growth = 12.0
+                    payment_growth_derivative = 66.0
+                else:
+                    payment_growth = (annual_growth - 1) / rate
+                    payment_growth_derivative = (annual_growth_derivative * rate - (annual_growth - 1)) / rate ** 2
+
+                payment_adjoint = 12 + payment_carry - balance_adjoint * payment_growth
+                gradient = balance_adjoint * (start_balances[path, year] * annual_growth_derivative
+                                              - payments[path, year] * payment_growth_derivative)
+                balance_adjoint *= annual_growth
+
+                if year == 0 or year >= fixed_years:
+                    remaining_months = 12 * (years - year)
+                    if rate == 0:
+                        payment_factor = 1 / remaining_months
+                        payment_factor_derivative = (remaining_months + 1) / (2 * remaining_months)
+                    else:
+                        term_growth = term_growths[path, year]
+                        term_growth_derivative = remaining_months * term_growth / (1 + rate)
+                        payment_factor = rate * term_growth / (term_growth - 1)
+                        payment_factor_derivative = ((term_growth * (term_growth - 1) - rate * term_growth_derivative)
+                                                     / (term_growth - 1) ** 2)
+                    balance_adjoint += payment_adjoint * payment_factor
+                    gradient += payment_adjoint * start_balances[path, year] * payment_factor_derivative
+                    payment_carry = 0.0
+                else:
+                    payment_carry = payment_adjoint
+                rate_gradient[path, year] = gradient
+        return total_paid, rate_gradient
+
+    @numba.njit(parallel=True, cache=True)
+    def _mean_reverting_rates(noise, start_rates, mean_rate, volatility, mean_reversion, floor):
+        """Monthly rates of the process in synthetic_rates.generate_rate_histories.
+        noise has shape (num_months - 1, num_histories).
+        """
+        num_histories = start_rates.shape[0]
+        num_months = noise.shape[0] + 1
+        rates = np.empty((num_histories, num_months))
+        for history in numba.prange(num_histories):
+            rate = start_rates[history]
+            rates[history, 0] = rate
+            for month in range(1, num_months):
+                noise_term = volatility * noise[month - 1, history] / math.sqrt(12)
+                rate = rate + mean_reversion * (mean_rate - rate) + noise_term
+                rate = max(floor, rate)
+                rates[history, month] = rate
+        return rates
+
+
+def floor_index_paths(sampled_changes, current_index_rate, floor):
+    with _kernel_lock:
+        return _floor_index_paths(sampled_changes, current_index_rate, floor)
+
+
+def cap_arm_rates(index_paths, initial_rate, margin, initial_cap, annual_cap, lifetime_cap, years, fixed_years):
+    with _kernel_lock:
+        return _cap_arm_rates(index_paths, initial_rate, margin, initial_cap, annual_cap, lifetime_cap, years,
+                              fixed_years)
+
+
+def amortize_horizons(principal, monthly_rates, fixed_years):
+    with _kernel_lock:
+        return _amortize_horizons(principal, monthly_rates, fixed_years)
+
+
+def amortize_adjoint(principal, monthly_rates, fixed_years):
+    with _kernel_lock:
+        return _amortize_adjoint(principal, monthly_rates, fixed_years)
+
+
+def mean_reverting_rates(noise, start_rates, mean_rate, volatility, mean_reversion, floor):
+    with _kernel_lock:
+        return _mean_reverting_rates(noise, start_rates, mean_rate, volatility, mean_reversion, floor)
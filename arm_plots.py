@@ -0,0 +1,241 @@
+"""Result plots for the comparison tool, built to redraw quickly for any number of paths.
+
+PlotData reduces a run to fixed-size arrays (binned costs, a binned KDE and rate path
+percentiles) and is meant to be built off the GUI thread. ComparisonFigure creates
+its axes, artists and legends once and only updates their data on later runs.
+"""
+import numpy as np
+from matplotlib.patches import Patch
+
+# Number of bins the cost distribution is reduced to before smoothing
+KDE_GRID_POINTS = 1024
+
+# Fine bins merged into each displayed histogram bar
+HISTOGRAM_BAR_WIDTH = 16
+
+# Number of individual rate paths drawn
+PLOTTED_RATE_PATHS = 10
+
+# Stored rate paths read for the median and band of the rate plot
+STORED_RATE_PATH_SAMPLE = 20000
+
+
+def rebin(counts, edges, bins):
+    """Merge adjacent histogram bins so there are at most bins of them."""
+    factor = max(1, int(np.ceil(len(counts) / bins)))
+    padded = np.zeros(-(-len(counts) // factor) * factor, dtype=counts.dtype)
+    padded[:len(counts)] = counts
+    merged = padded.reshape(-1, factor).sum(axis=1)
+    width = (edges[-1] - edges[0]) / len(counts) * factor
+    return merged, edges[0] + width * np.arange(len(merged) + 1)
+
+
+def binned_kde(counts, edges, bandwidth):
+    """Gaussian kernel density estimate of binned data, by FFT convolution.
+    Returns the smoothed counts per bin, which sum to the total of counts.
+    """
+    width = edges[1] - edges[0]
+    if bandwidth <= 0 or counts.sum() == 0:
+        return counts.astype(float)
+
+    reach = int(np.ceil(4 * bandwidth / width))
+    offsets = np.arange(-reach, reach + 1) * width
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    kernel /= kernel.sum()
+
+    size = len(counts) + len(kernel) - 1
+    smoothed = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size)
+    return np.maximum(smoothed[reach:reach + len(counts)], 0)
+
+
+class PlotData:
+    """Everything ComparisonFigure draws, reduced to arrays whose size does not depend
+    on the number of paths.
+
+    The cost distribution is taken from arm_costs, or for streaming runs from
+    cost_histogram, a FixedBinHistogram of the costs. summary is a dict as returned by
+    arm_engine.summarize_arm_costs.
+    """
+
+    def __init__(self, fixed_cost, fixed_rate, arm_initial_rate, loan_term, summary, arm_rate_paths,
+                 arm_costs=None, cost_histogram=None):
+        self.fixed_cost = fixed_cost
+        self.fixed_rate = fixed_rate
+        self.arm_initial_rate = arm_initial_rate
+        self.loan_term = loan_term
+        self.arm_median = summary['arm_median']
+        self.arm_ci_low = summary['arm_ci_low']
+        self.arm_ci_high = summary['arm_ci_high']
+        self.prob_arm_cheaper = summary['prob_arm_cheaper']
+
+        # Fine histogram of the costs over the range they actually cover
+        if cost_histogram is not None:
+            occupied = np.flatnonzero(cost_histogram.counts)
+            first, last = occupied[0], occupied[-1] + 1
+            counts, edges = rebin(cost_histogram.counts[first:last], cost_histogram.edges[first:last + 1],
+                                  KDE_GRID_POINTS)
+        else:
+            arm_costs = np.asarray(arm_costs)
+            low, high = float(arm_costs.min()), float(arm_costs.max())
+            if not high > low:
+                low, high = low - 0.5, high + 0.5
+            counts, edges = np.histogram(arm_costs, KDE_GRID_POINTS, (low, high))
+
+        # Scott's rule, as seaborn uses, with the spread taken from the binned costs
+        total = counts.sum()
+        centers = (edges[:-1] + edges[1:]) / 2
+        mean = np.dot(counts, centers) / total
+        std = np.sqrt(np.dot(counts, (centers - mean) ** 2) / total)
+        smoothed = binned_kde(counts, edges, std * total ** -0.2 if total > 1 else 0.0)
+
+        # Bars merge several fine bins; the KDE is scaled to bar heights
+        self.cost_counts, self.cost_edges = rebin(counts, edges, len(counts) // HISTOGRAM_BAR_WIDTH)
+        bar_factor = len(counts) / len(self.cost_counts)
+        self.kde_costs = centers
+        self.kde_counts = smoothed * bar_factor
+
+        # Rate paths: a few individual paths and the median with a 95% band
+        path_array = np.asarray(arm_rate_paths, dtype=float).reshape(-1, loan_term)
+        self.years = np.arange(1, loan_term + 1)
+        self.sample_paths = path_array[:PLOTTED_RATE_PATHS]
+        if len(path_array):
+            self.median_rates = np.median(path_array, axis=0)
+            self.lower_rates = np.percentile(path_array, 2.5, axis=0)
+            self.upper_rates = np.percentile(path_array, 97.5, axis=0)
+        else:
+            self.median_rates = self.lower_rates = self.upper_rates = None
+
+    @classmethod
+    def from_path_store(cls, store, fixed_cost, fixed_rate, arm_initial_rate, summary,
+                        max_rate_paths=STORED_RATE_PATH_SAMPLE):
+        """PlotData read straight from a path_store.PathStore: the costs of every stored
+        path and an evenly spread sample of at most max_rate_paths rate paths.
+        """
+        return cls(fixed_cost, fixed_rate, arm_initial_rate, store.loan_term, summary,
+                   store.sample_rate_paths(max_rate_paths), arm_costs=store.costs)
+
+
+class ComparisonFigure:
+    """The three result plots on a matplotlib Figure, updated in place between runs."""
+
+    def __init__(self, fig):
+        self.fig = fig
+        gs = fig.add_gridspec(4, 2)
+        self.cost_ax = fig.add_subplot(gs[0:2, 0:2])     # Top half
+        self.savings_ax = fig.add_subplot(gs[2, 0:2])    # Bottom left
+        self.rates_ax = fig.add_subplot(gs[3, 0:2])      # Bottom right
+        ax1, ax2, ax3 = self.cost_ax, self.savings_ax, self.rates_ax
+
+        # Plot 1: Distribution of ARM costs
+        self.cost_bars = ax1.stairs([0], [0, 1], fill=True, color='skyblue', alpha=0.6)
+        self.cost_kde, = ax1.plot([], [], color='steelblue', linewidth=1.5)
+        self.fixed_line = ax1.axvline(0, color='r', linestyle='--', linewidth=2, label='Fixed Rate')
+        self.median_line = ax1.axvline(0, color='g', linestyle='-', linewidth=2, label='ARM Median')
+        self.ci_low_line = ax1.axvline(0, color='b', linestyle=':', linewidth=2, label='95% CI Lower')
+        self.ci_high_line = ax1.axvline(0, color='b', linestyle=':', linewidth=2, label='95% CI Upper')
+        ax1.set_xlabel('Total Cost ($)', fontsize=10)
+        ax1.set_ylabel('Frequency', fontsize=10)
+        ax1.set_title('Distribution of 5/1 ARM Total Costs', fontsize=12)
+        ax1.legend(loc='upper right', fontsize=9)
+        ax1.xaxis.set_major_formatter('${x:,.0f}')
+
+        # Plot 2: Savings/Loss with ARM vs Fixed
+        self.savings_bars = ax2.stairs([0], [0, 1], fill=True, color='lightgreen', alpha=0.6)
+        self.savings_kde, = ax2.plot([], [], color='seagreen', linewidth=1.5)
+        ax2.axvline(0, color='r', linestyle='--', linewidth=2, label='Break Even')
+        self.median_savings_line = ax2.axvline(0, color='g', linestyle='-', linewidth=2, label='Median Savings')
+        ax2.set_xlabel('Savings with ARM vs Fixed Rate ($)', fontsize=10)
+        ax2.set_ylabel('Frequency', fontsize=10)
+        ax2.set_title('Potential Savings/Loss with ARM vs Fixed Rate', fontsize=12)
+        ax2.legend(fontsize=9)
+        ax2.xaxis.set_major_formatter('${x:,.0f}')
+
+        # Plot 3: Sample of ARM rate paths
+        self.path_lines = [ax3.plot([], [], alpha=0.3, linewidth=1, color='lightblue')[0]
+                           for _ in range(PLOTTED_RATE_PATHS)]
+        self.median_rate_line, = ax3.plot([], [], color='blue', linewidth=2, label='Median ARM Rate')
+        self.rate_band = None
+        self.fixed_rate_line = ax3.axhline(0, color='r', linestyle='--', linewidth=2, label='Fixed Rate')
+        ax3.set_xlabel('Year', fontsize=10)
+        ax3.set_ylabel('Interest Rate (%)', fontsize=10)
+        ax3.set_title('ARM Interest Rate Projections', fontsize=12)
+        # The band is replaced on every update, so the legend shows a stand-in for it
+        ax3.legend(handles=[self.median_rate_line, self.fixed_rate_line,
+                            Patch(color='blue', alpha=0.1, label='95% CI')], fontsize=9)
+
+        # Key stats and title
+        self.stats_text = fig.text(0.02, 0.01, "", fontsize=9, bbox=dict(facecolor='white', alpha=0.8))
+        self.title = fig.suptitle("", fontsize=14, y=0.98)
+
+        # Laying out the figure is slow, so it is done for the first results and on resizes only
+        self.has_data = False
+        fig.canvas.mpl_connect('resize_event', lambda event: self.layout())
+
+    def layout(self):
+        self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+
+    def update(self, data):
+        """Show the results in data, a PlotData."""
+        ax1, ax2, ax3 = self.cost_ax, self.savings_ax, self.rates_ax
+        peak = max(data.cost_counts.max(), data.kde_counts.max()) * 1.05 or 1
+
+        # Plot 1: costs
+        self.cost_bars.set_data(data.cost_counts, data.cost_edges)
+        self.cost_kde.set_data(data.kde_costs, data.kde_counts)
+        for line, x in ((self.fixed_line, data.fixed_cost), (self.median_line, data.arm_median),
+                        (self.ci_low_line, data.arm_ci_low), (self.ci_high_line, data.arm_ci_high)):
+            line.set_xdata([x, x])
+        low = min(data.cost_edges[0], data.fixed_cost)
+        high = max(data.cost_edges[-1], data.fixed_cost)
+        margin = (high - low) * 0.05
+        ax1.set_xlim(low - margin, high + margin)
+        ax1.set_ylim(0, peak)
+
+        # Plot 2: savings mirror the costs around the fixed-rate cost
+        self.savings_bars.set_data(data.cost_counts[::-1], data.fixed_cost - data.cost_edges[::-1])
+        self.savings_kde.set_data(data.fixed_cost - data.kde_costs, data.kde_counts)
+        self.median_savings_line.set_xdata([data.fixed_cost - data.arm_median] * 2)
+        ax2.set_xlim(data.fixed_cost - high - margin, data.fixed_cost - low + margin)
+        ax2.set_ylim(0, peak)
+
+        # Plot 3: rate paths
+        for i, line in enumerate(self.path_lines):
+            if i < len(data.sample_paths):
+                line.set_data(data.years, data.sample_paths[i])
+            else:
+                line.set_data([], [])
+        if self.rate_band is not None:
+            self.rate_band.remove()
+            self.rate_band = None
+        shown_rates = [data.fixed_rate]
+        if data.median_rates is not None:
+            self.median_rate_line.set_data(data.years, data.median_rates)
+            self.rate_band = ax3.fill_between(data.years, data.lower_rates, data.upper_rates,
+                                              color='blue', alpha=0.1)
+            shown_rates += [data.lower_rates.min(), data.upper_rates.max(), data.sample_paths.min(),
+                            data.sample_paths.max()]
+        else:
+            self.median_rate_line.set_data([], [])
+        self.fixed_rate_line.set_ydata([data.fixed_rate] * 2)
+        ax3.set_xlim(1, max(data.loan_term, 2))
+        rate_margin = max((max(shown_rates) - min(shown_rates)) * 0.05, 0.25)
+        ax3.set_ylim(min(shown_rates) - rate_margin, max(shown_rates) + rate_margin)
+
+        # Key stats and title
+        stats_text = (
+            f"Fixed Rate: {data.fixed_rate:.2f}%\n"
+            f"Initial ARM Rate: {data.arm_initial_rate:.2f}%\n"
+            f"Probability ARM is cheaper: {data.prob_arm_cheaper:.1f}%"
+        )
+        if data.median_rates is not None:
+            stats_text += (
+                f"\n95% Confidence Interval for ARM Rate in Year {data.loan_term}: "
+                f"{data.lower_rates[-1]:.2f}% to {data.upper_rates[-1]:.2f}%"
+            )
+        self.stats_text.set_text(stats_text)
+        # Dollar signs are escaped so they are not read as mathtext
+        self.title.set_text(f'{data.loan_term}-Year Cost Comparison: Fixed vs. 5/1 ARM Mortgage '
+                            f'(\\${int(data.fixed_cost):,} vs. \\${int(data.arm_median):,})')
+        if not self.has_data:
+            self.has_data = True
+            self.layout()
@@ -0,0 +1,48 @@
+"""Throttled progress reporting shared by the GUI and headless callers."""
+import queue
+import threading
+import time
+
+
+class ProgressReporter:
+    """Progress hook that coalesces updates by wall-clock interval.
+
+    Pass an instance as the progress argument of the engine functions; it is called
+    as reporter(done, total) from the simulation. At most one update per
+    min_interval seconds is passed on, plus the final one. Updates go to callback
+    if one is given, and otherwise to a thread-safe queue that a GUI drains from
+    its own event loop with poll().
+    """
+
+    def __init__(self, min_interval=0.05, callback=None):
+        self.min_interval = min_interval
+        self.callback = callback
+        self.updates = queue.Queue()
+        self._last_report = float('-inf')
+        self._lock = threading.Lock()
+
+    def __call__(self, done, total, message=None):
+        now = time.monotonic()
+        with self._lock:
+            if done < total and now - self._last_report < self.min_interval:
+                return
+            self._last_report = now
+
+        if message is None:
+            message = f"Running simulation {done}/{total}..."
+
+        if self.callback is not None:
+            self.callback(done, total, message)
+        else:
+            self.updates.put((done, total, message))
+
+    def poll(self):
+        """Return the most recent queued update as (done, total, message), or None.
+        Older queued updates are discarded.
+        """
+        latest = None
+        while True:
+            try:
+                latest = self.updates.get_nowait()
+            except queue.Empty:
+                return latest
@@ -0,0 +1,84 @@
+"""Variance-reduction sampling modes for the index paths of the ARM simulation.
+
+'random' bootstraps every historical change independently, as the engine always
+has. The other modes spread the draws more evenly over the distribution of
+changes, so fewer paths reach the same precision:
+
+    antithetic   pairs every path with its mirror image: each draw of the k-th
+                 smallest historical change is matched by the k-th largest
+    stratified   Latin hypercube sampling: in every year, the paths of a block
+                 cover each of the equal-probability strata of the changes once
+    sobol        scrambled Sobol sequences (needs SciPy)
+
+The draws are made in independent blocks of SAMPLING_BLOCK_SIZE paths. Paths in a
+block are correlated, so the iid standard errors do not hold. The spread of the
+estimates across blocks does, and arm_stats.ReplicateStatistics uses it to give
+standard errors for every mode.
+
+A Sobol block is only balanced when it holds a full power of two of points, so
+Sobol runs are simulated in chunks of whole blocks (arm_engine.SOBOL_CHUNK_SIZE).
+Only the last block of a run whose path count is not a multiple of
+SAMPLING_BLOCK_SIZE is shorter; it takes the first points of a full-size draw and
+is less evenly spread than the others.
+"""
+from importlib.util import find_spec
+
+import numpy as np
+
+# scipy.stats takes most of a second to import, so it is only imported for Sobol sampling
+HAVE_SCIPY = find_spec("scipy") is not None
+
+SAMPLING_MODES = ("random", "antithetic", "stratified", "sobol")
+
+# Paths per independently sampled block. A power of two keeps Sobol blocks balanced.
+SAMPLING_BLOCK_SIZE = 1024
+
+
+def available_sampling_modes():
+    """The sampling modes that can be used in this environment."""
+    return SAMPLING_MODES if HAVE_SCIPY else tuple(mode for mode in SAMPLING_MODES if mode != "sobol")
+
+
+def check_sampling_mode(mode):
+    """Raise ValueError if mode is unknown or cannot be used here."""
+    if mode not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode {mode!r}; expected one of {', '.join(SAMPLING_MODES)}")
+    if mode not in available_sampling_modes():
+        raise ValueError(f"Sampling mode {mode!r} needs SciPy, which is not installed")
+
+
+def _block_uniforms(mode, num_paths, num_dims, rng):
+    if mode == "antithetic":
+        half = rng.random((num_paths // 2, num_dims))
+        # An odd block gets one unpaired draw
+        return np.vstack([half, 1 - half, rng.random((num_paths % 2, num_dims))])
+    if mode == "stratified":
+        strata = rng.permuted(np.tile(np.arange(num_paths), (num_dims, 1)), axis=1).T
+        return (strata + rng.random((num_paths, num_dims))) / num_paths
+    if mode == "sobol":
+        from scipy.stats import qmc
+        sobol = qmc.Sobol(num_dims, scramble=True, seed=rng)
+        points = sobol.random_base2(int(np.ceil(np.log2(num_paths))) if num_paths > 1 else 0)
+        return points[:num_paths]
+    raise ValueError(f"Unknown sampling mode {mode!r}")
+
+
+def sampling_uniforms(mode, num_paths, num_dims, rng):
+    """Uniform draws in [0, 1] of shape (num_paths, num_dims) for a variance-reduction
+    mode other than 'random'. rng is a numpy.random.Generator.
+    Blocks of SAMPLING_BLOCK_SIZE consecutive paths are sampled independently.
+    """
+    check_sampling_mode(mode)
+    blocks = [_block_uniforms(mode, min(SAMPLING_BLOCK_SIZE, num_paths - start), num_dims, rng)
+              for start in range(0, num_paths, SAMPLING_BLOCK_SIZE)]
+    return np.vstack(blocks) if blocks else np.empty((0, num_dims))
+
+
+def empirical_draws(values, uniforms):
+    """Map uniforms through the empirical quantile function of values. A uniform in
+    [k/n, (k+1)/n) picks the k-th smallest of the n values, so independent uniforms
+    give the same distribution as numpy's choice.
+    """
+    ordered = np.sort(np.asarray(values, dtype=float))
+    index = np.minimum((uniforms * len(ordered)).astype(np.int64), len(ordered) - 1)
+    return ordered[index]
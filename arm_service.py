@@ -0,0 +1,590 @@
+"""Local HTTP service that runs simulations for the browser calculators.
+
+    python -m arm_service --port 8765
+
+The pages in this directory can hand large runs to it instead of simulating them
+in the browser's main thread (see simulation-service.js). It listens on 127.0.0.1
+only and answers only requests addressed to localhost from pages served from
+localhost, so other machines and web sites cannot reach it. Pages opened as files
+have the origin null, which sandboxed frames on any site share, so their requests
+must also carry the token the service prints when it starts (see SERVICE_TOKEN_HEADER).
+
+Endpoints:
+
+    GET  /health            status, data source and worker count
+    POST /simulate/arm      ARM vs fixed-rate simulation, streamed as JSON lines; index_model
+                            selects how the index is drawn (see INDEX_MODELS)
+    POST /scenarios/NAME    a buyer_scenarios analysis (points, down-payment, extra-payment)
+
+Simulation chunks and scenario batches run on one process pool shared by all
+requests. A request identical to one already running attaches to that run instead
+of starting another, and results of seeded runs are kept in a ResultCache.
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import multiprocessing
+import os
+import secrets
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from arm_engine import (calculate_fixed_cost, calculate_fixed_horizon_costs, json_ready,
+                        run_arm_simulation_incremental, standard_errors, validate_inputs)
+from arm_progress import ProgressReporter
+from arm_sampling import check_sampling_mode
+from arm_stats import FixedBinHistogram
+from buyer_scenarios import SCENARIOS, grid_profiles, result_rows, run_scenario
+from rate_data import HistoricalLevelModel, HistoricalRateModel, load_historical_rates
+from result_cache import ResultCache, simulation_key
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+
+# Host names a request may be addressed to. Anything else is refused, so a web page
+# cannot reach the service by pointing its own domain at 127.0.0.1.
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+# Header with the per-launch token that requests from pages opened as files must send
+SERVICE_TOKEN_HEADER = "X-Service-Token"
+
+# Limits on requests
+MAX_REQUEST_LINE = 8192
+MAX_HEADERS = 100
+MAX_BODY_BYTES = 1024 * 1024
+REQUEST_TIMEOUT = 10
+MAX_SIMULATIONS = 10_000_000
+MAX_PROFILES = 100_000
+MAX_SCENARIO_PATHS = 100_000
+MAX_BLOCK_LENGTH = 50
+# Bootstrapped scenarios keep arrays of shape (profiles, paths)
+MAX_SCENARIO_VALUES = 10_000_000
+
+# Runs this large keep only bounded-memory statistics
+STREAMING_THRESHOLD = 1_000_000
+
+# Simulations running at once; further requests wait for a slot
+MAX_CONCURRENT_RUNS = 2
+
+# Seconds between progress and partial-result events of a run
+PROGRESS_INTERVAL = 0.1
+PARTIAL_INTERVAL = 0.25
+
+# Size of the histograms, cost samples and rate path samples sent to the pages
+HISTOGRAM_BINS = 64
+COST_SAMPLE_SIZE = 2000
+RATE_PATH_SAMPLE_SIZE = 500
+
+# Number of scenario results kept in memory
+SCENARIO_CACHE_SIZE = 64
+
+# Parameters of /simulate/arm with the defaults of the calculator page
+ARM_PARAMETERS = {
+    'loan_amount': 300000, 'loan_term': 30, 'fixed_rate': 6.75, 'arm_rate': 6.25, 'arm_margin': 2.75,
+    'initial_cap': 2, 'annual_cap': 2, 'lifetime_cap': 5, 'num_simulations': 1000,
+}
+INTEGER_PARAMETERS = ('loan_term', 'num_simulations')
+
+# How a run draws the index (the index_model parameter of /simulate/arm): 'changes'
+# bootstraps year-over-year changes of the service's data, as arm_cli and the GUI do;
+# 'levels' draws every year's index from the embedded historical levels, as the ARM
+# calculator page simulates in the browser (see rate_data.HistoricalLevelModel)
+INDEX_MODELS = ("changes", "levels")
+
+
+class HTTPError(Exception):
+    """An error to report to the client with the given status."""
+
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+def histogram_snapshot(histogram, bins=HISTOGRAM_BINS):
+    """Counts and edges of a FixedBinHistogram, cut to the range with any paths and
+    merged down to at most bins bins.
+    """
+    nonzero = np.flatnonzero(histogram.counts)
+    if not len(nonzero):
+        return {'counts': [], 'edges': []}
+    first, last = nonzero[0], nonzero[-1] + 1
+    trimmed = FixedBinHistogram(histogram.edges[first], histogram.edges[last], last - first)
+    trimmed.counts = histogram.counts[first:last]
+    counts, edges = trimmed.rebinned(bins)
+    return {'counts': counts.tolist(), 'edges': edges.tolist()}
+
+
+def summary_event(summary, sampling="random"):
+    """Statistics, standard errors and histogram of a StreamingCostSummary."""
+    median_error, prob_error = standard_errors(summary, sampling)
+    return {
+        'simulations_run': summary.count,
+        'statistics': summary.summary(),
+        'median_standard_error': median_error,
+        'prob_standard_error': prob_error,
+        'histogram': histogram_snapshot(summary.histogram),
+    }
+
+
+def result_event(run, sampling="random", cached=False):
+    """The final event of a run. Besides the statistics it holds COST_SAMPLE_SIZE
+    evenly spaced quantiles of the costs, which the pages plot like individual
+    costs, up to RATE_PATH_SAMPLE_SIZE of the kept rate paths, and the comparison
+    for every holding period when the run kept one.
+    """
+    event = summary_event(run.summary, sampling)
+    event.update(event='result', stop_reason=run.stop_reason, cached=cached, statistics=run.statistics())
+
+    quantiles = (np.arange(COST_SAMPLE_SIZE) + 0.5) / COST_SAMPLE_SIZE
+    if run.arm_costs is not None:
+        cost_sample = np.quantile(run.arm_costs, quantiles)
+    else:
+        cost_sample = [run.summary.histogram.quantile(q) for q in quantiles]
+    event['cost_sample'] = np.round(cost_sample, 2).tolist()
+
+    paths = run.arm_rate_paths
+    keep = np.unique(np.linspace(0, len(paths) - 1, min(len(paths), RATE_PATH_SAMPLE_SIZE)).astype(int))
+    event['rate_paths'] = [np.round(paths[i], 4).tolist() for i in keep] if len(paths) else []
+    if run.summary.horizons is not None:
+        event['horizons'] = run.summary.horizons.rows(sampling)
+    return event
+
+
+def scenario_rows(name, values, returns, num_paths, block_length, seed):
+    """Rows of a buyer_scenarios analysis of every combination of values. Runs on the process pool."""
+    profiles = grid_profiles(values)
+    return result_rows(profiles, run_scenario(name, profiles, returns, num_paths, block_length, seed))
+
+
+def is_local_origin(origin):
+    """Whether origin is a page served from localhost. Pages opened as files (origin
+    null) are not; they need the service token, see SimulationService.check_access.
+    """
+    parts = urlsplit(origin)
+    return parts.scheme in ("http", "https") and parts.hostname in LOCAL_HOSTS
+
+
+class SimulationJob:
+    """A simulation in progress and the latest state to send to the clients following it.
+
+    Only the most recent progress and partial-result events are kept, so a slow
+    client skips intermediate updates instead of falling behind. changed is set and
+    replaced by a new asyncio.Event whenever the state changes.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.subscribers = 0
+        self.cancel_event = threading.Event()
+        self.changed = asyncio.Event()
+        self.progress = None
+        self.partial = None
+        self.result = None
+        self.task = None
+
+    def publish(self, kind, event):
+        """Record an event. Runs on the event loop."""
+        setattr(self, kind, event)
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def events(self):
+        """Yield new events until the result, which is the last one."""
+        sent = {'progress': None, 'partial': None, 'result': None}
+        while True:
+            changed = self.changed
+            for kind in sent:
+                event = getattr(self, kind)
+                if event is not None and event is not sent[kind]:
+                    sent[kind] = event
+                    yield event
+            if self.result is not None:
+                return
+            await changed.wait()
+
+
+class SimulationService:
+    """Request handling and shared state of the service.
+
+    rate_model is the index data that simulations with the 'changes' index model
+    bootstrap; 'levels' simulations use HistoricalLevelModel.embedded(). Chunks of every run
+    go to a pool of num_workers processes, started with spawn because the service
+    process has threads of its own.
+    """
+
+    def __init__(self, rate_model, num_workers, cache=None, token=None):
+        self.rate_model = rate_model
+        self.token = token or secrets.token_urlsafe(16)
+        self.index_models = {'changes': rate_model, 'levels': HistoricalLevelModel.embedded()}
+        self.num_workers = num_workers
+        self.cache = cache
+        self.pool = ProcessPoolExecutor(num_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.runs = ThreadPoolExecutor(MAX_CONCURRENT_RUNS, thread_name_prefix="simulation")
+        self.jobs = {}
+        self.scenarios = {}  # key -> future of the rows, while running
+        self.scenario_cache = OrderedDict()
+
+    def close(self):
+        for job in self.jobs.values():
+            job.cancel_event.set()
+        self.runs.shutdown(wait=False, cancel_futures=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        """Serve one request per connection."""
+        headers = {}
+        try:
+            try:
+                method, path, headers, body = await asyncio.wait_for(read_request(reader), REQUEST_TIMEOUT)
+                origin = self.check_access(method, headers)
+                if method == "OPTIONS":
+                    await send_preflight(writer, origin, headers)
+                elif method == "GET" and path == "/health":
+                    await send_json(writer, HTTPStatus.OK, self.health(), origin)
+                elif method == "POST" and path == "/simulate/arm":
+                    await self.simulate_arm(writer, parse_json(body), origin)
+                elif method == "POST" and path.startswith("/scenarios/"):
+                    rows = await self.run_scenario(path[len("/scenarios/"):], parse_json(body))
+                    await send_json(writer, HTTPStatus.OK, rows, origin)
+                else:
+                    raise HTTPError(HTTPStatus.NOT_FOUND)
+            except HTTPError as e:
+                await send_json(writer, e.status, {'error': str(e)}, headers.get('origin'))
+            except asyncio.TimeoutError:
+                await send_json(writer, HTTPStatus.REQUEST_TIMEOUT, {'error': "Request timed out"})
+            except Exception:
+                # A bug in a handler; report it rather than dropping the connection without a response
+                traceback.print_exc()
+                await send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal server error"},
+                                headers.get('origin'))
+        except ConnectionError:
+            pass  # The client went away
+        finally:
+            writer.close()
+
+    def check_access(self, method, headers):
+        """Refuse requests not addressed to localhost or made by pages that are not local.
+        Requests from pages opened as files (origin null) need the service token,
+        except CORS preflights, which browsers send without it.
+        Returns the origin to allow in the CORS headers, or None.
+        """
+        host = urlsplit("//" + headers.get('host', '')).hostname
+        if host not in LOCAL_HOSTS:
+            raise HTTPError(HTTPStatus.FORBIDDEN, "The service only answers requests to localhost")
+        origin = headers.get('origin')
+        if origin == "null":
+            token = headers.get(SERVICE_TOKEN_HEADER.lower(), "")
+            if method != "OPTIONS" and not hmac.compare_digest(token.encode(), self.token.encode()):
+                raise HTTPError(HTTPStatus.FORBIDDEN, "Pages opened as files need the service token")
+        elif origin is not None and not is_local_origin(origin):
+            raise HTTPError(HTTPStatus.FORBIDDEN, "The service only answers local pages")
+        return origin
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'data': self.rate_model.fingerprint,
+            'current_index_rate': self.rate_model.current_index_rate,
+            'index_models': list(INDEX_MODELS),
+            'workers': self.num_workers,
+            'running': len(self.jobs),
+            'scenarios': list(SCENARIOS),
+        }
+
+    def arm_parameters(self, body):
+        """Validated simulation parameters from a request body."""
+        parameters = {}
+        try:
+            for name, default in ARM_PARAMETERS.items():
+                value = body.get(name, default)
+                parameters[name] = int(value) if name in INTEGER_PARAMETERS else float(value)
+            for name in ('seed', 'median_tolerance', 'prob_tolerance'):
+                value = body.get(name)
+                parameters[name] = None if value is None else (int(value) if name == 'seed' else float(value))
+            validate_inputs(*(parameters[name] for name in ARM_PARAMETERS))
+            parameters['sampling'] = body.get('sampling', "random")
+            check_sampling_mode(parameters['sampling'])
+            parameters['index_model'] = body.get('index_model', "changes")
+            if parameters['index_model'] not in INDEX_MODELS:
+                raise ValueError(f"Unknown index model {parameters['index_model']!r}; "
+                                 f"expected one of {', '.join(INDEX_MODELS)}")
+        except (TypeError, ValueError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        if parameters['num_simulations'] > MAX_SIMULATIONS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"At most {MAX_SIMULATIONS:,} simulations per request")
+        if any(parameters[name] is not None and parameters[name] <= 0
+               for name in ('median_tolerance', 'prob_tolerance')):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Standard error tolerances must be positive")
+        parameters['streaming'] = parameters['num_simulations'] > STREAMING_THRESHOLD
+        return parameters
+
+    async def simulate_arm(self, writer, body, origin):
+        """Stream the events of a simulation as JSON lines, starting the run or
+        attaching to an identical one in progress.
+        """
+        parameters = self.arm_parameters(body)
+        # Unseeded runs differ every time, so they are shared while running but not cached
+        key = simulation_key(
+            *(parameters[name] for name in ARM_PARAMETERS), parameters['seed'],
+            self.index_models[parameters['index_model']].fingerprint,
+            median_tolerance=parameters['median_tolerance'], prob_tolerance=parameters['prob_tolerance'],
+            streaming=parameters['streaming'], sampling=parameters['sampling'], sensitivities=False)
+
+        job = self.jobs.get(key)
+        if job is None or job.cancel_event.is_set():
+            job = SimulationJob(key)
+            self.jobs[key] = job
+            job.task = asyncio.create_task(self.run_job(job, parameters))
+
+        job.subscribers += 1
+        try:
+            await send_headers(writer, HTTPStatus.OK, "application/x-ndjson", origin)
+            async for event in job.events():
+                writer.write(json.dumps(json_ready(event), allow_nan=False).encode() + b"\n")
+                await writer.drain()
+        finally:
+            job.subscribers -= 1
+            if job.subscribers == 0 and job.result is None:
+                # Nobody is waiting for the result any more
+                job.cancel_event.set()
+
+    async def run_job(self, job, parameters):
+        loop = asyncio.get_running_loop()
+
+        def publish(kind, event):
+            loop.call_soon_threadsafe(job.publish, kind, event)
+
+        try:
+            result = await loop.run_in_executor(self.runs, self.run_simulation, job, parameters, publish)
+        except Exception as e:
+            result = {'event': 'error', 'message': str(e)}
+        finally:
+            if self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+        job.publish('result', result)
+
+    def run_simulation(self, job, parameters, publish):
+        """Run a simulation, or fetch it from the cache, and return its result event.
+        Runs on a thread of self.runs.
+        """
+        cacheable = self.cache is not None and parameters['seed'] is not None
+        if cacheable:
+            run = self.cache.get(job.key)
+            if run is not None:
+                return dict(result_event(run, parameters['sampling'], cached=True),
+                            index_model=parameters['index_model'])
+
+        def progress(done, total, message):
+            publish('progress', {'event': 'progress', 'done': done, 'total': total})
+
+        last_partial = time.monotonic()
+
+        def on_partial(summary):
+            nonlocal last_partial
+            now = time.monotonic()
+            if summary.count < parameters['num_simulations'] and now - last_partial >= PARTIAL_INTERVAL:
+                last_partial = now
+                publish('partial', dict(summary_event(summary, parameters['sampling']), event='partial'))
+
+        fixed_cost = calculate_fixed_cost(parameters['loan_amount'], parameters['fixed_rate'], parameters['loan_term'])
+        fixed_horizon_costs = calculate_fixed_horizon_costs(
+            parameters['loan_amount'], parameters['fixed_rate'], parameters['loan_term'])
+        run = run_arm_simulation_incremental(
+            fixed_cost, parameters['loan_amount'], parameters['loan_term'], parameters['arm_rate'],
+            parameters['arm_margin'], parameters['initial_cap'], parameters['annual_cap'], parameters['lifetime_cap'],
+            parameters['num_simulations'], self.index_models[parameters['index_model']], self.num_workers,
+            parameters['seed'], ProgressReporter(PROGRESS_INTERVAL, progress), parameters['median_tolerance'],
+            parameters['prob_tolerance'], job.cancel_event, on_partial, parameters['streaming'],
+            executor=self.pool, sampling=parameters['sampling'], fixed_horizon_costs=fixed_horizon_costs)
+        if cacheable and run.stop_reason != 'cancelled':
+            self.cache.put(job.key, run)
+        return dict(result_event(run, parameters['sampling']), index_model=parameters['index_model'])
+
+    async def run_scenario(self, name, body):
+        """Rows of a buyer scenario for every combination of the parameter values in body.
+        Each parameter is a number or a list of numbers; missing ones take the defaults
+        of the calculator pages.
+        """
+        if name not in SCENARIOS:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown scenario {name!r}")
+        _, defaults, _ = SCENARIOS[name]
+        options = ('returns', 'paths', 'block_length', 'seed')
+        unknown = set(body) - set(defaults) - set(options)
+        if unknown:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown parameters: {', '.join(sorted(unknown))}")
+        try:
+            values = {parameter: [float(value) for value in np.atleast_1d(body.get(parameter, default))]
+                      for parameter, default in defaults.items()}
+            returns = body.get('returns', 'historical')
+            num_paths = int(body.get('paths', 10000))
+            block_length = int(body.get('block_length', 1))
+            seed = None if body.get('seed') is None else int(body['seed'])
+        except (TypeError, ValueError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        if returns not in ("historical", "bootstrap"):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "returns must be 'historical' or 'bootstrap'")
+        num_profiles = int(np.prod([len(value) for value in values.values()]))
+        if num_profiles > MAX_PROFILES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"At most {MAX_PROFILES:,} profiles per request")
+        if not 0 < num_paths <= MAX_SCENARIO_PATHS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"paths must be between 1 and {MAX_SCENARIO_PATHS:,}")
+        if not 0 < block_length <= MAX_BLOCK_LENGTH:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"block_length must be between 1 and {MAX_BLOCK_LENGTH}")
+        if returns == "bootstrap" and num_profiles * num_paths > MAX_SCENARIO_VALUES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST,
+                            f"At most {MAX_SCENARIO_VALUES:,} profiles times paths per bootstrapped request")
+
+        # Historical windows and seeded bootstraps give the same rows every time
+        key = json.dumps([name, values, returns, num_paths, block_length, seed])
+        cacheable = returns == "historical" or seed is not None
+        if cacheable and key in self.scenario_cache:
+            self.scenario_cache.move_to_end(key)
+            return self.scenario_cache[key]
+
+        future = self.scenarios.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.pool, scenario_rows, name, values, returns, num_paths, block_length,
+                                          seed)
+            self.scenarios[key] = future
+            future.add_done_callback(lambda _: self.scenarios.pop(key, None))
+        try:
+            rows = await asyncio.shield(future)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+
+        if cacheable:
+            self.scenario_cache[key] = rows
+            while len(self.scenario_cache) > SCENARIO_CACHE_SIZE:
+                self.scenario_cache.popitem(last=False)
+        return rows
+
+
+async def read_request(reader):
+    """Read an HTTP/1.1 request. Returns the method, path, headers (lower-case names) and body."""
+    try:
+        request_line = await reader.readuntil(b"\r\n")
+        if len(request_line) > MAX_REQUEST_LINE:
+            raise HTTPError(HTTPStatus.REQUEST_URI_TOO_LONG)
+        method, target, _ = request_line.decode("latin-1").split()
+
+        headers = {}
+        while True:
+            line = (await reader.readuntil(b"\r\n")).decode("latin-1").strip()
+            if not line:
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request")
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    try:
+        body = await reader.readexactly(length) if length > 0 else b""
+    except asyncio.IncompleteReadError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Incomplete request body")
+    return method.upper(), urlsplit(target).path, headers, body
+
+
+def parse_json(body):
+    try:
+        value = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON")
+    if not isinstance(value, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+    return value
+
+
+def cors_headers(origin):
+    # check_access has already refused requests from origin null without the token
+    if origin is None or not (origin == "null" or is_local_origin(origin)):
+        return []
+    return [("Access-Control-Allow-Origin", origin), ("Vary", "Origin")]
+
+
+async def send_headers(writer, status, content_type, origin=None, extra_headers=()):
+    """Start a response. Without a Content-Length among extra_headers the body runs until the connection closes."""
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {content_type}",
+             "Cache-Control: no-store", "Connection: close"]
+    lines += [f"{name}: {value}" for name, value in cors_headers(origin) + list(extra_headers)]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+
+
+async def send_json(writer, status, value, origin=None):
+    body = json.dumps(json_ready(value), allow_nan=False).encode()
+    await send_headers(writer, status, "application/json", origin, [("Content-Length", len(body))])
+    writer.write(body)
+    await writer.drain()
+
+
+async def send_preflight(writer, origin, headers):
+    """Answer a CORS preflight request from a local page."""
+    extra_headers = [("Access-Control-Allow-Methods", "GET, POST, OPTIONS"),
+                     ("Access-Control-Allow-Headers", f"Content-Type, {SERVICE_TOKEN_HEADER}"),
+                     ("Access-Control-Max-Age", 600), ("Content-Length", 0)]
+    # Chrome asks before letting pages reach the local network
+    if headers.get('access-control-request-private-network') == "true":
+        extra_headers.append(("Access-Control-Allow-Private-Network", "true"))
+    await send_headers(writer, HTTPStatus.NO_CONTENT, "text/plain", origin, extra_headers)
+
+
+async def serve(service, port=SERVICE_PORT):
+    server = await asyncio.start_server(service.handle_connection, SERVICE_HOST, port)
+    print(f"Simulation service listening on http://{SERVICE_HOST}:{port}", file=sys.stderr)
+    print(f"Pages opened as files can use it when opened with #service-token={service.token} "
+          f"after the file name", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m arm_service",
+        description="Serve simulations to the calculator pages from this machine (127.0.0.1 only).")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help=f"port to listen on (default: {SERVICE_PORT})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of CPUs)")
+    parser.add_argument("--data", choices=["live", "embedded", "synthetic"], default="live",
+                        help="historical index data to sample from (default: live, falling back to embedded)")
+    parser.add_argument("--no-cache", action="store_true", help="do not reuse or store results of seeded runs")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers <= 0:
+        parser.error("Number of worker processes must be positive")
+
+    historical_rates = load_historical_rates(args.data, status=lambda message: print(message, file=sys.stderr))
+    service = SimulationService(HistoricalRateModel(historical_rates), args.workers,
+                                None if args.no_cache else ResultCache())
+    try:
+        asyncio.run(serve(service, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
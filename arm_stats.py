@@ -0,0 +1,553 @@
+"""Bounded-memory, mergeable statistics for very large ARM simulations."""
+import numpy as np
+
+from arm_sampling import SAMPLING_BLOCK_SIZE
+
+# Resolution of the cost histogram used for quantiles and plots
+COST_HISTOGRAM_BINS = 8192
+
+# Number of simulated rate paths kept for visualization
+RATE_PATH_RESERVOIR_SIZE = 1000
+
+
+class RunningMoments:
+    """Count, mean, variance, minimum and maximum of a stream of values."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if len(values):
+            batch = RunningMoments()
+            batch.count = len(values)
+            batch.mean = float(np.mean(values))
+            batch.m2 = float(np.sum((values - batch.mean) ** 2))
+            batch.min = float(np.min(values))
+            batch.max = float(np.max(values))
+            self.merge(batch)
+
+    def merge(self, other):
+        """Combine with moments of another stream (Chan et al. parallel update)."""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        """Population standard deviation, as np.std."""
+        return float(np.sqrt(self.m2 / self.count)) if self.count else float('nan')
+
+
+class FixedBinHistogram:
+    """Histogram with fixed, equal-width bins over [low, high].
+
+    Values outside the range are counted in the first or last bin. Histograms with
+    the same bins can be merged by adding their counts.
+    """
+
+    def __init__(self, low, high, bins=COST_HISTOGRAM_BINS):
+        if not high > low:
+            # Degenerate range, e.g. when every path has the same cost
+            low, high = low - 0.5, high + 0.5
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    @property
+    def low(self):
+        return self.edges[0]
+
+    @property
+    def high(self):
+        return self.edges[-1]
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def update(self, values):
+        bins = len(self.counts)
+        index = ((np.asarray(values) - self.low) * (bins / (self.high - self.low))).astype(np.int64)
+        np.clip(index, 0, bins - 1, out=index)
+        self.counts += np.bincount(index, minlength=bins)
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    def quantile(self, q):
+        """Approximate quantile, interpolating linearly within the bin that holds it."""
+        cumulative = np.cumsum(self.counts)
+        target = q * cumulative[-1]
+        index = min(int(np.searchsorted(cumulative, target, side='left')), len(self.counts) - 1)
+        below = cumulative[index - 1] if index else 0
+        fraction = (target - below) / self.counts[index] if self.counts[index] else 0.0
+        return float(self.edges[index] + fraction * (self.edges[index + 1] - self.edges[index]))
+
+    def rebinned(self, bins):
+        """Counts and edges merged down to at most bins bins, for plotting."""
+        factor = max(1, int(np.ceil(len(self.counts) / bins)))
+        padded = np.zeros(-(-len(self.counts) // factor) * factor, dtype=np.int64)
+        padded[:len(self.counts)] = self.counts
+        counts = padded.reshape(-1, factor).sum(axis=1)
+        width = (self.high - self.low) / len(self.counts) * factor
+        edges = self.low + width * np.arange(len(counts) + 1)
+        return counts, edges
+
+
+class PathReservoir:
+    """Uniform random sample of at most capacity rate paths from a stream (reservoir sampling)."""
+
+    def __init__(self, capacity=RATE_PATH_RESERVOIR_SIZE, seed=None):
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.paths = None
+        self.seen = 0
+
+    def update(self, paths):
+        paths = np.asarray(paths)
+        if self.paths is None:
+            self.paths = np.empty((0, paths.shape[1]))
+
+        # Fill the reservoir first
+        free = min(self.capacity - len(self.paths), len(paths))
+        if free > 0:
+            self.paths = np.vstack([self.paths, paths[:free]])
+        remaining = paths[free:]
+
+        # Then item i of the stream replaces a random slot with probability capacity / (i + 1)
+        if len(remaining):
+            positions = self.seen + free + np.arange(len(remaining))
+            slots = (self.rng.random(len(remaining)) * (positions + 1)).astype(np.int64)
+            accepted = np.flatnonzero(slots < self.capacity)
+            # When a slot is hit more than once only the last replacement survives
+            last_slots, last_index = np.unique(slots[accepted][::-1], return_index=True)
+            self.paths[last_slots] = remaining[accepted[::-1][last_index]]
+
+        self.seen += len(paths)
+
+    def merge(self, other):
+        """Combine with a reservoir over a disjoint stream into a uniform sample of both."""
+        if other.paths is None or not len(other.paths):
+            return
+        if self.paths is None or not len(self.paths):
+            self.paths, self.seen = other.paths.copy(), other.seen
+            return
+
+        size = min(self.capacity, len(self.paths) + len(other.paths))
+        # Number of items drawn from this stream when sampling size items from both
+        from_self = self.rng.hypergeometric(self.seen, other.seen, size)
+        from_self = min(max(from_self, size - len(other.paths)), len(self.paths))
+        keep_self = self.rng.choice(len(self.paths), from_self, replace=False)
+        keep_other = self.rng.choice(len(other.paths), size - from_self, replace=False)
+        self.paths = np.vstack([self.paths[keep_self], other.paths[keep_other]])
+        self.seen += other.seen
+
+
+def _block_sizes(num_values, block_size):
+    # Sampling blocks of a chunk: full blocks and a last, shorter one
+    full = num_values // block_size * block_size
+    sizes = [block_size] * (full // block_size) + ([num_values - full] if full < num_values else [])
+    return np.array(sizes, dtype=np.int64)
+
+
+class BlockMoments:
+    """Mergeable running sums of estimates from independent sampling blocks, for
+    batch-means standard errors in bounded memory.
+
+    For blocks of n_i paths with estimates x_i (one value per statistic), the pooled
+    estimate is the size-weighted mean of the x_i, and its variance is estimated by
+    sum(w_i^2 (x_i - pooled)^2) * B / (B - 1) with w_i = n_i / sum(n_i) over the B
+    blocks. That needs only the number of blocks, sum(n_i), sum(n_i^2), sum(n_i x_i),
+    sum(n_i^2 x_i) and sum(n_i^2 x_i^2). The sums are of deviations from the first
+    estimates seen, to avoid cancellation for estimates far from zero.
+    """
+
+    def __init__(self, width):
+        self.count = 0
+        self.size = 0
+        self.size_squares = 0.0
+        self.shift = np.zeros(width)
+        self.sum = np.zeros(width)
+        self.weighted_sum = np.zeros(width)
+        self.weighted_squares = np.zeros(width)
+
+    def update(self, estimates, sizes):
+        """Add blocks with estimates (one row per block) of sizes paths each."""
+        estimates = np.asarray(estimates, dtype=float)
+        sizes = np.asarray(sizes, dtype=float)
+        if not len(sizes):
+            return
+        batch = BlockMoments(estimates.shape[1])
+        batch.count = len(sizes)
+        batch.size = int(sizes.sum())
+        batch.size_squares = float(sizes @ sizes)
+        batch.shift = estimates[0].copy()
+        deviations = estimates - batch.shift
+        batch.sum = sizes @ deviations
+        batch.weighted_sum = sizes ** 2 @ deviations
+        batch.weighted_squares = sizes ** 2 @ deviations ** 2
+        self.merge(batch)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.shift = other.shift.copy()
+        # Move the sums of other to deviations from self.shift
+        offset = other.shift - self.shift
+        self.weighted_squares += (other.weighted_squares + 2 * offset * other.weighted_sum
+                                  + offset ** 2 * other.size_squares)
+        self.weighted_sum += other.weighted_sum + offset * other.size_squares
+        self.sum += other.sum + offset * other.size
+        self.count += other.count
+        self.size += other.size
+        self.size_squares += other.size_squares
+
+    def means(self):
+        """The size-weighted means of the block estimates."""
+        return self.shift + self.sum / self.size if self.size else np.full(len(self.sum), np.nan)
+
+    def standard_errors(self):
+        """Standard errors of means, from the spread of the blocks. NaN with fewer than two blocks."""
+        if self.count < 2:
+            return np.full(len(self.sum), np.nan)
+        pooled = self.sum / self.size
+        squares = self.weighted_squares - 2 * pooled * self.weighted_sum + pooled ** 2 * self.size_squares
+        variance = np.maximum(squares, 0) / self.size ** 2 * self.count / (self.count - 1)
+        return np.sqrt(variance)
+
+    def to_array(self):
+        """The state as one array, for StreamingCostSummary.to_arrays."""
+        return np.vstack([np.full(len(self.sum), self.count), np.full(len(self.sum), self.size),
+                          np.full(len(self.sum), self.size_squares), self.shift, self.sum,
+                          self.weighted_sum, self.weighted_squares])
+
+    @classmethod
+    def from_array(cls, array):
+        moments = cls(array.shape[1])
+        count, size, size_squares = array[:3, 0]
+        moments.count, moments.size, moments.size_squares = int(count), int(size), float(size_squares)
+        moments.shift, moments.sum, moments.weighted_sum, moments.weighted_squares = (
+            np.array(row, dtype=float) for row in array[3:])
+        return moments
+
+
+class ReplicateStatistics:
+    """Running moments (see BlockMoments) of estimates from each independently sampled
+    block of paths, for standard errors that hold for every sampling mode in arm_sampling.
+
+    Paths within a block may be correlated by design, but blocks are independent,
+    so the spread of the block estimates gives the error of the pooled ones
+    (the method of batch means). For the quantiles this approximates the error of
+    the pooled quantile by that of the average block quantile.
+    """
+
+    ESTIMATES = ('arm_mean', 'prob_arm_cheaper', 'arm_ci_low', 'arm_median', 'arm_ci_high')
+    QUANTILES = (0.025, 0.5, 0.975)
+
+    def __init__(self, block_size=SAMPLING_BLOCK_SIZE):
+        self.block_size = block_size
+        self.blocks = BlockMoments(len(self.ESTIMATES))
+
+    @property
+    def num_blocks(self):
+        return self.blocks.count
+
+    def update(self, arm_costs, fixed_cost):
+        """Add the blocks of arm_costs, the costs of one chunk of paths in the order they were sampled."""
+        arm_costs = np.asarray(arm_costs, dtype=float)
+        full = len(arm_costs) // self.block_size * self.block_size
+        blocks = [arm_costs[:full].reshape(-1, self.block_size)]
+        if full < len(arm_costs):
+            blocks.append(arm_costs[np.newaxis, full:])
+
+        for block in blocks:
+            if not block.size:
+                continue
+            estimates = np.column_stack([
+                block.mean(axis=1),
+                np.mean(block < fixed_cost, axis=1) * 100,
+                np.quantile(block, self.QUANTILES, axis=1).T,
+            ])
+            self.blocks.update(estimates, np.full(len(block), block.shape[1]))
+
+    def merge(self, other):
+        self.blocks.merge(other.blocks)
+
+    def standard_errors(self):
+        """Standard error of each estimate in ESTIMATES, from the size-weighted spread of
+        the block estimates. NaN with fewer than two blocks.
+        """
+        return dict(zip(self.ESTIMATES, self.blocks.standard_errors().tolist()))
+
+
+class HorizonSummary:
+    """How the ARM compares with the fixed-rate loan if the borrower sells or
+    refinances after each whole year of the term.
+
+    fixed_costs[h] is the fixed-rate cost of repaying after h + 1 years (payments so
+    far plus the balance), and update takes the matching ARM costs of a chunk of
+    paths from arm_engine.calculate_arm_horizon_costs. The moments of the per-block
+    probabilities are kept as in ReplicateStatistics, so the standard errors hold for
+    every sampling mode.
+    """
+
+    def __init__(self, fixed_costs, block_size=SAMPLING_BLOCK_SIZE):
+        self.fixed_costs = np.asarray(fixed_costs, dtype=float)
+        self.block_size = block_size
+        years = len(self.fixed_costs)
+        self.count = 0
+        self.arm_cheaper = np.zeros(years, dtype=np.int64)
+        self.savings_sum = np.zeros(years)
+        self.blocks = BlockMoments(years)
+
+    @property
+    def years(self):
+        return np.arange(1, len(self.fixed_costs) + 1)
+
+    def update(self, horizon_costs):
+        """Add an array of ARM costs of shape (paths, years), paths in the order they were sampled."""
+        cheaper = horizon_costs < self.fixed_costs
+        self.count += len(horizon_costs)
+        self.arm_cheaper += cheaper.sum(axis=0)
+        self.savings_sum += (self.fixed_costs - horizon_costs).sum(axis=0)
+
+        sizes = _block_sizes(len(horizon_costs), self.block_size)
+        if len(sizes):
+            starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+            self.blocks.update(np.add.reduceat(cheaper, starts, axis=0) / sizes[:, np.newaxis] * 100, sizes)
+
+    def merge(self, other):
+        self.count += other.count
+        self.arm_cheaper += other.arm_cheaper
+        self.savings_sum += other.savings_sum
+        self.blocks.merge(other.blocks)
+
+    def prob_arm_cheaper(self):
+        """Probability (%) that the ARM is cheaper, for each holding period."""
+        return self.arm_cheaper / self.count * 100
+
+    def prob_standard_errors(self, sampling="random"):
+        """Standard errors (percentage points) of prob_arm_cheaper. Independent paths use
+        the binomial error; other sampling modes the spread across sampling blocks.
+        """
+        if sampling == "random":
+            p = self.arm_cheaper / self.count
+            return np.sqrt(p * (1 - p) / self.count) * 100
+        return self.blocks.standard_errors()
+
+    def mean_savings(self):
+        """Mean amount ($) saved with the ARM, for each holding period. Negative when the ARM costs more."""
+        return self.savings_sum / self.count
+
+    def breakeven_years(self):
+        """The holding periods (years) after which the more likely cheaper loan changes,
+        e.g. [7] when the ARM is more likely cheaper if sold within 6 years but not after 7.
+        """
+        favours_arm = self.prob_arm_cheaper() > 50
+        return (np.flatnonzero(favours_arm[1:] != favours_arm[:-1]) + 2).tolist()
+
+    def rows(self, sampling="random"):
+        """One dict per holding period, for output as a table or JSON."""
+        return [
+            {'years': int(year), 'fixed_cost': float(fixed_cost), 'prob_arm_cheaper': float(prob),
+             'prob_standard_error': float(error), 'mean_savings': float(savings)}
+            for year, fixed_cost, prob, error, savings in zip(
+                self.years, self.fixed_costs, self.prob_arm_cheaper(), self.prob_standard_errors(sampling),
+                self.mean_savings())
+        ]
+
+
+class SensitivitySummary:
+    """Means of the pathwise derivatives of the ARM cost with respect to each of
+    parameters, from arm_engine.arm_cost_sensitivities. The moments of the per-block
+    means are kept as in ReplicateStatistics, so the standard errors hold for every
+    sampling mode.
+    """
+
+    def __init__(self, parameters, block_size=SAMPLING_BLOCK_SIZE):
+        self.parameters = tuple(parameters)
+        self.block_size = block_size
+        self.moments = [RunningMoments() for _ in self.parameters]
+        self.blocks = BlockMoments(len(self.parameters))
+
+    @property
+    def count(self):
+        return self.moments[0].count
+
+    def update(self, derivatives):
+        """Add derivatives of shape (len(parameters), paths), paths in the order they were sampled."""
+        for moments, values in zip(self.moments, derivatives):
+            moments.update(values)
+
+        sizes = _block_sizes(derivatives.shape[1], self.block_size)
+        if len(sizes):
+            starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+            self.blocks.update(np.add.reduceat(derivatives, starts, axis=1).T / sizes[:, np.newaxis], sizes)
+
+    def merge(self, other):
+        for moments, other_moments in zip(self.moments, other.moments):
+            moments.merge(other_moments)
+        self.blocks.merge(other.blocks)
+
+    def means(self):
+        """Change in the mean ARM cost ($) per percentage point of each parameter."""
+        return np.array([moments.mean for moments in self.moments])
+
+    def standard_errors(self, sampling="random"):
+        """Standard errors of means. Independent paths use the spread of the derivatives;
+        other sampling modes the spread across sampling blocks.
+        """
+        if sampling == "random":
+            return np.array([moments.std for moments in self.moments]) / np.sqrt(max(self.count - 1, 1))
+        return self.blocks.standard_errors()
+
+
+class StreamingCostSummary:
+    """Bounded-memory summary of simulated ARM costs that can be merged across workers.
+
+    Keeps running moments, a fixed-bin histogram over [cost_low, cost_high], an
+    exact count of paths where the ARM is cheaper than fixed_cost, a reservoir
+    sample of rate paths, and the moments of the sampling block estimates. Given
+    fixed_horizon_costs, it also keeps a HorizonSummary of every holding period, and
+    given sensitivity_parameters, a SensitivitySummary of the cost derivatives.
+    """
+
+    def __init__(self, fixed_cost, cost_low, cost_high, bins=COST_HISTOGRAM_BINS,
+                 reservoir_size=RATE_PATH_RESERVOIR_SIZE, seed=None, fixed_horizon_costs=None,
+                 sensitivity_parameters=None):
+        self.fixed_cost = fixed_cost
+        self.moments = RunningMoments()
+        self.histogram = FixedBinHistogram(cost_low, cost_high, bins)
+        self.arm_cheaper = 0
+        self.rate_paths = PathReservoir(reservoir_size, seed)
+        self.replicates = ReplicateStatistics()
+        self.horizons = HorizonSummary(fixed_horizon_costs) if fixed_horizon_costs is not None else None
+        self.sensitivities = SensitivitySummary(sensitivity_parameters) if sensitivity_parameters else None
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    def update(self, arm_costs, annual_rates=None, horizon_costs=None, cost_derivatives=None):
+        self.moments.update(arm_costs)
+        self.histogram.update(arm_costs)
+        self.arm_cheaper += int(np.sum(np.asarray(arm_costs) < self.fixed_cost))
+        self.replicates.update(arm_costs, self.fixed_cost)
+        if annual_rates is not None:
+            self.rate_paths.update(annual_rates)
+        if horizon_costs is not None:
+            self.horizons.update(horizon_costs)
+        if cost_derivatives is not None:
+            self.sensitivities.update(cost_derivatives)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.histogram.merge(other.histogram)
+        self.arm_cheaper += other.arm_cheaper
+        self.rate_paths.merge(other.rate_paths)
+        self.replicates.merge(other.replicates)
+        if self.horizons is not None and other.horizons is not None:
+            self.horizons.merge(other.horizons)
+        if self.sensitivities is not None and other.sensitivities is not None:
+            self.sensitivities.merge(other.sensitivities)
+
+    def to_arrays(self):
+        """The summary state as a dict of NumPy arrays, e.g. for numpy.savez."""
+        reservoir = self.rate_paths
+        arrays = {
+            'fixed_cost': np.array(self.fixed_cost, dtype=float),
+            'moments': np.array([self.moments.count, self.moments.mean, self.moments.m2,
+                                 self.moments.min, self.moments.max]),
+            'histogram_edges': self.histogram.edges,
+            'histogram_counts': self.histogram.counts,
+            'arm_cheaper': np.array(self.arm_cheaper, dtype=np.int64),
+            'reservoir_paths': reservoir.paths if reservoir.paths is not None else np.empty((0, 0)),
+            'reservoir_seen': np.array([reservoir.capacity, reservoir.seen], dtype=np.int64),
+            'replicate_blocks': self.replicates.blocks.to_array(),
+        }
+        if self.horizons is not None:
+            horizons = self.horizons
+            arrays.update({
+                'horizon_fixed_costs': horizons.fixed_costs,
+                'horizon_arm_cheaper': horizons.arm_cheaper,
+                'horizon_savings_sum': horizons.savings_sum,
+                'horizon_blocks': horizons.blocks.to_array(),
+            })
+        if self.sensitivities is not None:
+            sensitivities = self.sensitivities
+            arrays.update({
+                'sensitivity_parameters': np.array(sensitivities.parameters),
+                'sensitivity_moments': np.array([[moments.count, moments.mean, moments.m2, moments.min, moments.max]
+                                                 for moments in sensitivities.moments]),
+                'sensitivity_blocks': sensitivities.blocks.to_array(),
+            })
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild a summary saved with to_arrays."""
+        edges = arrays['histogram_edges']
+        capacity, seen = (int(value) for value in arrays['reservoir_seen'])
+        summary = cls(float(arrays['fixed_cost']), edges[0], edges[-1], len(edges) - 1, capacity)
+        count, summary.moments.mean, summary.moments.m2, summary.moments.min, summary.moments.max = (
+            float(value) for value in arrays['moments'])
+        summary.moments.count = int(count)
+        summary.histogram.edges = np.array(edges)
+        summary.histogram.counts = np.array(arrays['histogram_counts'], dtype=np.int64)
+        summary.arm_cheaper = int(arrays['arm_cheaper'])
+        if seen:
+            summary.rate_paths.paths = np.array(arrays['reservoir_paths'])
+            summary.rate_paths.seen = seen
+        summary.replicates.blocks = BlockMoments.from_array(np.asarray(arrays['replicate_blocks'], dtype=float))
+        if 'horizon_fixed_costs' in arrays:
+            horizons = summary.horizons = HorizonSummary(arrays['horizon_fixed_costs'])
+            horizons.count = summary.count
+            horizons.arm_cheaper = np.array(arrays['horizon_arm_cheaper'], dtype=np.int64)
+            horizons.savings_sum = np.array(arrays['horizon_savings_sum'], dtype=float)
+            horizons.blocks = BlockMoments.from_array(np.asarray(arrays['horizon_blocks'], dtype=float))
+        if 'sensitivity_parameters' in arrays:
+            sensitivities = summary.sensitivities = SensitivitySummary(arrays['sensitivity_parameters'].tolist())
+            for moments, values in zip(sensitivities.moments, arrays['sensitivity_moments']):
+                count, moments.mean, moments.m2, moments.min, moments.max = (float(value) for value in values)
+                moments.count = int(count)
+            sensitivities.blocks = BlockMoments.from_array(np.asarray(arrays['sensitivity_blocks'], dtype=float))
+        return summary
+
+    def median_standard_error(self, spread=0.05):
+        """Approximate standard error of the median cost, 1 / (2 f(median) sqrt(n)).
+        The density f at the median is estimated from the quantiles spread either side of it.
+        """
+        quantile_gap = self.histogram.quantile(0.5 + spread) - self.histogram.quantile(0.5 - spread)
+        return quantile_gap / (4 * spread * np.sqrt(self.count))
+
+    def prob_standard_error(self):
+        """Standard error of the probability (%) that the ARM is cheaper."""
+        p = self.arm_cheaper / self.count
+        return float(np.sqrt(p * (1 - p) / self.count) * 100)
+
+    def summary(self):
+        """The same statistics as arm_engine.summarize_arm_costs, from the streaming state."""
+        arm_median = self.histogram.quantile(0.5)
+        return {
+            'fixed_cost': float(self.fixed_cost),
+            'arm_mean': self.moments.mean,
+            'arm_median': arm_median,
+            'arm_std': self.moments.std,
+            'arm_min': self.moments.min,
+            'arm_max': self.moments.max,
+            'arm_ci_low': self.histogram.quantile(0.025),
+            'arm_ci_high': self.histogram.quantile(0.975),
+            'prob_arm_cheaper': self.arm_cheaper / self.count * 100,
+            'expected_savings': float(self.fixed_cost - arm_median),
+        }
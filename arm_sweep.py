@@ -0,0 +1,265 @@
+"""Sweep the 5/1 ARM vs fixed-rate comparison over a grid of scenarios.
+
+Every grid cell is evaluated on the same sampled index paths (common random
+numbers), so differences between cells are not blurred by sampling noise and the
+paths are only sampled once. For example:
+
+    python -m arm_sweep --fixed-rate 5.5:7.5:0.25 --arm-rate 5:7:0.5 --num-simulations 100000
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from arm_engine import (SIMULATION_CHUNK_SIZE, apply_arm_caps, arm_cost_bounds, calculate_arm_costs,
+                        calculate_fixed_cost, draw_index_scenarios, sample_index_paths, validate_inputs)
+from arm_progress import ProgressReporter
+from arm_stats import COST_HISTOGRAM_BINS, FixedBinHistogram
+from rate_data import HistoricalRateModel, load_historical_rates
+from value_ranges import parse_values
+
+# Order of the ARM parameters in a grid cell
+ARM_PARAMETERS = ('arm_rate', 'arm_margin', 'initial_cap', 'annual_cap', 'lifetime_cap')
+
+# Axis labels of the swept parameters
+PARAMETER_LABELS = {
+    'fixed_rate': 'Fixed Rate (%)',
+    'arm_rate': '5/1 ARM Initial Rate (%)',
+    'arm_margin': 'ARM Margin (%)',
+    'initial_cap': 'Initial Cap (%)',
+    'annual_cap': 'Annual Cap (%)',
+    'lifetime_cap': 'Lifetime Cap (%)',
+}
+
+
+def sweep_chunk(annual_changes, current_index_rate, loan_amount, loan_term, arm_cells, cost_bounds,
+                fixed_costs, num_paths, seed_sequence, bins=COST_HISTOGRAM_BINS, index_scenarios=None):
+    """Evaluate every ARM cell on one chunk of shared index paths.
+
+    Returns the cost histogram counts of each cell, shape (cells, bins), and the
+    number of paths cheaper than each fixed-rate cost, shape (cells, fixed costs).
+    The index paths are drawn exactly as simulate_arm_chunk draws them.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    index_paths = None
+    if index_scenarios is not None:
+        index_paths = draw_index_scenarios(index_scenarios, num_paths, loan_term - 5, rng)
+    elif annual_changes is not None:
+        index_paths = sample_index_paths(annual_changes, current_index_rate, num_paths, loan_term - 5, rng)
+
+    counts = np.zeros((len(arm_cells), bins), dtype=np.int64)
+    cheaper = np.zeros((len(arm_cells), len(fixed_costs)), dtype=np.int64)
+    for i, (arm_rate, arm_margin, initial_cap, annual_cap, lifetime_cap) in enumerate(arm_cells):
+        if index_paths is None:
+            annual_rates = np.full((num_paths, loan_term), float(arm_rate))
+        else:
+            annual_rates = apply_arm_caps(index_paths, arm_rate, arm_margin, initial_cap, annual_cap,
+                                          lifetime_cap, loan_term)
+        arm_costs = np.sort(calculate_arm_costs(loan_amount, annual_rates))
+
+        histogram = FixedBinHistogram(*cost_bounds[i], bins)
+        histogram.update(arm_costs)
+        counts[i] = histogram.counts
+        cheaper[i] = np.searchsorted(arm_costs, fixed_costs, side='left')
+
+    return counts, cheaper
+
+
+def run_arm_sweep(loan_amount, loan_term, fixed_rates, arm_rates, arm_margins, initial_caps, annual_caps,
+                  lifetime_caps, num_simulations, rate_model=None, num_workers=1, seed=None, progress=None):
+    """Compare fixed and ARM mortgages for every combination of the given parameter values.
+
+    Paths are chunked and seeded as in arm_engine.iter_arm_chunks, and every cell
+    uses the same index paths, so a cell sees the same paths as a single run with
+    that seed. Medians come from a FixedBinHistogram of each cell's costs; the
+    probability the ARM is cheaper is exact.
+    Returns a list of dicts, one per cell, in the order of itertools.product over
+    fixed_rates, arm_rates, arm_margins, initial_caps, annual_caps, lifetime_caps.
+    """
+    arm_cells = list(itertools.product(arm_rates, arm_margins, initial_caps, annual_caps, lifetime_caps))
+    fixed_costs = np.array([calculate_fixed_cost(loan_amount, fixed_rate, loan_term) for fixed_rate in fixed_rates])
+    cost_bounds = [arm_cost_bounds(loan_amount, loan_term, arm_rate, arm_margin, lifetime_cap)
+                   for arm_rate, arm_margin, _, _, lifetime_cap in arm_cells]
+
+    annual_changes = None
+    current_index_rate = None
+    index_scenarios = None
+    if rate_model is not None:
+        annual_changes = rate_model.annual_changes
+        current_index_rate = rate_model.current_index_rate
+        index_scenarios = rate_model.index_scenarios
+
+    chunk_starts = range(0, num_simulations, SIMULATION_CHUNK_SIZE)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunk_starts))
+    chunk_args = [
+        (annual_changes, current_index_rate, loan_amount, loan_term, arm_cells, cost_bounds, fixed_costs,
+         min(SIMULATION_CHUNK_SIZE, num_simulations - start), seed_sequence, COST_HISTOGRAM_BINS,
+         index_scenarios)
+        for start, seed_sequence in zip(chunk_starts, seed_sequences)
+    ]
+
+    histograms = [FixedBinHistogram(*bounds) for bounds in cost_bounds]
+    cheaper = np.zeros((len(arm_cells), len(fixed_costs)), dtype=np.int64)
+    completed = 0
+
+    num_workers = min(num_workers or 1, len(chunk_args))
+    if num_workers <= 1:
+        chunks = (sweep_chunk(*args) for args in chunk_args)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=num_workers)
+        chunks = executor.map(sweep_chunk, *zip(*chunk_args))
+    try:
+        for (chunk_counts, chunk_cheaper), args in zip(chunks, chunk_args):
+            for histogram, counts in zip(histograms, chunk_counts):
+                histogram.counts += counts
+            cheaper += chunk_cheaper
+            completed += args[7]
+            if progress is not None:
+                progress(completed, num_simulations)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    results = []
+    for j, fixed_rate in enumerate(fixed_rates):
+        for i, cell in enumerate(arm_cells):
+            arm_median = histograms[i].quantile(0.5)
+            result = {'fixed_rate': fixed_rate}
+            result.update(zip(ARM_PARAMETERS, cell))
+            result.update({
+                'fixed_cost': float(fixed_costs[j]),
+                'arm_median': arm_median,
+                'expected_savings': float(fixed_costs[j] - arm_median),
+                'prob_arm_cheaper': cheaper[i, j] / num_simulations * 100,
+            })
+            results.append(result)
+    return results
+
+
+def format_sweep_table(results):
+    """Format sweep results as a plain-text table, one row per cell."""
+    header = (f"{'Fixed %':>8} {'ARM %':>7} {'Margin':>7} {'Caps':>11} "
+              f"{'Median Savings':>15} {'P(ARM Cheaper)':>15}")
+    lines = [header, '-' * len(header)]
+    for row in results:
+        caps = f"{row['initial_cap']:g}/{row['annual_cap']:g}/{row['lifetime_cap']:g}"
+        lines.append(
+            f"{row['fixed_rate']:>8.3f} {row['arm_rate']:>7.3f} {row['arm_margin']:>7.3f} {caps:>11} "
+            f"{row['expected_savings']:>15,.0f} {row['prob_arm_cheaper']:>14.1f}%"
+        )
+    return "\n".join(lines)
+
+
+def save_sweep_heatmap(results, axes, path):
+    """Save heatmaps of median savings and probability the ARM is cheaper over two sweep axes.
+    axes names the parameters (keys of the result dicts) for the x and y axes.
+    """
+    from matplotlib.figure import Figure
+
+    x_name, y_name = axes
+    x_values = sorted({row[x_name] for row in results})
+    y_values = sorted({row[y_name] for row in results})
+    savings = np.full((len(y_values), len(x_values)), np.nan)
+    probability = np.full_like(savings, np.nan)
+    for row in results:
+        cell = y_values.index(row[y_name]), x_values.index(row[x_name])
+        savings[cell] = row['expected_savings']
+        probability[cell] = row['prob_arm_cheaper']
+
+    fig = Figure(figsize=(12, 5), dpi=100)
+    # Both color scales are centered on break-even
+    savings_limit = np.nanmax(np.abs(savings)) or 1.0
+    panels = (
+        (savings, 'Median Savings with ARM ($)', 'RdYlGn', -savings_limit, savings_limit),
+        (probability, 'Probability ARM is Cheaper (%)', 'RdYlGn', 0, 100),
+    )
+    for position, (values, title, cmap, vmin, vmax) in enumerate(panels, start=1):
+        ax = fig.add_subplot(1, 2, position)
+        image = ax.imshow(values, origin='lower', aspect='auto', cmap=cmap, vmin=vmin, vmax=vmax)
+        fig.colorbar(image, ax=ax)
+        ax.set_xticks(range(len(x_values)), [f"{value:g}" for value in x_values])
+        ax.set_yticks(range(len(y_values)), [f"{value:g}" for value in y_values])
+        ax.set_xlabel(PARAMETER_LABELS[x_name])
+        ax.set_ylabel(PARAMETER_LABELS[y_name])
+        ax.set_title(title, fontsize=12)
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def build_parser():
+    """Argument parser for sweeps; defaults match the GUI entry fields."""
+    parser = argparse.ArgumentParser(
+        prog="python -m arm_sweep",
+        description="Compare a 5/1 ARM against a fixed-rate mortgage over a grid of scenarios. "
+                    "Swept values are given as START:STOP:STEP (stop included) or as a comma-separated list.")
+    parser.add_argument("--loan-amount", type=float, default=300000, help="loan amount ($)")
+    parser.add_argument("--loan-term", type=int, default=30, help="loan term (years)")
+    parser.add_argument("--fixed-rate", type=parse_values, default=[6.75], help="fixed rates (%%)")
+    parser.add_argument("--arm-rate", type=parse_values, default=[6.25], help="5/1 ARM initial rates (%%)")
+    parser.add_argument("--arm-margin", type=parse_values, default=[2.75], help="ARM margins (%%)")
+    parser.add_argument("--initial-cap", type=parse_values, default=[2], help="initial adjustment caps (%%)")
+    parser.add_argument("--annual-cap", type=parse_values, default=[2], help="annual adjustment caps (%%)")
+    parser.add_argument("--lifetime-cap", type=parse_values, default=[5], help="lifetime caps (%%)")
+    parser.add_argument("--num-simulations", type=int, default=1000,
+                        help="number of Monte Carlo simulations shared by every cell")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of CPUs)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--data", choices=["live", "embedded", "synthetic"], default="live",
+                        help="historical index data to sample from (default: live, falling back to embedded)")
+    parser.add_argument("--heatmap", metavar="PATH",
+                        help="save heatmaps over the swept parameters (at most two may vary) to PATH")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--progress", action="store_true", help="report progress on stderr")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    sweep = {name: getattr(args, name) for name in ('fixed_rate',) + ARM_PARAMETERS}
+    try:
+        for values in itertools.product(*sweep.values()):
+            validate_inputs(args.loan_amount, args.loan_term, *values, args.num_simulations)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers <= 0:
+        parser.error("Number of worker processes must be positive")
+
+    swept = [name for name, values in sweep.items() if len(values) > 1]
+    if args.heatmap and not 1 <= len(swept) <= 2:
+        parser.error("--heatmap needs one or two swept parameters")
+
+    historical_rates = load_historical_rates(args.data, status=lambda message: print(message, file=sys.stderr))
+    rate_model = HistoricalRateModel(historical_rates)
+
+    progress = None
+    if args.progress:
+        progress = ProgressReporter(0.5, lambda done, total, message: print(message, file=sys.stderr))
+
+    results = run_arm_sweep(args.loan_amount, args.loan_term, *sweep.values(), args.num_simulations,
+                            rate_model, args.workers, args.seed, progress)
+
+    if args.heatmap:
+        # A single swept parameter is drawn against the fixed rate
+        axes = swept if len(swept) == 2 else (swept[0], 'arm_rate' if swept[0] == 'fixed_rate' else 'fixed_rate')
+        save_sweep_heatmap(results, axes, args.heatmap)
+
+    if args.json:
+        parameters = {name: value for name, value in vars(args).items()
+                      if name not in ("json", "workers", "progress", "heatmap")}
+        json.dump({'parameters': parameters, 'results': results}, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_sweep_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
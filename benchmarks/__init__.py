@@ -0,0 +1 @@
+"""Headless performance benchmarks; see benchmarks.bench_engine."""
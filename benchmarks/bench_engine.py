@@ -0,0 +1,298 @@
+"""Headless benchmarks of the mortgage engine, with a JSON history and regression check.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_engine                  # full matrix
+    python -m benchmarks.bench_engine --quick          # skip the 1M-path cases
+    python -m benchmarks.bench_engine --save-baseline  # store this run as the baseline
+    python -m benchmarks.bench_engine --backend numpy  # force the NumPy kernels
+
+Every run is appended to the history file. Cases whose throughput drops, or whose
+peak memory grows, by more than the tolerance relative to the baseline are
+reported as regressions and the exit status is 1, as are batch costs that drift
+from the month-by-month reference or compiled kernels that drift from NumPy.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import arm_kernels
+from arm_engine import (calculate_arm_cost, calculate_arm_cost_monthly, calculate_arm_costs, calculate_fixed_cost,
+                        calculate_fixed_payment, run_arm_simulation, simulate_arm_rate_paths, simulate_arm_rates,
+                        summarize_arm_costs)
+from rate_data import HistoricalRateModel, load_historical_rates
+from synthetic_rates import generate_rate_histories
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.path.join(BENCHMARK_DIR, "history.json")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+PATH_COUNTS = (1000, 100000, 1000000)
+LOAN_TERMS = (15, 30, 40)
+DATA_SOURCES = ("live", "embedded", "synthetic")
+
+# Parameters shared by every case; the defaults of the GUI
+LOAN_AMOUNT = 300000
+FIXED_RATE = 6.75
+ARM_RATE = 6.25
+ARM_MARGIN = 2.75
+CAPS = (2, 2, 5)
+SEED = 0
+
+# Relative change that counts as a regression
+THROUGHPUT_TOLERANCE = 0.10
+MEMORY_TOLERANCE = 0.20
+
+# Largest acceptable relative difference between the batch and month-by-month costs
+COST_TOLERANCE = 1e-9
+
+
+def measure(function, repeat, items):
+    """Time repeat calls of function and one more call under tracemalloc.
+    items is the number of paths (or calls) one call processes.
+    """
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    return {
+        'items': items,
+        'repeat': repeat,
+        'throughput': items / float(np.median(latencies)),
+        'latency_p50': float(np.percentile(latencies, 50)),
+        'latency_p90': float(np.percentile(latencies, 90)),
+        'latency_p99': float(np.percentile(latencies, 99)),
+        'peak_memory': int(peak),
+    }
+
+
+def kernel_cases(rate_model, repeat):
+    """Benchmarks of the single-path functions and the statistics block."""
+    np.random.seed(SEED)
+    monthly_rates, _ = simulate_arm_rates(rate_model, ARM_RATE, ARM_MARGIN, *CAPS)
+    arm_costs = calculate_arm_costs(
+        LOAN_AMOUNT, simulate_arm_rate_paths(rate_model.annual_changes, rate_model.current_index_rate, ARM_RATE,
+                                             ARM_MARGIN, *CAPS, num_paths=1000000, rng=np.random.default_rng(SEED)))
+    fixed_cost = calculate_fixed_cost(LOAN_AMOUNT, FIXED_RATE, 30)
+
+    def repeated(function, calls):
+        def run():
+            for _ in range(calls):
+                function()
+        return run
+
+    return {
+        'kernel/calculate_fixed_payment': measure(
+            repeated(lambda: calculate_fixed_payment(LOAN_AMOUNT, FIXED_RATE, 30), 10000), repeat, 10000),
+        'kernel/simulate_arm_rates': measure(
+            repeated(lambda: simulate_arm_rates(rate_model, ARM_RATE, ARM_MARGIN, *CAPS), 1000), repeat, 1000),
+        'kernel/calculate_arm_cost': measure(
+            repeated(lambda: calculate_arm_cost(LOAN_AMOUNT, monthly_rates), 1000), repeat, 1000),
+        'kernel/summarize_arm_costs': measure(
+            lambda: summarize_arm_costs(fixed_cost, arm_costs), repeat, len(arm_costs)),
+        'kernel/generate_rate_histories': measure(
+            lambda: generate_rate_histories(10000, 360, rate_model.current_index_rate, shock_probability=0.01,
+                                            rng=np.random.default_rng(SEED)), repeat, 10000),
+    }
+
+
+def simulation_case(rate_model, loan_term, num_paths, repeat, num_workers):
+    def run():
+        run_arm_simulation(LOAN_AMOUNT, loan_term, ARM_RATE, ARM_MARGIN, *CAPS, num_paths, rate_model,
+                           num_workers, SEED)
+    return measure(run, repeat, num_paths)
+
+
+def check_costs(rate_model, loan_term, num_paths=200):
+    """Largest relative difference between calculate_arm_costs and the month-by-month reference."""
+    annual_rates = simulate_arm_rate_paths(
+        rate_model.annual_changes, rate_model.current_index_rate, ARM_RATE, ARM_MARGIN, *CAPS, loan_term,
+        num_paths, np.random.default_rng(SEED))
+    batch = calculate_arm_costs(LOAN_AMOUNT, annual_rates)
+    reference = np.array([calculate_arm_cost_monthly(LOAN_AMOUNT, np.repeat(rates, 12) / 100 / 12)
+                          for rates in annual_rates])
+    return float(np.max(np.abs(batch - reference) / reference))
+
+
+def check_backends(rate_model, loan_term, num_paths=10000):
+    """Largest relative difference between each compiled backend and NumPy, for the
+    ARM costs and the synthetic rate histories drawn from the same seed.
+    """
+    selected = arm_kernels.get_backend()
+    outputs = {}
+    try:
+        for backend in arm_kernels.available_backends():
+            arm_kernels.set_backend(backend)
+            annual_rates = simulate_arm_rate_paths(
+                rate_model.annual_changes, rate_model.current_index_rate, ARM_RATE, ARM_MARGIN, *CAPS, loan_term,
+                num_paths, np.random.default_rng(SEED))
+            histories = generate_rate_histories(100, loan_term * 12, rate_model.current_index_rate,
+                                                shock_probability=0.01, rng=np.random.default_rng(SEED))
+            outputs[backend] = calculate_arm_costs(LOAN_AMOUNT, annual_rates), histories
+    finally:
+        arm_kernels.set_backend(selected)
+
+    reference_costs, reference_histories = outputs.pop("numpy")
+    return {backend: float(max(np.max(np.abs(costs - reference_costs) / reference_costs),
+                               np.max(np.abs(histories - reference_histories) / reference_histories)))
+            for backend, (costs, histories) in outputs.items()}
+
+
+def run_benchmarks(path_counts=PATH_COUNTS, loan_terms=LOAN_TERMS, data_sources=DATA_SOURCES, repeat=5,
+                   num_workers=1, report=print):
+    """Run every case and return the results keyed by case name, the correctness checks,
+    and the data actually used for each source (live data can fall back to embedded).
+    """
+    results = {}
+    checks = {}
+    sources = {}
+    for source in data_sources:
+        messages = []
+        rate_model = HistoricalRateModel(load_historical_rates(source, status=messages.append))
+        sources[source] = messages[-1] if messages else None
+        report(f"Data source {source}: {sources[source]}")
+
+        if source == data_sources[0]:
+            results.update(kernel_cases(rate_model, repeat))
+
+        for loan_term in loan_terms:
+            checks[f"{source}/{loan_term}y"] = check_costs(rate_model, loan_term)
+            for backend, error in check_backends(rate_model, loan_term).items():
+                checks[f"{source}/{loan_term}y/{backend}"] = error
+            for num_paths in path_counts:
+                name = f"simulation/{source}/{loan_term}y/{num_paths}"
+                # Fewer repeats for the slowest cases
+                case_repeat = max(2, repeat // 2) if num_paths >= 1000000 else repeat
+                results[name] = simulation_case(rate_model, loan_term, num_paths, case_repeat, num_workers)
+                report(format_case(name, results[name]))
+    return results, checks, sources
+
+
+def find_regressions(results, baseline, throughput_tolerance=THROUGHPUT_TOLERANCE,
+                     memory_tolerance=MEMORY_TOLERANCE):
+    """Describe every case that got slower or uses more memory than in baseline."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        change = result['throughput'] / previous['throughput'] - 1
+        if change < -throughput_tolerance:
+            regressions.append(f"{name}: throughput {change:+.1%} ({previous['throughput']:,.0f} -> "
+                               f"{result['throughput']:,.0f}/s)")
+        change = result['peak_memory'] / max(previous['peak_memory'], 1) - 1
+        if change > memory_tolerance:
+            regressions.append(f"{name}: peak memory {change:+.1%} ({previous['peak_memory'] / 2**20:,.1f} -> "
+                               f"{result['peak_memory'] / 2**20:,.1f} MiB)")
+    return regressions
+
+
+def format_case(name, result):
+    return (f"{name:<42} {result['throughput']:>14,.0f}/s  p50 {result['latency_p50'] * 1000:>9.2f} ms  "
+            f"p90 {result['latency_p90'] * 1000:>9.2f} ms  peak {result['peak_memory'] / 2**20:>8.1f} MiB")
+
+
+def environment():
+    """Where and on what the benchmarks ran, recorded with each history entry."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BENCHMARK_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'kernel_backend': arm_kernels.get_backend(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path, data):
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_engine",
+                                     description="Benchmark the ARM simulation engine.")
+    parser.add_argument("--quick", action="store_true", help="skip the 1M-path cases")
+    parser.add_argument("--paths", type=int, nargs="+", help="path counts (default: 1000 100000 1000000)")
+    parser.add_argument("--terms", type=int, nargs="+", help="loan terms in years (default: 15 30 40)")
+    parser.add_argument("--data", choices=DATA_SOURCES, nargs="+", help="data sources (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repetitions per case")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes per simulation")
+    parser.add_argument("--backend", choices=("auto",) + arm_kernels.KERNEL_BACKENDS,
+                        help="kernel backend to benchmark (default: MORTGAGE_KERNEL_BACKEND, or auto)")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON history file to append to")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=THROUGHPUT_TOLERANCE,
+                        help="relative throughput drop reported as a regression")
+    args = parser.parse_args(argv)
+    if args.backend:
+        arm_kernels.set_backend(args.backend)
+
+    path_counts = args.paths or [count for count in PATH_COUNTS if not (args.quick and count >= 1000000)]
+    results, checks, sources = run_benchmarks(path_counts, args.terms or LOAN_TERMS, args.data or DATA_SOURCES,
+                                     args.repeat, args.workers)
+    for name in sorted(results):
+        if name.startswith("kernel/"):
+            print(format_case(name, results[name]))
+
+    failures = [f"{name}: results differ from the reference by {error:.2e}"
+                for name, error in checks.items() if error > COST_TOLERANCE]
+
+    entry = {'timestamp': time.time(), 'environment': environment(), 'data_sources': sources,
+             'results': results, 'cost_checks': checks}
+    history = read_json(args.history, [])
+    history.append(entry)
+    write_json(args.history, history)
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"Saved baseline to {args.baseline}")
+        regressions = []
+    else:
+        baseline = read_json(args.baseline, None)
+        if baseline is None:
+            print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+            regressions = []
+        else:
+            regressions = find_regressions(results, baseline, args.tolerance)
+
+    for problem in failures + regressions:
+        print(f"REGRESSION {problem}", file=sys.stderr)
+    return 1 if failures or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
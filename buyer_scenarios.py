@@ -0,0 +1,424 @@
+"""Batch versions of the buyer analyses of the browser tools.
+
+Each analysis compares a mortgage decision against investing the money in the S&P 500:
+- buying discount points (points-vs-invest)
+- the size of the down payment, with PMI (downpayment-vs-invest)
+- making extra payments (mortgage-vs-invest)
+
+Parameters are scalars or arrays with one value per buyer profile. All profiles are
+evaluated against the same return paths in one pass. The month-by-month
+amortization steps through the months and is vectorized across profiles. Investment
+growth is vectorized across profiles and return paths. For example:
+
+    python -m buyer_scenarios points --num-points 0:4:0.5 --planned-ownership 5,10,15
+    python -m buyer_scenarios extra-payment --profiles buyers.csv --returns bootstrap --paths 10000
+
+Percentiles are taken as in the browser tools, as the value at index floor(n * q)
+of the sorted results.
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+
+import numpy as np
+
+from market_data import bootstrap_return_paths, historical_return_windows, load_sp500_returns
+from value_ranges import parse_values
+
+# Down payments compared by down_payment_vs_invest, as in the browser tool
+DOWN_PAYMENTS = (0.05, 0.10, 0.15, 0.20)
+
+# PMI is charged until the loan-to-value ratio falls to this level
+PMI_LTV_LIMIT = 0.80
+PMI_MAX_MONTHS = 360
+
+# Balances below this count as paid off
+PAYOFF_THRESHOLD = 0.01
+
+
+def as_profiles(*values):
+    """Broadcast parameters to float arrays with one value per profile."""
+    return np.broadcast_arrays(*(np.atleast_1d(np.asarray(value, dtype=float)) for value in values))
+
+
+def order_statistic(values, q, axis=-1):
+    """The value at index floor(n * q) of values sorted along axis."""
+    values = np.sort(values, axis=axis)
+    index = min(int(np.floor(values.shape[axis] * q)), values.shape[axis] - 1)
+    return np.take(values, index, axis=axis)
+
+
+def monthly_payment(principal, monthly_rate, num_payments):
+    """Level monthly payment of a loan; principal, monthly_rate and num_payments broadcast."""
+    principal, monthly_rate, num_payments = as_profiles(principal, monthly_rate, num_payments)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (1 + monthly_rate) ** num_payments
+        payment = principal * monthly_rate * growth / (growth - 1)
+    return np.where(monthly_rate == 0, principal / num_payments, payment)
+
+
+def amortize_monthly(principal, monthly_rate, payment, num_months, extra_payment=0.0):
+    """Amortize many loans month by month.
+
+    Each month interest accrues on the balance and payment + extra_payment is paid,
+    until the balance is paid off. Returns the balances, shape (loans, num_months + 1);
+    the interest of each month, shape (loans, num_months); and the month each loan was
+    paid off (num_months if it was not).
+    """
+    principal, monthly_rate, payment, extra_payment = as_profiles(principal, monthly_rate, payment, extra_payment)
+    num_loans = len(principal)
+    balances = np.empty((num_loans, num_months + 1))
+    interest = np.empty((num_loans, num_months))
+    payoff_months = np.full(num_loans, num_months)
+
+    balance = principal.copy()
+    balances[:, 0] = balance
+    for month in range(num_months):
+        interest[:, month] = balance * monthly_rate
+        outstanding = balance > 0
+        balance = balance + interest[:, month] - payment - extra_payment
+
+        paid_off = outstanding & (balance < PAYOFF_THRESHOLD)
+        payoff_months[paid_off] = month + 1
+        balance[balance < PAYOFF_THRESHOLD] = 0
+        balances[:, month + 1] = balance
+
+    return balances, interest, payoff_months
+
+
+def annual_growth(return_paths):
+    """Growth of $1 after each year of the return paths (%), shape (paths, years + 1)."""
+    growth = np.ones((len(return_paths), return_paths.shape[1] + 1))
+    np.cumprod(1 + return_paths / 100, axis=1, out=growth[:, 1:])
+    return growth
+
+
+def monthly_growth(return_paths, num_months):
+    """Growth of $1 after each month, shape (paths, num_months + 1).
+    Each annual return is spread evenly over its months, and the last year is
+    repeated if the paths are shorter than num_months, as in the browser tools.
+    """
+    factors = np.repeat((1 + return_paths / 100) ** (1 / 12), 12, axis=1)
+    if factors.shape[1] < num_months:
+        factors = np.pad(factors, ((0, 0), (0, num_months - factors.shape[1])), mode='edge')
+    growth = np.ones((len(return_paths), num_months + 1))
+    np.cumprod(factors[:, :num_months], axis=1, out=growth[:, 1:])
+    return growth
+
+
+def grow_contributions(contributions, growth, horizons):
+    """Value of monthly contributions invested at the end of each month.
+
+    contributions has shape (profiles, months), growth is from monthly_growth and
+    horizons are the months at which each profile's value is taken. Contributions after
+    a profile's horizon must be zero. Returns an array of shape (profiles, paths).
+    Contributing c in month m and holding to month h grows it by growth[h] /
+    growth[m], so the sum over every month is one matrix product.
+    """
+    discounted = contributions @ (1 / growth[:, 1:contributions.shape[1] + 1]).T
+    return growth[:, horizons].T * discounted
+
+
+def return_paths_for(years, source="historical", num_paths=10000, block_length=1, seed=None):
+    """S&P 500 return paths of years years: every historical window, or bootstrapped paths."""
+    _, returns = load_sp500_returns()
+    if source == "historical":
+        return historical_return_windows(returns, years)
+    return bootstrap_return_paths(returns, num_paths, years, block_length, np.random.default_rng(seed))
+
+
+def points_vs_invest(loan_amount, loan_term, base_rate, points_cost, rate_reduction, num_points,
+                     planned_ownership, return_paths):
+    """Buying discount points versus investing their cost, for every profile.
+
+    Points cost points_cost % of the loan each and lower the rate by rate_reduction.
+    The interest saved over planned_ownership years is compared against the
+    investment's value on each return path. Returns a dict of arrays with one value per profile.
+    """
+    (loan_amount, loan_term, base_rate, points_cost, rate_reduction, num_points,
+     planned_ownership) = as_profiles(loan_amount, loan_term, base_rate, points_cost, rate_reduction, num_points,
+                                      planned_ownership)
+    # A horizon of zero months would index the savings from the end of the array
+    if np.any(planned_ownership * 12 < 1):
+        raise ValueError("Planned ownership period must be at least one month")
+    if np.any(planned_ownership > loan_term):
+        raise ValueError("Planned ownership period cannot exceed loan term")
+
+    points_total = loan_amount * (points_cost / 100) * num_points
+    reduced_rate = base_rate - rate_reduction * num_points
+    if np.any(reduced_rate <= 0):
+        raise ValueError("Reduced interest rate must be positive")
+
+    # Interest paid each month with and without the points
+    horizons = (planned_ownership * 12).astype(int)
+    num_months = int(horizons.max())
+    base_payment = monthly_payment(loan_amount, base_rate / 100 / 12, loan_term * 12)
+    reduced_payment = monthly_payment(loan_amount, reduced_rate / 100 / 12, loan_term * 12)
+    _, base_interest, _ = amortize_monthly(loan_amount, base_rate / 100 / 12, base_payment, num_months)
+    _, reduced_interest, _ = amortize_monthly(loan_amount, reduced_rate / 100 / 12, reduced_payment, num_months)
+    cumulative_savings = np.cumsum(base_interest - reduced_interest, axis=1)
+
+    profiles = np.arange(len(loan_amount))
+    interest_savings = cumulative_savings[profiles, horizons - 1]
+    months = np.arange(1, num_months + 1)
+    broken_even = (cumulative_savings >= points_total[:, np.newaxis]) & (months <= horizons[:, np.newaxis])
+    break_even_months = np.where(broken_even.any(axis=1), months[broken_even.argmax(axis=1)], np.nan)
+    break_even_months[points_total == 0] = 0
+
+    # The points money invested instead, on every return path
+    growth = annual_growth(return_paths)
+    investment = points_total[:, np.newaxis] * growth[:, horizons // 12].T
+
+    return {
+        'points_cost': points_total,
+        'reduced_rate': reduced_rate,
+        'monthly_savings': base_payment - reduced_payment,
+        'interest_savings': interest_savings,
+        'break_even_years': break_even_months / 12,
+        'investment_median': order_statistic(investment, 0.5),
+        'investment_p10': order_statistic(investment, 0.1),
+        'investment_p90': order_statistic(investment, 0.9),
+        'prob_investing_wins': np.mean(investment > interest_savings[:, np.newaxis], axis=1) * 100,
+    }
+
+
+def pmi_dropoff_months(balances, house_price, home_appreciation, down_payment):
+    """Month in which the loan-to-value ratio first reaches PMI_LTV_LIMIT, with the house
+    appreciating monthly. Zero for down payments of 20% or more, and at most PMI_MAX_MONTHS.
+    """
+    months = np.arange(balances.shape[1])
+    monthly_appreciation = (1 + home_appreciation / 100) ** (1 / 12)
+    house_values = house_price[:, np.newaxis] * monthly_appreciation[:, np.newaxis] ** months
+    below_limit = balances / house_values <= PMI_LTV_LIMIT
+    dropoff = np.where(below_limit.any(axis=1), below_limit.argmax(axis=1), balances.shape[1] - 1)
+    return np.where(down_payment >= 1 - PMI_LTV_LIMIT, 0, np.minimum(dropoff, PMI_MAX_MONTHS))
+
+
+def down_payment_vs_invest(house_price, interest_rate, loan_term, simulation_years, home_appreciation, pmi_rate,
+                           monthly_pmi, return_paths, down_payments=DOWN_PAYMENTS):
+    """Net worth after simulation_years for each down payment, for every profile.
+
+    Every buyer starts with enough cash for the largest down payment. A smaller down
+    payment invests the rest in the S&P 500 and pays a larger mortgage and, below 20%
+    down, PMI until the loan-to-value ratio reaches 80%. PMI is monthly_pmi if that
+    is positive, otherwise pmi_rate % of the loan a year. As in the browser tool,
+    differences in monthly outlays are accumulated as cash.
+    Returns a dict of arrays of shape (profiles, down payments), plus the index of
+    the down payment with the highest median net worth of each profile.
+    """
+    (house_price, interest_rate, loan_term, simulation_years, home_appreciation, pmi_rate,
+     monthly_pmi) = as_profiles(house_price, interest_rate, loan_term, simulation_years, home_appreciation,
+                                pmi_rate, monthly_pmi)
+    simulation_years = np.minimum(simulation_years, loan_term).astype(int)
+    horizons = simulation_years * 12
+    num_months = int((loan_term * 12).max())
+    profiles = np.arange(len(house_price))
+    monthly_rate = interest_rate / 100 / 12
+    months = np.arange(1, num_months + 1)
+
+    house_values = house_price * (1 + home_appreciation / 100) ** simulation_years
+    growth = annual_growth(return_paths)[:, simulation_years].T
+    reference = max(down_payments)
+
+    payments, pmi_costs, dropoffs, outlays, equity = [], [], [], [], []
+    for down_payment in down_payments:
+        loan_amount = house_price * (1 - down_payment)
+        payment = monthly_payment(loan_amount, monthly_rate, loan_term * 12)
+        balances, _, _ = amortize_monthly(loan_amount, monthly_rate, payment, num_months)
+
+        pmi = np.where(down_payment >= 1 - PMI_LTV_LIMIT, 0,
+                       np.where(monthly_pmi > 0, monthly_pmi, loan_amount * (pmi_rate / 100) / 12))
+        dropoff = pmi_dropoff_months(balances, house_price, home_appreciation, down_payment)
+        with_pmi = months <= np.minimum(dropoff, horizons)[:, np.newaxis]
+        within_horizon = months <= horizons[:, np.newaxis]
+
+        payments.append(payment)
+        pmi_costs.append(pmi)
+        dropoffs.append(dropoff)
+        outlays.append((payment[:, np.newaxis] * within_horizon + pmi[:, np.newaxis] * with_pmi).sum(axis=1))
+        equity.append(house_values - balances[profiles, horizons])
+
+    net_worth = np.empty((len(house_price), len(down_payments), len(return_paths)))
+    reference_outlay = outlays[list(down_payments).index(reference)]
+    for i, down_payment in enumerate(down_payments):
+        investment = (reference - down_payment) * house_price[:, np.newaxis] * growth
+        net_worth[:, i] = (equity[i] + reference_outlay - outlays[i])[:, np.newaxis] + investment
+
+    median = order_statistic(net_worth, 0.5)
+    return {
+        'monthly_payment': np.stack(payments, axis=1),
+        'monthly_pmi': np.stack(pmi_costs, axis=1),
+        'pmi_dropoff_months': np.stack(dropoffs, axis=1),
+        'net_worth_median': median,
+        'net_worth_p10': order_statistic(net_worth, 0.1),
+        'net_worth_p90': order_statistic(net_worth, 0.9),
+        'best_down_payment': np.asarray(down_payments)[median.argmax(axis=1)],
+    }
+
+
+def extra_payment_vs_invest(loan_amount, interest_rate, extra_payment, return_paths, loan_term=30):
+    """Extra mortgage payments versus investing them, for every profile.
+
+    One strategy pays extra_payment a month on top of the mortgage, then invests the
+    whole payment once the loan is paid off. The other invests extra_payment each
+    month. Net worth at the end of the term includes the house, valued at the loan
+    amount as in the browser tool. Returns a dict of arrays with one value per profile.
+    """
+    loan_amount, interest_rate, extra_payment, loan_term = as_profiles(loan_amount, interest_rate, extra_payment,
+                                                                       loan_term)
+    horizons = (loan_term * 12).astype(int)
+    num_months = int(horizons.max())
+    monthly_rate = interest_rate / 100 / 12
+    payment = monthly_payment(loan_amount, monthly_rate, horizons)
+    _, regular_interest, _ = amortize_monthly(loan_amount, monthly_rate, payment, num_months)
+    _, extra_interest, payoff_months = amortize_monthly(loan_amount, monthly_rate, payment, num_months, extra_payment)
+
+    months = np.arange(1, num_months + 1)
+    within_term = months <= horizons[:, np.newaxis]
+    after_payoff = within_term & (months > payoff_months[:, np.newaxis])
+
+    growth = monthly_growth(return_paths, num_months)
+    invested = grow_contributions(extra_payment[:, np.newaxis] * within_term, growth, horizons)
+    paid_off = grow_contributions((payment + extra_payment)[:, np.newaxis] * after_payoff, growth, horizons)
+    invest_net_worth = invested + loan_amount[:, np.newaxis]
+    payoff_net_worth = paid_off + loan_amount[:, np.newaxis]
+
+    return {
+        'monthly_payment': payment,
+        'payoff_months': payoff_months,
+        'interest_saved': (regular_interest * within_term).sum(axis=1) - (extra_interest * within_term).sum(axis=1),
+        'invest_median': order_statistic(invest_net_worth, 0.5),
+        'invest_p05': order_statistic(invest_net_worth, 0.05),
+        'invest_p95': order_statistic(invest_net_worth, 0.95),
+        'payoff_median': order_statistic(payoff_net_worth, 0.5),
+        'payoff_p05': order_statistic(payoff_net_worth, 0.05),
+        'payoff_p95': order_statistic(payoff_net_worth, 0.95),
+        'prob_investing_wins': np.mean(invest_net_worth > payoff_net_worth, axis=1) * 100,
+    }
+
+
+# Parameters of each analysis with the defaults of the browser tools, and the
+# number of years of returns each profile needs
+SCENARIOS = {
+    'points': (points_vs_invest, {
+        'loan_amount': 300000, 'loan_term': 30, 'base_rate': 6.5, 'points_cost': 1.0, 'rate_reduction': 0.25,
+        'num_points': 2, 'planned_ownership': 10,
+    }, lambda profile: profile['planned_ownership']),
+    'down-payment': (down_payment_vs_invest, {
+        'house_price': 400000, 'interest_rate': 6.5, 'loan_term': 30, 'simulation_years': 10,
+        'home_appreciation': 3.0, 'pmi_rate': 1.5, 'monthly_pmi': 0,
+    }, lambda profile: np.minimum(profile['simulation_years'], profile['loan_term'])),
+    'extra-payment': (extra_payment_vs_invest, {
+        'loan_amount': 300000, 'interest_rate': 6.5, 'extra_payment': 500, 'loan_term': 30,
+    }, lambda profile: profile['loan_term']),
+}
+
+
+def read_profiles(path, defaults):
+    """Read buyer profiles from a CSV file whose columns are parameter names.
+    Missing columns take the value in defaults. Returns a dict of arrays.
+    """
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError(f"No profiles in {path}")
+    unknown = set(rows[0]) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown profile columns: {', '.join(sorted(unknown))}")
+    return {name: np.array([float(row[name]) if name in row else default for row in rows])
+            for name, default in defaults.items()}
+
+
+def grid_profiles(values):
+    """One profile for every combination of the given parameter values. Returns a dict of arrays."""
+    combinations = np.array(list(itertools.product(*values.values())), dtype=float)
+    return {name: combinations[:, i] for i, name in enumerate(values)}
+
+
+def run_scenario(name, profiles, returns="historical", num_paths=10000, block_length=1, seed=None):
+    """Evaluate every profile (a dict of arrays) in one pass.
+    Historical windows are as long as the longest horizon of the profiles.
+    """
+    analysis, _, horizon = SCENARIOS[name]
+    years = int(np.max(horizon(profiles)))
+    return_paths = return_paths_for(years, returns, num_paths, block_length, seed)
+    return analysis(return_paths=return_paths, **profiles)
+
+
+def result_rows(profiles, results, down_payments=DOWN_PAYMENTS):
+    """One dict of parameters and results per profile. Results with a value per down
+    payment get one column each, such as net_worth_median_5%. Missing values, such as
+    a break-even point beyond the horizon, are None.
+    """
+    def value(number):
+        return float(number) if np.isfinite(number) else None
+
+    rows = []
+    for i in range(len(next(iter(profiles.values())))):
+        row = {name: float(values[i]) for name, values in profiles.items()}
+        for name, values in results.items():
+            if values.ndim == 2:
+                row.update({f"{name}_{down_payment:.0%}": value(number)
+                            for down_payment, number in zip(down_payments, values[i])})
+            else:
+                row[name] = value(values[i])
+        rows.append(row)
+    return rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m buyer_scenarios",
+        description="Evaluate many buyer profiles against historical S&P 500 returns. Parameter values are "
+                    "given as START:STOP:STEP (stop included) or as a comma-separated list, and every "
+                    "combination is evaluated, or profiles are read from a CSV file.")
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+    for name, (analysis, defaults, _) in SCENARIOS.items():
+        subparser = subparsers.add_parser(name, help=analysis.__doc__.splitlines()[0])
+        for parameter, default in defaults.items():
+            subparser.add_argument("--" + parameter.replace("_", "-"), type=parse_values, default=[default],
+                                   help=f"(default: {default})")
+        subparser.add_argument("--profiles", metavar="CSV",
+                               help="CSV file with one profile per row; parameters not in it come from the options")
+        subparser.add_argument("--returns", choices=["historical", "bootstrap"], default="historical",
+                               help="every historical window of returns (default), or bootstrapped return paths")
+        subparser.add_argument("--paths", type=int, default=10000, help="number of bootstrapped return paths")
+        subparser.add_argument("--block-length", type=int, default=1,
+                               help="consecutive years per bootstrapped block")
+        subparser.add_argument("--seed", type=int, default=None, help="random seed for bootstrapping")
+        subparser.add_argument("--json", action="store_true", help="print results as JSON instead of CSV")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _, defaults, _ = SCENARIOS[args.scenario]
+    values = {name: getattr(args, name) for name in defaults}
+
+    try:
+        if args.profiles:
+            if any(len(value) > 1 for value in values.values()):
+                parser.error("Parameter ranges cannot be combined with --profiles")
+            profiles = read_profiles(args.profiles, {name: value[0] for name, value in values.items()})
+        else:
+            profiles = grid_profiles(values)
+        results = run_scenario(args.scenario, profiles, args.returns, args.paths, args.block_length, args.seed)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    rows = result_rows(profiles, results)
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    else:
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
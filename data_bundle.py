@@ -0,0 +1,244 @@
+"""Precompiled binary bundle of the embedded historical series, for fast startup.
+
+    python -m data_bundle            rebuild historical-data.bin
+    python -m data_bundle --check    exit with status 1 if it is missing or out of date
+
+The bundle holds the embedded GS1 data points of rate_data, the monthly series
+interpolated from them, the annual index changes the engine samples, the annual
+changes the browser tools sample, and the S&P 500 returns of
+historical-data-stockmarket.js. Those sources stay the ones to edit; the build
+resamples them once with pandas and checks that historical-data.js still has the
+same GS1 points as rate_data.
+
+Layout, all little-endian:
+
+    8 bytes   b"MORTDATA"
+    4 bytes   format version (uint32)
+    4 bytes   header length n (uint32)
+    n bytes   JSON header: source digests and, for every array, its dtype, shape
+              and byte offset from the start of the file
+    arrays    raw values, each starting at a multiple of 8 bytes
+
+so the arrays can be used in place from a memory map, and in the browser as typed
+array views of the fetched buffer (see historical-data-bundle.js). Dates are months
+since January 1970.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+
+import numpy as np
+
+BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historical-data.bin")
+TREASURY_JS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historical-data.js")
+
+BUNDLE_MAGIC = b"MORTDATA"
+
+# Bump when the layout or the meaning of an array changes
+BUNDLE_VERSION = 1
+
+BUNDLE_ALIGNMENT = 8
+
+# Arrays of a bundle and their dtypes
+BUNDLE_ARRAYS = {
+    'gs1_point_months': '<i4',
+    'gs1_point_rates': '<f8',
+    'gs1_months': '<i4',
+    'gs1_rates': '<f8',
+    'gs1_annual_changes': '<f8',
+    'gs1_point_changes': '<f8',
+    'sp500_years': '<i4',
+    'sp500_returns': '<f8',
+}
+
+_TREASURY_ENTRY = re.compile(r"\{\s*date:\s*new Date\('(\d{4}-\d{2}-\d{2})'\)\s*,\s*rate:\s*(-?\d+(?:\.\d+)?)\s*\}")
+
+_PREFIX = struct.Struct("<8sII")
+
+
+def source_digest(value):
+    """SHA-256 of a JSON-serializable value or of bytes, recorded in the bundle to tell when it is out of date."""
+    if not isinstance(value, bytes):
+        value = json.dumps(value, separators=(",", ":")).encode()
+    return hashlib.sha256(value).hexdigest()
+
+
+def _aligned(offset):
+    return -(-offset // BUNDLE_ALIGNMENT) * BUNDLE_ALIGNMENT
+
+
+def write_bundle(path, arrays, sources):
+    """Write arrays (a dict of name to array, with the dtypes of BUNDLE_ARRAYS) and the
+    source digests to path in the bundle layout.
+    """
+    arrays = {name: np.ascontiguousarray(arrays[name], dtype=dtype) for name, dtype in BUNDLE_ARRAYS.items()}
+
+    # The offsets depend on the header length, so lay the header out until it is stable
+    header_length = 0
+    while True:
+        offset = _aligned(_PREFIX.size + header_length)
+        layout = {}
+        for name, array in arrays.items():
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset = _aligned(offset + array.nbytes)
+        header = json.dumps({'sources': sources, 'arrays': layout}, separators=(",", ":")).encode()
+        if len(header) == header_length:
+            break
+        header_length = len(header)
+
+    # Write to a temporary file and rename so readers never see a partial bundle
+    with open(path + ".tmp", "wb") as f:
+        f.write(_PREFIX.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b"\0" * (layout[name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(path + ".tmp", path)
+
+
+class DataBundle:
+    """Read-only view of a bundle file. Indexing by an array name of BUNDLE_ARRAYS gives
+    that array, backed by a memory map of the file.
+    """
+
+    def __init__(self, path=BUNDLE_PATH):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _PREFIX.size:
+            raise ValueError(f"{path} is not a data bundle")
+        magic, version, header_length = _PREFIX.unpack_from(self._map)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not a data bundle")
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported data bundle version {version} in {path}")
+        header = json.loads(self._map[_PREFIX.size:_PREFIX.size + header_length])
+
+        self.path = path
+        self.sources = header['sources']
+        self._arrays = {}
+        for name, entry in header['arrays'].items():
+            dtype = np.dtype(entry['dtype'])
+            count = int(np.prod(entry['shape'], dtype=np.int64))
+            array = np.frombuffer(self._map, dtype=dtype, count=count, offset=entry['offset'])
+            self._arrays[name] = array.reshape(entry['shape'])
+
+    def __getitem__(self, name):
+        return self._arrays[name]
+
+    def __contains__(self, name):
+        return name in self._arrays
+
+    def gs1_dates(self):
+        """Dates of the monthly GS1 series as datetime64[ns], as pandas stores them."""
+        return self['gs1_months'].astype('datetime64[M]').astype('datetime64[ns]')
+
+
+def load_bundle(path=BUNDLE_PATH, **sources):
+    """Open the bundle at path, or return None if it is missing, unreadable or, for any
+    source given as name=digest (see source_digest), built from different data.
+    """
+    try:
+        bundle = DataBundle(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if any(bundle.sources.get(name) != digest for name, digest in sources.items()):
+        return None
+    return bundle
+
+
+def parse_treasury_js(text):
+    """The [date, rate] data points of the historicalTreasuryRates array of historical-data.js."""
+    entries = _TREASURY_ENTRY.findall(text)
+    if not entries:
+        raise ValueError("No Treasury rates found")
+    return [[date, float(rate)] for date, rate in entries]
+
+
+def point_rate_changes(months, rates):
+    """Changes between consecutive data points 10 to 14 months apart, as
+    calculateRateChanges computes annualRateChanges in historical-data.js.
+    """
+    order = np.argsort(months, kind="stable")
+    months, rates = months[order], rates[order]
+    gaps = np.diff(months)
+    return np.diff(rates)[(gaps >= 10) & (gaps <= 14)]
+
+
+def build_bundle(path=BUNDLE_PATH):
+    """Compile the embedded historical series into a bundle at path.
+    Raises ValueError if historical-data.js and rate_data disagree on the GS1 points.
+    """
+    # Only the build needs pandas and the sources
+    import pandas as pd
+
+    from market_data import SP500_DATA_PATH, parse_sp500_js
+    from rate_data import EMBEDDED_GS1_DATA, HistoricalRateModel, resample_embedded_rates
+
+    with open(TREASURY_JS_PATH, encoding="utf-8") as f:
+        if parse_treasury_js(f.read()) != [[date, float(rate)] for date, rate in EMBEDDED_GS1_DATA]:
+            raise ValueError("The GS1 data points of historical-data.js and rate_data.EMBEDDED_GS1_DATA differ")
+    with open(SP500_DATA_PATH, "rb") as f:
+        sp500_source = f.read()
+    sp500_years, sp500_returns = parse_sp500_js(sp500_source.decode("utf-8"))
+
+    monthly = resample_embedded_rates()
+    point_dates = pd.to_datetime([date for date, _ in EMBEDDED_GS1_DATA]).to_numpy()
+    point_months = point_dates.astype('datetime64[M]').astype(np.int64)
+    point_rates = np.array([rate for _, rate in EMBEDDED_GS1_DATA], dtype=float)
+
+    write_bundle(path, {
+        'gs1_point_months': point_months,
+        'gs1_point_rates': point_rates,
+        'gs1_months': monthly['date'].to_numpy().astype('datetime64[M]').astype(np.int64),
+        'gs1_rates': monthly['rate'].to_numpy(dtype=float),
+        'gs1_annual_changes': HistoricalRateModel(monthly).annual_changes,
+        'gs1_point_changes': point_rate_changes(point_months, point_rates),
+        'sp500_years': sp500_years,
+        'sp500_returns': sp500_returns,
+    }, {
+        'gs1': source_digest(EMBEDDED_GS1_DATA),
+        'sp500': source_digest(sp500_source),
+    })
+    return path
+
+
+def current_sources():
+    """Digests of the sources as they are now, to compare with DataBundle.sources."""
+    from market_data import SP500_DATA_PATH
+    from rate_data import EMBEDDED_GS1_DATA
+
+    with open(SP500_DATA_PATH, "rb") as f:
+        return {'gs1': source_digest(EMBEDDED_GS1_DATA), 'sp500': source_digest(f.read())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m data_bundle",
+                                     description="Build the binary bundle of the embedded historical data.")
+    parser.add_argument("--output", default=BUNDLE_PATH, help="bundle file (default: %(default)s)")
+    parser.add_argument("--check", action="store_true",
+                        help="only check that the bundle exists and matches its sources")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        if load_bundle(args.output, **current_sources()) is None:
+            print(f"{args.output} is missing or out of date; run python -m data_bundle", file=sys.stderr)
+            return 1
+        print(f"{args.output} is up to date")
+        return 0
+
+    try:
+        build_bundle(args.output)
+    except (OSError, ValueError) as e:
+        print(f"Error building data bundle: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {args.output} ({os.path.getsize(args.output):,} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+/**
+ * Loader for the compiled historical data bundle (historical-data.bin)
+ *
+ * python -m data_bundle compiles the Treasury rate and S&P 500 series into one
+ * binary file. When the pages are served over HTTP, load() fetches it once and the
+ * arrays are used as typed-array views of the downloaded buffer, with nothing to
+ * parse or interpolate. Pages opened from disk cannot fetch it; load() then
+ * resolves to null and the getters below return the tables of historical-data.js
+ * and historical-data-stockmarket.js instead.
+ *
+ * The bundle address can be changed by setting window.HISTORICAL_DATA_BUNDLE_URL
+ * before this script is loaded.
+ */
+const HistoricalDataBundle = (function() {
+    const bundleUrl = window.HISTORICAL_DATA_BUNDLE_URL || 'historical-data.bin';
+
+    // Must match BUNDLE_MAGIC and BUNDLE_VERSION in data_bundle.py
+    const MAGIC = 'MORTDATA';
+    const VERSION = 1;
+
+    // Typed arrays for the dtypes of the bundle. They use the byte order of the
+    // machine, which is little-endian like the bundle on every current browser.
+    const TYPED_ARRAYS = { '<f8': Float64Array, '<i4': Int32Array };
+
+    let loading = null;
+    let bundle = null;
+    const derived = {};
+
+    /**
+     * Read a bundle from an ArrayBuffer. Returns { sources, arrays } with one typed
+     * array per bundle array, sharing the buffer.
+     */
+    function parse(buffer) {
+        const decoder = new TextDecoder();
+        if (buffer.byteLength < 16 || decoder.decode(new Uint8Array(buffer, 0, 8)) !== MAGIC) {
+            throw new Error('Not a historical data bundle');
+        }
+        const view = new DataView(buffer);
+        const version = view.getUint32(8, true);
+        if (version !== VERSION) {
+            throw new Error(`Unsupported data bundle version ${version}`);
+        }
+        const headerLength = view.getUint32(12, true);
+        const header = JSON.parse(decoder.decode(new Uint8Array(buffer, 16, headerLength)));
+
+        const arrays = {};
+        for (const [name, entry] of Object.entries(header.arrays)) {
+            const TypedArray = TYPED_ARRAYS[entry.dtype];
+            if (!TypedArray) {
+                throw new Error(`Unsupported dtype ${entry.dtype} for ${name}`);
+            }
+            const length = entry.shape.reduce((count, size) => count * size, 1);
+            arrays[name] = new TypedArray(buffer, entry.offset, length);
+        }
+        return { sources: header.sources, arrays };
+    }
+
+    /**
+     * Fetch and parse the bundle. Resolves to the parsed bundle, or to null if it
+     * cannot be loaded. Later calls return the same promise.
+     */
+    function load() {
+        if (loading === null) {
+            loading = fetch(bundleUrl)
+                .then(response => response.ok ? response.arrayBuffer() : null)
+                .then(buffer => buffer ? parse(buffer) : null)
+                .catch(() => null)
+                .then(loaded => {
+                    bundle = loaded;
+                    return loaded;
+                });
+        }
+        return loading;
+    }
+
+    // Months since January 1970 as the UTC dates that new Date('YYYY-MM-01') gives
+    function monthToDate(month) {
+        return new Date(Date.UTC(1970, month, 1));
+    }
+
+    // A value computed once from the bundle, or fallback() while it is not loaded
+    function fromBundle(name, compute, fallback) {
+        if (bundle === null) {
+            return fallback();
+        }
+        if (!(name in derived)) {
+            derived[name] = compute(bundle.arrays);
+        }
+        return derived[name];
+    }
+
+    /** The Treasury rate data points, as historicalTreasuryRates */
+    function treasuryRates() {
+        return fromBundle('treasuryRates',
+            arrays => Array.from(arrays.gs1_point_months,
+                (month, i) => ({ date: monthToDate(month), rate: arrays.gs1_point_rates[i] })),
+            () => historicalTreasuryRates);
+    }
+
+    /** The rates of the Treasury data points */
+    function treasuryRateLevels() {
+        return fromBundle('treasuryRateLevels',
+            arrays => arrays.gs1_point_rates,
+            () => historicalTreasuryRates.map(data => data.rate));
+    }
+
+    /** The most recent Treasury rate, as getLatestRate */
+    function latestTreasuryRate() {
+        return fromBundle('latestTreasuryRate',
+            arrays => arrays.gs1_point_rates[arrays.gs1_point_rates.length - 1],
+            () => getLatestRate());
+    }
+
+    /** Year-over-year changes between the Treasury data points, as annualRateChanges */
+    function treasuryRateChanges() {
+        return fromBundle('treasuryRateChanges',
+            arrays => arrays.gs1_point_changes,
+            () => annualRateChanges);
+    }
+
+    /** The monthly interpolated Treasury rates, as monthlyTreasuryRates */
+    function monthlyRates() {
+        return fromBundle('monthlyRates',
+            arrays => Array.from(arrays.gs1_months,
+                (month, i) => ({ date: monthToDate(month), rate: arrays.gs1_rates[i] })),
+            () => monthlyTreasuryRates);
+    }
+
+    /** The annual S&P 500 total returns, as historicalSP500Returns */
+    function sp500Returns() {
+        return fromBundle('sp500Returns',
+            arrays => Array.from(arrays.sp500_years,
+                (year, i) => ({ year, return: arrays.sp500_returns[i] })),
+            () => historicalSP500Returns);
+    }
+
+    return {
+        load, parse, treasuryRates, treasuryRateLevels, latestTreasuryRate, treasuryRateChanges,
+        monthlyRates, sp500Returns
+    };
+})();
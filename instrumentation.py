@@ -0,0 +1,111 @@
+"""Per-stage timing, call counts and allocation counts, and an opt-in profiler for one run."""
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Number of functions and allocation sites listed in a profile report
+PROFILE_REPORT_LINES = 25
+
+
+class Instrumentation:
+    """Accumulates wall time, call counts and allocation counts per named stage.
+
+    Allocations are the net change in sys.getallocatedblocks() (Python object
+    blocks; NumPy array buffers are not included) and are approximate when several
+    threads are busy. Stages from other processes can be added with merge().
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager that records the time and allocations of the code it wraps."""
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, sys.getallocatedblocks() - blocks)
+
+    def record(self, name, seconds, allocated_blocks=0, calls=1, max_seconds=None):
+        with self._lock:
+            stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                  'allocated_blocks': 0})
+            stats['calls'] += calls
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds if max_seconds is None else max_seconds)
+            stats['allocated_blocks'] += allocated_blocks
+
+    def merge(self, stages):
+        """Add the stages of another Instrumentation, as returned by its snapshot()."""
+        for name, stats in stages.items():
+            self.record(name, stats['seconds'], stats['allocated_blocks'], stats['calls'], stats['max_seconds'])
+
+    def snapshot(self):
+        """The recorded stages as a JSON-serializable dict."""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self.stages.items()}
+
+    def format_table(self):
+        """The recorded stages as a plain-text table."""
+        header = f"{'Stage':<22} {'Calls':>7} {'Total s':>9} {'Mean ms':>9} {'Max ms':>9} {'Blocks':>10}"
+        lines = [header, '-' * len(header)]
+        for name, stats in self.snapshot().items():
+            lines.append(
+                f"{name:<22} {stats['calls']:>7} {stats['seconds']:>9.3f} "
+                f"{stats['seconds'] / stats['calls'] * 1000:>9.2f} {stats['max_seconds'] * 1000:>9.2f} "
+                f"{stats['allocated_blocks']:>10,}"
+            )
+        return "\n".join(lines)
+
+
+def timed(instrumentation, name):
+    """instrumentation.stage(name), or a no-op if instrumentation is None."""
+    return instrumentation.stage(name) if instrumentation is not None else nullcontext()
+
+
+class RunProfile:
+    """Context manager capturing a cProfile profile and tracemalloc allocations.
+
+    cProfile only sees the thread that enters the context, so profiled runs should
+    do their work in that thread rather than in worker processes.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.allocations = None
+        self.peak_memory = None
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.allocations = tracemalloc.take_snapshot()
+        _, self.peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return False
+
+    def dump_stats(self, path):
+        """Save the profile for pstats, snakeviz and similar tools."""
+        self.profiler.dump_stats(path)
+
+    def report(self, lines=PROFILE_REPORT_LINES):
+        """Top functions by cumulative time and top allocation sites, as text."""
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(lines)
+
+        out.write(f"Peak traced memory: {self.peak_memory / 2**20:,.1f} MiB\n")
+        out.write("Largest allocation sites still held at the end of the run:\n")
+        for statistic in self.allocations.statistics('lineno')[:lines]:
+            out.write(f"  {statistic}\n")
+        return out.getvalue()
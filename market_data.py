@@ -0,0 +1,57 @@
+"""Historical S&P 500 total returns shared with the browser tools, and return paths built from them.
+
+The returns are read from historical-data-stockmarket.js so the Python analyses and
+the web pages use the same numbers.
+"""
+import os
+import re
+
+import numpy as np
+
+SP500_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historical-data-stockmarket.js")
+
+_RETURN_ENTRY = re.compile(r"\{\s*year:\s*(\d{4})\s*,\s*return:\s*(-?\d+(?:\.\d+)?)\s*\}")
+
+
+def parse_sp500_js(text):
+    """Parse the historicalSP500Returns array of the JavaScript data file.
+    Returns the years and the annual total returns (%) as arrays.
+    """
+    entries = _RETURN_ENTRY.findall(text)
+    if not entries:
+        raise ValueError("No S&P 500 returns found")
+    years = np.array([int(year) for year, _ in entries])
+    returns = np.array([float(value) for _, value in entries])
+    if np.any(np.diff(years) != 1):
+        raise ValueError("S&P 500 returns are not consecutive years")
+    return years, returns
+
+
+def load_sp500_returns(path=SP500_DATA_PATH):
+    """Years and annual total returns (%) of the S&P 500 from the JavaScript data file."""
+    with open(path, encoding="utf-8") as f:
+        return parse_sp500_js(f.read())
+
+
+def historical_return_windows(returns, years):
+    """Every run of years consecutive annual returns, shape (windows, years), as
+    getAllPeriods returns them in the browser tools.
+    """
+    returns = np.asarray(returns, dtype=float)
+    if not 0 < years <= len(returns):
+        raise ValueError("Invalid period length")
+    return np.lib.stride_tricks.sliding_window_view(returns, years)
+
+
+def bootstrap_return_paths(returns, num_paths, years, block_length=1, rng=np.random):
+    """Resample annual returns into num_paths paths of years years, shape (num_paths, years).
+
+    Blocks of block_length consecutive years are drawn with replacement, wrapping
+    around the end of the data. Longer blocks keep more of the serial correlation of
+    market returns; block_length=1 draws years independently.
+    """
+    returns = np.asarray(returns, dtype=float)
+    num_blocks = -(-years // block_length)
+    starts = rng.choice(len(returns), size=(num_paths, num_blocks))
+    indices = (starts[:, :, np.newaxis] + np.arange(block_length)) % len(returns)
+    return returns[indices.reshape(num_paths, -1)[:, :years]]
@@ -24,6 +24,9 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Initialize charts
     initializeCharts();
+    
+    // Fetch the compiled historical data while the user fills in the form
+    HistoricalDataBundle.load();
 });
 
 /**
@@ -324,8 +327,33 @@ function runSimulation() {
             }
         }
         
-        // Start processing batches
-        processBatch();
+        // Large runs go to the local simulation service when it is running
+        if (typeof SimulationService !== 'undefined' && numSimulations >= SimulationService.OFFLOAD_THRESHOLD) {
+            const parameters = {
+                loan_amount: loanAmount,
+                loan_term: loanTerm,
+                fixed_rate: fixedRate,
+                arm_rate: armInitialRate,
+                arm_margin: armMargin,
+                initial_cap: initialCap,
+                annual_cap: annualCap,
+                lifetime_cap: lifetimeCap,
+                num_simulations: numSimulations,
+                // Draw the index from historical levels like simulateArmRates, so
+                // the answer does not depend on where the run happens
+                index_model: 'levels'
+            };
+            SimulationService.available().then(available => {
+                if (available) {
+                    runOnService(parameters, fixedCost, processBatch);
+                } else {
+                    processBatch();
+                }
+            });
+        } else {
+            // Start processing batches
+            processBatch();
+        }
     } catch (error) {
         // Hide loading overlay
         const loadingOverlay = document.getElementById('loadingOverlay');
@@ -336,6 +364,39 @@ function runSimulation() {
     }
 }
 
+/**
+ * Run the simulation on the local simulation service, falling back to the
+ * browser (fallback) if the service fails
+ */
+function runOnService(parameters, fixedCost, fallback) {
+    const simulationStatus = document.getElementById('simulationStatus');
+    simulationStatus.textContent = 'Running simulation on the local simulation service...';
+    
+    SimulationService.simulateArm(
+        parameters,
+        (done, total) => {
+            updateProgress(done / total * 100);
+            simulationStatus.textContent = `Running simulation ${done}/${total}...`;
+        },
+        partial => {
+            simulationStatus.textContent = 
+                `Running simulation ${partial.simulations_run}/${parameters.num_simulations}... ` +
+                `Median ARM cost so far: $${formatMoney(partial.statistics.arm_median)}`;
+        }
+    ).then(result => {
+        // A service that does not know the page's rate model would answer for another one
+        if (result.index_model !== parameters.index_model) {
+            throw new Error(`Simulation service used the ${result.index_model || 'changes'} index model`);
+        }
+        finishSimulation(fixedCost, result.cost_sample, result.rate_paths, parameters.fixed_rate,
+                         parameters.arm_rate, parameters.loan_term, result.statistics);
+    }).catch(error => {
+        console.warn('Simulation service failed, simulating in the browser:', error);
+        simulationStatus.textContent = 'Running Monte Carlo simulation...';
+        fallback();
+    });
+}
+
 /**
  * Update the progress bar
  */
@@ -373,11 +434,11 @@ function simulateArmRates(initialRate, margin, initialCap, annualCap, lifetimeCa
     // First 5 years are at the fixed initial rate
     const annualRates = Array(5).fill(initialRate);
     
-    // Extract historical 1-year Treasury rates
-    const historicalRateLevels = historicalTreasuryRates.map(data => data.rate);
+    // Historical 1-year Treasury rates, from the data bundle when it has loaded
+    const historicalRateLevels = HistoricalDataBundle.treasuryRateLevels();
     
     // Get current index rate (most recent historical value)
-    let currentIndexRate = getLatestRate();
+    let currentIndexRate = HistoricalDataBundle.latestTreasuryRate();
     
     // Remaining years after the 5-year fixed period
     const numRemainingYears = years - 5;
@@ -531,7 +592,8 @@ function calculateArmCost(principal, monthlyRates) {
     let totalPaid = 0;
     
     // Payment recalculation months (at beginning and then annually after fixed period)
-    const recalcMonths = [0].concat([...Array(26).keys()].map(i => (5 + i) * 12));
+    const adjustments = Math.max(0, Math.ceil(monthlyRates.length / 12) - 5);
+    const recalcMonths = [0].concat([...Array(adjustments).keys()].map(i => (5 + i) * 12));
     
     let currentPayment = null;
     
@@ -571,31 +633,32 @@ function calculateArmCost(principal, monthlyRates) {
 
 /**
  * Process simulation results and update UI
+ * 
+ * statistics, when given, are the statistics of a run on the simulation
+ * service, and armCosts is then a sample of its costs for the charts
  */
-function finishSimulation(fixedCost, armCosts, armRatePaths, fixedRate, armInitialRate, loanTerm) {
-    // Calculate statistics
-    const armMean = armCosts.reduce((sum, cost) => sum + cost, 0) / armCosts.length;
-    
-    // Sort for median and percentiles
-    const sortedCosts = [...armCosts].sort((a, b) => a - b);
-    const armMedian = sortedCosts[Math.floor(sortedCosts.length / 2)];
-    
-    // Calculate standard deviation
-    const armStd = Math.sqrt(
-        armCosts.reduce((sum, cost) => sum + Math.pow(cost - armMean, 2), 0) / armCosts.length
-    );
-    
-    const armMin = Math.min(...armCosts);
-    const armMax = Math.max(...armCosts);
-    
-    // Calculate 95% confidence interval
-    const armCiLowIndex = Math.floor(sortedCosts.length * 0.025);
-    const armCiHighIndex = Math.floor(sortedCosts.length * 0.975);
-    const armCiLow = sortedCosts[armCiLowIndex];
-    const armCiHigh = sortedCosts[armCiHighIndex];
-    
-    // Probability that ARM is cheaper
-    const probArmCheaper = armCosts.filter(cost => cost < fixedCost).length / armCosts.length * 100;
+function finishSimulation(fixedCost, armCosts, armRatePaths, fixedRate, armInitialRate, loanTerm, statistics) {
+    let armMedian, armCiLow, armCiHigh, probArmCheaper;
+    
+    if (statistics) {
+        armMedian = statistics.arm_median;
+        armCiLow = statistics.arm_ci_low;
+        armCiHigh = statistics.arm_ci_high;
+        probArmCheaper = statistics.prob_arm_cheaper;
+    } else {
+        // Sort for median and percentiles
+        const sortedCosts = [...armCosts].sort((a, b) => a - b);
+        armMedian = sortedCosts[Math.floor(sortedCosts.length / 2)];
+        
+        // Calculate 95% confidence interval
+        const armCiLowIndex = Math.floor(sortedCosts.length * 0.025);
+        const armCiHighIndex = Math.floor(sortedCosts.length * 0.975);
+        armCiLow = sortedCosts[armCiLowIndex];
+        armCiHigh = sortedCosts[armCiHighIndex];
+        
+        // Probability that ARM is cheaper
+        probArmCheaper = armCosts.filter(cost => cost < fixedCost).length / armCosts.length * 100;
+    }
     
     // Expected savings with ARM
     const expectedSavings = fixedCost - armMedian;
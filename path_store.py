@@ -0,0 +1,128 @@
+"""Compact on-disk storage of every simulated ARM path, for audits.
+
+A path store is a directory of .npy files that are filled in as memory maps while
+the simulation runs:
+
+    rates.npy       float32 (paths, years)    annual ARM rate (%) of every path
+    balances.npy    float32 (paths, months)   balance after each monthly payment
+    payments.npy    float32 (paths, months)   monthly payment
+    costs.npy       float64 (paths,)          total paid on each path
+    metadata.json   loan parameters, number of paths written and format version
+
+Each worker process opens the files itself and writes its chunk in place, so the
+paths never pass through the parent process. PathStore opens a store lazily: its
+arrays are read-only memory maps, and slicing them, e.g.
+store.balances[1000:2000, 60:120], reads only the pages that hold those values.
+"""
+import json
+import os
+
+import numpy as np
+
+# Bump when the layout of a store changes
+PATH_STORE_VERSION = 1
+
+STORE_DTYPE = np.float32
+
+# Arrays of a store with their dtypes and the number of values per path
+# ('years', 'months' or None for one value)
+STORE_ARRAYS = {
+    'rates': (STORE_DTYPE, 'years'),
+    'balances': (STORE_DTYPE, 'months'),
+    'payments': (STORE_DTYPE, 'months'),
+    'costs': (np.float64, None),
+}
+
+
+def _array_path(directory, name):
+    return os.path.join(directory, name + ".npy")
+
+
+def _write_metadata(directory, metadata):
+    # Write to a temporary file and rename so readers never see a partial file
+    path = os.path.join(directory, "metadata.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def read_metadata(directory):
+    with open(os.path.join(directory, "metadata.json"), encoding="utf-8") as f:
+        metadata = json.load(f)
+    if metadata.get('version') != PATH_STORE_VERSION:
+        raise ValueError(f"Unsupported path store version in {directory}")
+    return metadata
+
+
+def create_path_store(directory, num_paths, loan_term, **parameters):
+    """Create an empty store in directory with room for num_paths paths of loan_term years.
+    parameters, such as the loan amount and rates, are saved in the metadata.
+    The files are sparse until written, so unused room takes no disk space on most
+    file systems.
+    """
+    os.makedirs(directory, exist_ok=True)
+    sizes = {'years': loan_term, 'months': 12 * loan_term}
+    for name, (dtype, per_path) in STORE_ARRAYS.items():
+        shape = (num_paths, sizes[per_path]) if per_path else (num_paths,)
+        array = np.lib.format.open_memmap(_array_path(directory, name), mode="w+", dtype=dtype, shape=shape)
+        del array  # Closes the memory map
+    _write_metadata(directory, {
+        'version': PATH_STORE_VERSION,
+        'capacity': int(num_paths),
+        'count': 0,
+        'loan_term': int(loan_term),
+        'complete': False,
+        'parameters': parameters,
+    })
+
+
+def write_path_chunk(directory, first_path, annual_rates, balances, payments, costs):
+    """Write the paths first_path onwards into a store made by create_path_store.
+    Safe to call from several processes at once for disjoint ranges of paths.
+    """
+    values = {'rates': annual_rates, 'balances': balances, 'payments': payments, 'costs': costs}
+    for name, chunk in values.items():
+        array = np.load(_array_path(directory, name), mmap_mode="r+")
+        array[first_path:first_path + len(chunk)] = chunk
+        array.flush()
+        del array
+
+
+def finish_path_store(directory, count):
+    """Record that the first count paths of the store are written.
+    A run that stopped early leaves the rest of the store unused.
+    """
+    metadata = read_metadata(directory)
+    metadata.update(count=int(count), complete=True)
+    _write_metadata(directory, metadata)
+
+
+class PathStore:
+    """Read-only, lazily loaded view of a path store.
+
+    rates, balances, payments and costs are memory-mapped arrays cut to the paths
+    that were written. The loan parameters saved with the store are in parameters.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        metadata = read_metadata(directory)
+        self.count = metadata['count']
+        self.loan_term = metadata['loan_term']
+        self.complete = metadata['complete']
+        self.parameters = metadata['parameters']
+        for name in STORE_ARRAYS:
+            setattr(self, name, np.load(_array_path(directory, name), mmap_mode="r")[:self.count])
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, path):
+        """Annual rates, monthly balances and monthly payments of one path, as float64 arrays."""
+        return (np.array(self.rates[path], dtype=float), np.array(self.balances[path], dtype=float),
+                np.array(self.payments[path], dtype=float))
+
+    def sample_rate_paths(self, max_paths):
+        """Up to max_paths rate paths evenly spread over the store, read with one strided pass."""
+        step = max(1, -(-self.count // max_paths))
+        return np.array(self.rates[::step], dtype=float)
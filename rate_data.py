@@ -0,0 +1,328 @@
+"""Historical 1-year Treasury (FRED GS1) rate data used as the ARM index."""
+import hashlib
+import json
+import os
+import sys
+import time
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from data_bundle import load_bundle, source_digest
+from synthetic_rates import generate_rate_histories
+
+GS1_URL = "https://fred.stlouisfed.org/graph/fredgraph.csv?id=GS1"
+
+# Downloaded series are cached on disk and reused for GS1_CACHE_TTL seconds before
+# being revalidated with a conditional request
+CACHE_DIR = os.environ.get("MORTGAGE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mortgage"))
+GS1_CACHE_TTL = 24 * 60 * 60
+
+# Seconds to wait for FRED before falling back to cached or embedded data
+GS1_TIMEOUT = 5
+
+# Status messages for each place fetch_live_historical_rates can get the data from
+LIVE_DATA_MESSAGES = {
+    'network': "Historical data loaded successfully. Ready to run simulation.",
+    'cache': "Historical data loaded from cache. Ready to run simulation.",
+    'stale-cache': "Could not refresh live data. Using cached historical data.",
+}
+
+# A selection of key 1-year Treasury rate data points from 1962 to present
+# Format: List of [date_string, rate] pairs
+EMBEDDED_GS1_DATA = [
+    # 1960s
+    ["1962-01-01", 2.90], ["1963-01-01", 2.93], ["1964-01-01", 3.55], 
+    ["1965-01-01", 3.95], ["1966-01-01", 4.65], ["1967-01-01", 4.61],
+    ["1968-01-01", 5.07], ["1969-01-01", 6.30],
+    # 1970s (period of rising rates)
+    ["1970-01-01", 7.91], ["1971-01-01", 4.91], ["1972-01-01", 4.07],
+    ["1973-01-01", 5.94], ["1974-01-01", 7.38], ["1975-01-01", 7.13],
+    ["1976-01-01", 5.87], ["1977-01-01", 5.10], ["1978-01-01", 7.22],
+    ["1979-01-01", 10.04],
+    # 1980s (high rate period)
+    ["1980-01-01", 12.06], ["1980-07-01", 9.82], ["1981-01-01", 13.82],
+    ["1981-07-01", 16.30], ["1982-01-01", 14.57], ["1982-07-01", 12.92],
+    ["1983-01-01", 8.62], ["1983-07-01", 9.40], ["1984-01-01", 9.90],
+    ["1984-07-01", 11.96], ["1985-01-01", 9.00], ["1985-07-01", 7.88],
+    ["1986-01-01", 7.73], ["1986-07-01", 6.56], ["1987-01-01", 5.87],
+    ["1987-07-01", 6.65], ["1988-01-01", 6.83], ["1988-07-01", 7.75],
+    ["1989-01-01", 9.16], ["1989-07-01", 8.45],
+    # 1990s
+    ["1990-01-01", 8.21], ["1990-07-01", 8.15], ["1991-01-01", 6.91],
+    ["1991-07-01", 6.26], ["1992-01-01", 4.43], ["1992-07-01", 3.68],
+    ["1993-01-01", 3.51], ["1993-07-01", 3.43], ["1994-01-01", 3.54],
+    ["1994-07-01", 5.28], ["1995-01-01", 7.05], ["1995-07-01", 5.85],
+    ["1996-01-01", 5.09], ["1996-07-01", 5.64], ["1997-01-01", 5.61],
+    ["1997-07-01", 5.60], ["1998-01-01", 5.24], ["1998-07-01", 5.46],
+    ["1999-01-01", 4.51], ["1999-07-01", 5.00],
+    # 2000s
+    ["2000-01-01", 6.12], ["2000-07-01", 6.21], ["2001-01-01", 5.16],
+    ["2001-07-01", 3.65], ["2002-01-01", 2.14], ["2002-07-01", 1.93],
+    ["2003-01-01", 1.37], ["2003-07-01", 1.08], ["2004-01-01", 1.13],
+    ["2004-07-01", 1.80], ["2005-01-01", 2.78], ["2005-07-01", 3.61],
+    ["2006-01-01", 4.42], ["2006-07-01", 5.11], ["2007-01-01", 5.05],
+    ["2007-07-01", 4.82], ["2008-01-01", 2.71], ["2008-07-01", 2.36],
+    ["2009-01-01", 0.44], ["2009-07-01", 0.56],
+    # 2010s (low rate period)
+    ["2010-01-01", 0.35], ["2010-07-01", 0.29], ["2011-01-01", 0.29],
+    ["2011-07-01", 0.19], ["2012-01-01", 0.12], ["2012-07-01", 0.17],
+    ["2013-01-01", 0.14], ["2013-07-01", 0.15], ["2014-01-01", 0.13],
+    ["2014-07-01", 0.12], ["2015-01-01", 0.25], ["2015-07-01", 0.31],
+    ["2016-01-01", 0.65], ["2016-07-01", 0.51], ["2017-01-01", 0.85],
+    ["2017-07-01", 1.22], ["2018-01-01", 1.89], ["2018-07-01", 2.44],
+    ["2019-01-01", 2.57], ["2019-07-01", 1.94],
+    # 2020s
+    ["2020-01-01", 1.53], ["2020-04-01", 0.23], ["2020-07-01", 0.16],
+    ["2020-10-01", 0.13], ["2021-01-01", 0.10], ["2021-04-01", 0.06],
+    ["2021-07-01", 0.07], ["2021-10-01", 0.13], ["2022-01-01", 0.51],
+    ["2022-04-01", 1.64], ["2022-07-01", 2.83], ["2022-10-01", 4.08],
+    ["2023-01-01", 4.65], ["2023-04-01", 4.69], ["2023-07-01", 5.12],
+    ["2023-10-01", 5.39], ["2024-01-01", 4.57], ["2024-04-01", 4.83],
+    ["2024-07-01", 4.35], ["2024-10-01", 4.15], ["2025-01-01", 4.10]
+]
+
+
+class HistoricalRateModel:
+    """Arrays derived from a historical rate series, computed once when the data loads.
+
+    historical_rates is a DataFrame with 'date' and 'rate' columns sorted by date.
+    annual_changes is None when there is not enough data to sample from.
+    index_scenarios and index_levels are always None; see
+    synthetic_rates.SyntheticRateModel and HistoricalLevelModel.
+    fingerprint is a hash of the series that changes whenever the data does.
+    """
+
+    def __init__(self, historical_rates):
+        self.dates = historical_rates['date'].to_numpy()
+        self.monthly_rates = historical_rates['rate'].to_numpy(dtype=float)
+
+        digest = hashlib.sha256()
+        digest.update(self.dates.astype('datetime64[ns]').astype(np.int64).tobytes())
+        digest.update(self.monthly_rates.tobytes())
+        self.fingerprint = digest.hexdigest()
+
+        # Latest index level
+        self.current_index_rate = float(self.monthly_rates[-1]) if len(self.monthly_rates) else None
+
+        # Year-over-year changes of the annual average rate
+        self.annual_changes = None
+        self.index_scenarios = None
+        self.index_levels = None
+        if len(historical_rates) > 12:
+            annual_hist_rates = historical_rates.groupby(historical_rates['date'].dt.year)['rate'].mean()
+            annual_changes = annual_hist_rates.diff().dropna().to_numpy()
+            if len(annual_changes):
+                self.annual_changes = annual_changes
+
+
+class HistoricalLevelModel:
+    """Index source that draws the index for every adjustment independently from
+    historical rate levels, instead of bootstrapping year-over-year changes.
+
+    This is the rate model of the ARM calculator page (simulateArmRates in
+    mortgage-simulation-v2.js), so runs the page hands to arm_service give the same
+    answer as runs in the browser. It can be used wherever a HistoricalRateModel is.
+    """
+
+    def __init__(self, levels):
+        self.index_levels = np.asarray(levels, dtype=float)
+        self.current_index_rate = float(self.index_levels[-1])
+        self.annual_changes = None
+        self.index_scenarios = None
+
+        digest = hashlib.sha256(b"levels")
+        digest.update(self.index_levels.tobytes())
+        self.fingerprint = digest.hexdigest()
+
+    @classmethod
+    def embedded(cls):
+        """The levels of the embedded data points, which the page samples from as well."""
+        return cls([rate for _, rate in EMBEDDED_GS1_DATA])
+
+
+def read_cached_rates(cache_dir=CACHE_DIR):
+    """Read the cached GS1 series.
+    Returns the data (or None if there is no usable cache) and its metadata.
+    """
+    try:
+        with open(os.path.join(cache_dir, "gs1.json")) as f:
+            metadata = json.load(f)
+        with np.load(os.path.join(cache_dir, "gs1.npz")) as arrays:
+            data = pd.DataFrame({'date': arrays['dates'], 'rate': arrays['rates']})
+        return data, metadata
+    except (OSError, ValueError, KeyError):
+        return None, {}
+
+
+def write_cached_rates(data, metadata, cache_dir=CACHE_DIR):
+    """Store the GS1 series as uncompressed NumPy arrays with a JSON metadata file."""
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write to temporary files and rename so readers never see a partial cache
+    arrays_path = os.path.join(cache_dir, "gs1.npz")
+    with open(arrays_path + ".tmp", "wb") as f:
+        np.savez(f, dates=data['date'].to_numpy(), rates=data['rate'].to_numpy(dtype=float))
+    os.replace(arrays_path + ".tmp", arrays_path)
+    touch_cached_rates(metadata, cache_dir)
+
+
+def touch_cached_rates(metadata, cache_dir=CACHE_DIR):
+    """Mark the cached series as validated now."""
+    metadata = dict(metadata, fetched_at=time.time())
+    metadata_path = os.path.join(cache_dir, "gs1.json")
+    with open(metadata_path + ".tmp", "w") as f:
+        json.dump(metadata, f)
+    os.replace(metadata_path + ".tmp", metadata_path)
+
+
+def parse_gs1_csv(text):
+    """Parse the FRED CSV download into a DataFrame with 'date' and 'rate' columns."""
+    data = pd.read_csv(StringIO(text))
+    data.columns = ['date', 'rate']
+    data['date'] = pd.to_datetime(data['date'])
+    data = data.sort_values('date')
+    data = data.dropna()
+    return data
+
+
+def fetch_live_historical_rates(url=GS1_URL, timeout=GS1_TIMEOUT, cache_dir=CACHE_DIR, ttl=GS1_CACHE_TTL):
+    """Get the 1-year Treasury rate series from FRED (Federal Reserve Economic Data).
+
+    The series is cached in cache_dir. While the cache is younger than ttl seconds it
+    is used without a request. After that it is revalidated with If-None-Match /
+    If-Modified-Since, and it is also used if the request fails or times out.
+    Returns the data and where it came from ('network', 'cache' or 'stale-cache'),
+    or (None, None) if the server does not return the data and nothing is cached.
+    Request errors are raised only when nothing is cached.
+    """
+    import requests  # Only needed for live data
+
+    cached_data, metadata = read_cached_rates(cache_dir)
+    if cached_data is not None and metadata.get('url') == url:
+        if time.time() - metadata.get('fetched_at', 0) < ttl:
+            return cached_data, 'cache'
+    else:
+        cached_data, metadata = None, {}
+
+    headers = {}
+    if metadata.get('etag'):
+        headers['If-None-Match'] = metadata['etag']
+    if metadata.get('last_modified'):
+        headers['If-Modified-Since'] = metadata['last_modified']
+
+    try:
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached_data is not None:
+            touch_cached_rates(metadata, cache_dir)
+            return cached_data, 'cache'
+        if response.status_code != 200:
+            return (cached_data, 'stale-cache') if cached_data is not None else (None, None)
+        data = parse_gs1_csv(response.text)
+    except (requests.RequestException, ValueError):
+        if cached_data is None:
+            raise
+        return cached_data, 'stale-cache'
+
+    try:
+        write_cached_rates(data, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }, cache_dir)
+    except OSError as e:
+        print(f"Error caching historical data: {str(e)}", file=sys.stderr)
+
+    return data, 'network'
+
+
+def embedded_historical_rates():
+    """Monthly 1-year Treasury rates interpolated from the embedded data points.
+    Read from the prebuilt data bundle (see data_bundle) while it matches
+    EMBEDDED_GS1_DATA, otherwise resampled here.
+    """
+    bundle = load_bundle(gs1=source_digest(EMBEDDED_GS1_DATA))
+    if bundle is None:
+        return resample_embedded_rates()
+    return pd.DataFrame({'date': bundle.gs1_dates(), 'rate': np.array(bundle['gs1_rates'])})
+
+
+def resample_embedded_rates():
+    """Interpolate the embedded data points to a monthly series with pandas."""
+    df = pd.DataFrame(EMBEDDED_GS1_DATA, columns=['date', 'rate'])
+    df['date'] = pd.to_datetime(df['date'])
+
+    # Sort by date
+    df = df.sort_values('date')
+
+    # Resample to monthly frequency using linear interpolation
+    df = df.set_index('date')
+    monthly_df = df.resample('MS').asfreq()  # Monthly start frequency
+    monthly_df['rate'] = monthly_df['rate'].interpolate(method='linear')
+
+    # Reset index to get date as a column again
+    return monthly_df.reset_index()
+
+
+def synthetic_historical_rates():
+    """Generate synthetic interest rate data based on historical patterns.
+    This is only used as a last resort if both live and embedded data fail.
+    """
+    # Create dates from 1954 to present (matching FRED GS1 data range)
+    dates = pd.date_range(start='1954-01-01', end=pd.Timestamp.now(), freq='M')
+
+    # Generate rates with historical-like properties: a mean-reverting random walk
+    np.random.seed(42)  # For reproducibility
+    rates = generate_rate_histories(1, len(dates), start_rate=3.0, rng=np.random)[0]
+
+    # Add some regime changes and persistence to make it more realistic
+    # Create high inflation period similar to 1970s-early 1980s
+    high_period_start = np.where(dates >= pd.Timestamp('1972-01-01'))[0][0]
+    high_period_end = np.where(dates >= pd.Timestamp('1985-01-01'))[0][0]
+    rates[high_period_start:high_period_end] = rates[high_period_start:high_period_end] * 2
+
+    # Create low interest rate period similar to 2008-2015
+    low_period_start = np.where(dates >= pd.Timestamp('2008-01-01'))[0][0]
+    low_period_end = np.where(dates >= pd.Timestamp('2015-01-01'))[0][0]
+    rates[low_period_start:low_period_end] = rates[low_period_start:low_period_end] * 0.5
+
+    return pd.DataFrame({
+        'date': dates,
+        'rate': rates
+    })
+
+
+def load_historical_rates(source="live", status=None):
+    """Load historical 1-year Treasury rates, falling back from live to embedded to synthetic data.
+
+    source is 'live' (FRED, through the on-disk cache), 'embedded' or 'synthetic'.
+    status, if given, is called with a message describing which data is being used.
+    """
+    if status is None:
+        status = lambda message: None
+
+    if source == "live":
+        try:
+            data, origin = fetch_live_historical_rates()
+            if data is not None:
+                status(LIVE_DATA_MESSAGES[origin])
+                return data
+            status("Failed to load live data. Using embedded historical data.")
+        except Exception as e:
+            print(f"Error loading data: {str(e)}", file=sys.stderr)
+            status("Error loading live data. Using embedded historical data.")
+        source = "embedded"
+
+    if source == "embedded":
+        try:
+            data = embedded_historical_rates()
+            status("Using embedded historical data. Ready to run simulation.")
+            return data
+        except Exception as e:
+            print(f"Error loading embedded data: {str(e)}", file=sys.stderr)
+            status("Error loading embedded data. Generating synthetic data instead.")
+    else:
+        status("Using synthetic historical data. Ready to run simulation.")
+
+    return synthetic_historical_rates()
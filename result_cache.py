@@ -0,0 +1,162 @@
+"""Memoization of seeded simulation results, in memory and on disk.
+
+Entries are keyed by simulation_key, a hash of every input that affects the
+result, including the fingerprint of the historical data. Replacing the data
+therefore changes the key and old entries are simply no longer found; they age
+out of both tiers.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from arm_engine import SimulationRun
+from arm_stats import StreamingCostSummary
+from rate_data import CACHE_DIR
+
+# Bump when a change to the engine alters results or the saved summaries, so older entries are ignored
+RESULT_CACHE_VERSION = 4
+
+RESULT_CACHE_DIR = os.path.join(CACHE_DIR, "results")
+
+# Size limits of the two tiers
+MEMORY_CACHE_BYTES = 256 * 1024 * 1024
+DISK_CACHE_BYTES = 1024 * 1024 * 1024
+
+
+def simulation_key(loan_amount, loan_term, fixed_rate, arm_initial_rate, arm_margin, initial_cap, annual_cap,
+                   lifetime_cap, num_simulations, seed, data_fingerprint, *, median_tolerance, prob_tolerance,
+                   streaming, sampling, sensitivities):
+    """Canonical hash of the inputs of a simulation run. Every caller passes the same
+    settings, so identical runs get identical keys wherever they were started.
+    seed None marks an unseeded run. Numbers are normalized so 300000 and 300000.0 match.
+    """
+    def canonical(value):
+        if isinstance(value, (bool, str)) or value is None:
+            return value
+        return repr(float(value))
+
+    parameters = {
+        'version': RESULT_CACHE_VERSION,
+        'loan_amount': canonical(loan_amount),
+        'loan_term': int(loan_term),
+        'fixed_rate': canonical(fixed_rate),
+        'arm_initial_rate': canonical(arm_initial_rate),
+        'arm_margin': canonical(arm_margin),
+        'initial_cap': canonical(initial_cap),
+        'annual_cap': canonical(annual_cap),
+        'lifetime_cap': canonical(lifetime_cap),
+        'num_simulations': int(num_simulations),
+        'seed': None if seed is None else int(seed),
+        'data': data_fingerprint,
+        'options': {name: canonical(value) for name, value in (
+            ('median_tolerance', median_tolerance), ('prob_tolerance', prob_tolerance), ('streaming', bool(streaming)),
+            ('sampling', sampling), ('sensitivities', bool(sensitivities)))},
+    }
+    text = json.dumps(parameters, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def run_to_arrays(run):
+    """A SimulationRun as a dict of NumPy arrays."""
+    arrays = {'summary_' + name: value for name, value in run.summary.to_arrays().items()}
+    arrays['stop_reason'] = np.array(run.stop_reason)
+    arrays['arm_rate_paths'] = np.array(run.arm_rate_paths, dtype=float)
+    if run.arm_costs is not None:
+        arrays['arm_costs'] = run.arm_costs
+    return arrays
+
+
+def run_from_arrays(arrays):
+    """Rebuild a SimulationRun saved with run_to_arrays."""
+    summary = StreamingCostSummary.from_arrays(
+        {name[len('summary_'):]: arrays[name] for name in arrays if name.startswith('summary_')})
+    arm_costs = np.array(arrays['arm_costs']) if 'arm_costs' in arrays else None
+    return SimulationRun(summary, arm_costs, arrays['arm_rate_paths'].tolist(), str(arrays['stop_reason']))
+
+
+class ResultCache:
+    """Two-tier LRU cache of SimulationRun results.
+
+    The memory tier holds recently used runs up to memory_bytes of arrays. Every
+    run is also written to cache_dir as an .npz file; when the directory grows past
+    disk_bytes the least recently used files are deleted. Safe to use from several
+    threads.
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, memory_bytes=MEMORY_CACHE_BYTES, disk_bytes=DISK_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # key -> (run, size in bytes)
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def get(self, key):
+        """Return the cached SimulationRun for key, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key][0]
+
+        path = self._path(key)
+        try:
+            with np.load(path) as arrays:
+                run = run_from_arrays(arrays)
+            os.utime(path)  # Mark as recently used for disk eviction
+        except (OSError, ValueError, KeyError):
+            return None
+
+        self._remember(key, run)
+        return run
+
+    def put(self, key, run):
+        """Store a SimulationRun under key in both tiers."""
+        self._remember(key, run)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file and rename so readers never see a partial entry
+            path = self._path(key)
+            with open(path + ".tmp", "wb") as f:
+                np.savez(f, **run_to_arrays(run))
+            os.replace(path + ".tmp", path)
+            self._evict_disk()
+        except OSError:
+            pass  # The disk tier is best effort
+
+    def _remember(self, key, run):
+        size = sum(value.nbytes for value in run_to_arrays(run).values())
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_used -= self._memory.pop(key)[1]
+            self._memory[key] = (run, size)
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_used -= evicted_size
+
+    def _evict_disk(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if used <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            used -= size
@@ -0,0 +1,146 @@
+/**
+ * Client for the optional local simulation service
+ *
+ * When the service is running on this machine (python -m arm_service), the
+ * calculators can hand large runs to it instead of simulating them in the
+ * browser. Every function falls back gracefully: if the service cannot be
+ * reached, available() resolves to false and the page simulates as before.
+ *
+ * The service address can be changed by setting window.SIMULATION_SERVICE_URL
+ * before this script is loaded.
+ *
+ * Pages opened as files (file:// URLs) must send the token the service prints
+ * when it starts. Open the page with #service-token=TOKEN after the file name, or
+ * set window.SIMULATION_SERVICE_TOKEN; the token is kept for the browser tab.
+ */
+const SimulationService = (function() {
+    const serviceUrl = window.SIMULATION_SERVICE_URL || 'http://127.0.0.1:8765';
+
+    // Token for pages opened as files, from the address or from an earlier page of the tab
+    const tokenMatch = window.location.hash.match(/service-token=([\w-]+)/);
+    if (tokenMatch) {
+        sessionStorage.setItem('simulationServiceToken', tokenMatch[1]);
+    }
+    const serviceToken = window.SIMULATION_SERVICE_TOKEN || sessionStorage.getItem('simulationServiceToken');
+
+    // Runs with at least this many simulations are offloaded when possible
+    const OFFLOAD_THRESHOLD = 20000;
+
+    // Milliseconds to wait for the service to answer the health check
+    const HEALTH_TIMEOUT = 500;
+
+    let availability = null;
+
+    // Headers of every request, with the service token when there is one
+    function requestHeaders(headers = {}) {
+        return serviceToken ? { ...headers, 'X-Service-Token': serviceToken } : headers;
+    }
+
+    /**
+     * Resolve to true if the service is running. The answer is remembered
+     * for the page, except that a failed check is retried on the next call.
+     */
+    function available() {
+        if (availability === null) {
+            const controller = new AbortController();
+            const timer = setTimeout(() => controller.abort(), HEALTH_TIMEOUT);
+            availability = fetch(`${serviceUrl}/health`, { headers: requestHeaders(), signal: controller.signal })
+                .then(response => response.ok)
+                .catch(() => false)
+                .then(ok => {
+                    clearTimeout(timer);
+                    if (!ok) {
+                        availability = null;
+                    }
+                    return ok;
+                });
+        }
+        return availability;
+    }
+
+    /**
+     * Post a request and call onEvent with each JSON line of the streamed response
+     */
+    async function streamEvents(path, body, onEvent) {
+        const response = await fetch(`${serviceUrl}${path}`, {
+            method: 'POST',
+            headers: requestHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify(body)
+        });
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.error || `Simulation service returned ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            for (const line of lines) {
+                if (line.trim()) {
+                    onEvent(JSON.parse(line));
+                }
+            }
+
+            if (done) {
+                return;
+            }
+        }
+    }
+
+    /**
+     * Run an ARM vs fixed-rate simulation on the service.
+     *
+     * parameters uses the service's names (loan_amount, loan_term, fixed_rate,
+     * arm_rate, arm_margin, initial_cap, annual_cap, lifetime_cap,
+     * num_simulations, and optionally seed, sampling and index_model, which is
+     * 'levels' for the rate model of the ARM calculator page). onProgress(done,
+     * total) and onPartial(event) are called as the run proceeds. Resolves to
+     * the result event, with statistics, cost_sample and rate_paths.
+     */
+    async function simulateArm(parameters, onProgress, onPartial) {
+        let result = null;
+
+        await streamEvents('/simulate/arm', parameters, event => {
+            if (event.event === 'progress' && onProgress) {
+                onProgress(event.done, event.total);
+            } else if (event.event === 'partial' && onPartial) {
+                onPartial(event);
+            } else if (event.event === 'result') {
+                result = event;
+            } else if (event.event === 'error') {
+                throw new Error(event.message);
+            }
+        });
+
+        if (result === null) {
+            throw new Error('Simulation service closed the connection before the result');
+        }
+        return result;
+    }
+
+    /**
+     * Run a buyer scenario (points, down-payment or extra-payment) for every
+     * combination of the given parameter values. Resolves to one row per profile.
+     */
+    async function runScenario(name, parameters) {
+        const response = await fetch(`${serviceUrl}/scenarios/${name}`, {
+            method: 'POST',
+            headers: requestHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify(parameters)
+        });
+        const rows = await response.json();
+        if (!response.ok) {
+            throw new Error(rows.error || `Simulation service returned ${response.status}`);
+        }
+        return rows;
+    }
+
+    return { OFFLOAD_THRESHOLD, available, simulateArm, runScenario };
+})();
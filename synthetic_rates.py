@@ -0,0 +1,120 @@
+"""Batches of synthetic index rate histories for stress-testing the ARM.
+
+generate_rate_histories produces thousands of mean-reverting monthly series with
+optional regime shocks in one call. SyntheticRateModel turns such a batch into an
+index source the batch simulation can use in place of a HistoricalRateModel.
+"""
+import hashlib
+
+import numpy as np
+
+import arm_kernels
+
+# Defaults of the mean-reverting process, as in rate_data.synthetic_historical_rates
+MEAN_RATE = 4.5
+VOLATILITY = 1.2
+MEAN_REVERSION = 0.05
+RATE_FLOOR = 0.5
+
+# Default regime shocks: rates doubled (as in the 1970s) or halved (as after 2008)
+SHOCK_SCALES = (2.0, 0.5)
+SHOCK_DURATION = 60
+
+
+def regime_scales(num_histories, num_months, shock_probability, shock_duration=SHOCK_DURATION,
+                  shock_scales=SHOCK_SCALES, rng=np.random):
+    """Multipliers of shape (num_histories, num_months) for regime shocks.
+
+    Each month a history outside a regime enters one with probability
+    shock_probability. The regime lasts a geometric number of months with mean
+    shock_duration and multiplies the rates by one of shock_scales, chosen at random.
+    """
+    scales = np.ones((num_histories, num_months))
+    remaining = np.zeros(num_histories, dtype=np.int64)
+    scale = np.ones(num_histories)
+    shock_scales = np.asarray(shock_scales, dtype=float)
+
+    for month in range(num_months):
+        starting = np.flatnonzero((remaining == 0) & (rng.random(num_histories) < shock_probability))
+        remaining[starting] = rng.geometric(1 / shock_duration, size=len(starting))
+        scale[starting] = rng.choice(shock_scales, size=len(starting))
+
+        active = remaining > 0
+        scales[active, month] = scale[active]
+        remaining[active] -= 1
+    return scales
+
+
+def generate_rate_histories(num_histories, num_months, start_rate=3.0, mean_rate=MEAN_RATE, volatility=VOLATILITY,
+                            mean_reversion=MEAN_REVERSION, floor=RATE_FLOOR, shock_probability=0.0,
+                            shock_duration=SHOCK_DURATION, shock_scales=SHOCK_SCALES, rng=np.random):
+    """Monthly synthetic rate histories, shape (num_histories, num_months).
+
+    Each month the rate moves by mean_reversion * (mean_rate - rate) plus normal
+    noise with annual volatility, and is floored at floor. The floor makes every month
+    depend on the one before, so the loop runs over months and is vectorized across
+    histories. start_rate may be one rate or one per history. With shock_probability
+    above zero, rates are scaled by regime_scales and floored again.
+
+    A single history drawn from np.random seeded with 42 reproduces the series that
+    synthetic_historical_rates builds before its fixed regime changes.
+    """
+    # Months are the leading axis so one history draws its noise in month order
+    noise = rng.normal(size=(num_months - 1, num_histories))
+
+    rate = np.array(np.broadcast_to(np.asarray(start_rate, dtype=float), (num_histories,)))
+    if arm_kernels.use_compiled():
+        rates = arm_kernels.mean_reverting_rates(noise, rate, float(mean_rate), float(volatility),
+                                                 float(mean_reversion), float(floor))
+    else:
+        rates = np.empty((num_histories, num_months))
+        rates[:, 0] = rate
+        for month in range(1, num_months):
+            rate = rate + mean_reversion * (mean_rate - rate) + volatility * noise[month - 1] / np.sqrt(12)
+            rate = np.maximum(floor, rate)
+            rates[:, month] = rate
+
+    if shock_probability > 0:
+        rates *= regime_scales(num_histories, num_months, shock_probability, shock_duration, shock_scales, rng)
+        np.maximum(rates, floor, out=rates)
+    return rates
+
+
+class SyntheticRateModel:
+    """Index source made of many synthetic forward histories.
+
+    histories holds monthly index rates from now on, shape (num_histories, num_months).
+    It can be used wherever a HistoricalRateModel is. Instead of bootstrapping
+    historical changes, each simulated ARM path follows one history chosen at random,
+    and the index for each adjustment is that history's average rate over the
+    year, starting after fixed_years. annual_changes pools the year-over-year changes
+    of all histories for callers that bootstrap changes.
+    """
+
+    def __init__(self, histories, fixed_years=5):
+        histories = np.asarray(histories, dtype=float)
+        num_histories, num_months = histories.shape
+        num_years = num_months // 12
+        if num_years <= fixed_years:
+            raise ValueError("Synthetic histories must be longer than the fixed-rate period")
+
+        annual_rates = histories[:, :num_years * 12].reshape(num_histories, num_years, 12).mean(axis=2)
+        self.histories = histories
+        self.index_scenarios = annual_rates[:, fixed_years:]
+        self.index_levels = None
+        self.current_index_rate = float(np.mean(histories[:, 0]))
+        self.annual_changes = np.diff(annual_rates, axis=1).ravel()
+
+        digest = hashlib.sha256()
+        digest.update(histories.tobytes())
+        digest.update(str(fixed_years).encode())
+        self.fingerprint = digest.hexdigest()
+
+    @classmethod
+    def generate(cls, num_histories, years, start_rate, fixed_years=5, seed=None, **parameters):
+        """Generate num_histories histories of years years starting at start_rate.
+        parameters are passed on to generate_rate_histories.
+        """
+        rng = np.random.default_rng(seed)
+        histories = generate_rate_histories(num_histories, years * 12, start_rate, rng=rng, **parameters)
+        return cls(histories, fixed_years)
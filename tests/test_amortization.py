@@ -0,0 +1,108 @@
+"""The closed-form yearly amortization matches the month-by-month reference loop."""
+import numpy as np
+import pytest
+
+import arm_kernels
+from arm_engine import (amortize_arm_horizons, amortize_arm_yearly, calculate_arm_cost_monthly,
+                        calculate_fixed_horizon_costs, calculate_fixed_payment, simulate_arm_rate_paths)
+
+PRINCIPAL = 300000
+
+
+@pytest.fixture(params=arm_kernels.available_backends())
+def backend(request):
+    selected = arm_kernels.get_backend()
+    arm_kernels.set_backend(request.param)
+    yield request.param
+    arm_kernels.set_backend(selected)
+
+
+def monthly_reference(monthly_rates):
+    return np.array([calculate_arm_cost_monthly(PRINCIPAL, np.repeat(rates, 12)) for rates in monthly_rates])
+
+
+def monthly_horizon_reference(rates_by_year, fixed_years=5):
+    """Paid after each year plus the balance left then, month by month as calculate_arm_cost_monthly."""
+    years = len(rates_by_year)
+    remaining_principal = PRINCIPAL
+    total_paid = 0
+    horizon_costs = []
+    for month, rate in enumerate(np.repeat(rates_by_year, 12)):
+        if month == 0 or month >= 12 * fixed_years and month % 12 == 0:
+            remaining_months = 12 * years - month
+            if rate == 0:
+                current_payment = remaining_principal / remaining_months
+            else:
+                growth = (1 + rate) ** remaining_months
+                current_payment = remaining_principal * rate * growth / (growth - 1)
+        remaining_principal -= min(current_payment - remaining_principal * rate, remaining_principal)
+        total_paid += current_payment
+        if remaining_principal < 0.01:
+            remaining_principal = 0
+        if month % 12 == 11:
+            horizon_costs.append(total_paid + remaining_principal)
+    return horizon_costs
+
+
+@pytest.mark.parametrize("years", [15, 30])
+def test_simulated_paths(backend, years):
+    changes = np.random.default_rng(3).normal(0, 1.5, 60)
+    annual_rates = simulate_arm_rate_paths(changes, 3.0, 6.25, 2.75, 2, 2, 5, years, 200, np.random.default_rng(3))
+    monthly_rates = annual_rates / 100 / 12
+
+    np.testing.assert_allclose(amortize_arm_yearly(PRINCIPAL, monthly_rates), monthly_reference(monthly_rates),
+                               rtol=1e-9)
+
+
+@pytest.mark.parametrize("years", [15, 30])
+def test_zero_rate_years(backend, years):
+    annual_rates = np.full((4, years), 6.0)
+    annual_rates[0] = 0                # Interest-free loan
+    annual_rates[1, :5] = 0            # Interest-free fixed period
+    annual_rates[2, 5:] = 0            # Interest-free after the first adjustment
+    annual_rates[3, 7:10] = 0          # Some interest-free years in between
+    monthly_rates = annual_rates / 100 / 12
+
+    np.testing.assert_allclose(amortize_arm_yearly(PRINCIPAL, monthly_rates), monthly_reference(monthly_rates),
+                               rtol=1e-9)
+
+
+@pytest.mark.parametrize("years", [15, 30])
+def test_early_payoff(backend, years):
+    # The payment is set at the high starting rate and only reset after the fixed
+    # period, so when the rate falls first the loan is paid off within the fixed
+    # period and the payments after it are zero
+    annual_rates = np.full((3, years), 60.0)
+    annual_rates[0, 1:] = 0
+    annual_rates[1, 1:] = 0.5
+    annual_rates[2, 2:5] = 0
+    monthly_rates = annual_rates / 100 / 12
+
+    costs = amortize_arm_yearly(PRINCIPAL, monthly_rates)
+    np.testing.assert_allclose(costs, monthly_reference(monthly_rates), rtol=1e-9)
+    np.testing.assert_allclose(costs, 60 * calculate_fixed_payment(PRINCIPAL, 60.0, years), rtol=1e-9)
+
+
+@pytest.mark.parametrize("years", [15, 30])
+def test_horizon_costs(backend, years):
+    changes = np.random.default_rng(5).normal(0, 1.5, 60)
+    annual_rates = simulate_arm_rate_paths(changes, 3.0, 6.25, 2.75, 2, 2, 5, years, 50, np.random.default_rng(5))
+    annual_rates[0, 7:10] = 0          # Interest-free years
+    annual_rates[1] = 60.0             # Paid off early once the rate falls
+    annual_rates[1, 1:] = 0.5
+    monthly_rates = annual_rates / 100 / 12
+
+    horizon_costs = amortize_arm_horizons(PRINCIPAL, monthly_rates)
+    assert horizon_costs.shape == (50, years)
+    # The cost over the full term is the total paid
+    np.testing.assert_array_equal(horizon_costs[:, -1], amortize_arm_yearly(PRINCIPAL, monthly_rates))
+    np.testing.assert_allclose(horizon_costs, [monthly_horizon_reference(rates) for rates in monthly_rates],
+                               rtol=1e-9)
+
+
+@pytest.mark.parametrize("years", [15, 30])
+def test_horizon_costs_at_a_constant_rate(backend, years):
+    # Recalculating the payment at an unchanged rate keeps it, so the ARM is the fixed-rate loan
+    monthly_rates = np.full((1, years), 6.75 / 100 / 12)
+    np.testing.assert_allclose(amortize_arm_horizons(PRINCIPAL, monthly_rates)[0],
+                               calculate_fixed_horizon_costs(PRINCIPAL, 6.75, years), rtol=1e-9)
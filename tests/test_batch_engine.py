@@ -0,0 +1,44 @@
+"""The batch engine reproduces the original one-path-at-a-time simulation."""
+import numpy as np
+import pytest
+
+import arm_kernels
+from arm_engine import calculate_arm_cost, calculate_arm_costs, simulate_arm_rate_paths, simulate_arm_rates
+from rate_data import HistoricalRateModel, embedded_historical_rates
+
+LOAN = (6.25, 2.75, 2, 2, 5)
+NUM_PATHS = 300
+
+
+@pytest.fixture(params=arm_kernels.available_backends())
+def backend(request):
+    selected = arm_kernels.get_backend()
+    arm_kernels.set_backend(request.param)
+    yield request.param
+    arm_kernels.set_backend(selected)
+
+
+def test_change_index_matches_resampled_data():
+    # The per-path loop resampled the data to annual means on every path
+    historical_rates = embedded_historical_rates()
+    annual_rates = historical_rates.set_index('date')['rate'].resample('YE').mean()
+    np.testing.assert_allclose(HistoricalRateModel(historical_rates).annual_changes,
+                               annual_rates.diff().dropna().to_numpy(), rtol=1e-12)
+
+
+@pytest.mark.parametrize("years", [15, 30])
+def test_paths_match_scalar_simulation(backend, years):
+    rate_model = HistoricalRateModel(embedded_historical_rates())
+
+    # Both draw the index changes of one path after another from the global random state
+    np.random.seed(8)
+    scalar = [simulate_arm_rates(rate_model, *LOAN, years) for _ in range(NUM_PATHS)]
+    np.random.seed(8)
+    annual_rates = simulate_arm_rate_paths(rate_model.annual_changes, rate_model.current_index_rate, *LOAN, years,
+                                           NUM_PATHS)
+
+    np.testing.assert_array_equal(annual_rates, [rates for _, rates in scalar])
+    np.testing.assert_allclose(calculate_arm_costs(300000, annual_rates),
+                               [calculate_arm_cost(300000, monthly_rates) for monthly_rates, _ in scalar], rtol=1e-9)
+    # The rate caps bind on some paths and not on others
+    assert 0 < np.mean(annual_rates[:, 5:] == LOAN[0] + LOAN[4]) < 1
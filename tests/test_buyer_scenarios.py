@@ -0,0 +1,96 @@
+"""The batch buyer analyses against the scalar formulas of the browser tools."""
+import numpy as np
+import pytest
+
+from buyer_scenarios import down_payment_vs_invest, extra_payment_vs_invest, points_vs_invest
+
+# Every return path earns 7% a year, so the investments are known exactly
+RETURNS = np.full((3, 30), 7.0)
+
+
+def payment(principal, annual_rate, years):
+    rate = annual_rate / 100 / 12
+    return principal * rate * (1 + rate) ** (12 * years) / ((1 + rate) ** (12 * years) - 1)
+
+
+def amortize(principal, annual_rate, monthly_payment, months):
+    """Balances after each month and the interest of each month, one loan at a time."""
+    balance, balances, interest = principal, [principal], []
+    for _ in range(months):
+        interest.append(balance * annual_rate / 100 / 12)
+        balance = balance + interest[-1] - monthly_payment
+        balance = 0 if balance < 0.01 else balance
+        balances.append(balance)
+    return balances, interest
+
+
+def test_points_match_scalar_values():
+    result = points_vs_invest(300000, 30, 6.5, 1.0, 0.25, [0, 2], [10, 5], RETURNS)
+
+    base_payment, reduced_payment = payment(300000, 6.5, 30), payment(300000, 6.0, 30)
+    savings = np.cumsum(np.subtract(amortize(300000, 6.5, base_payment, 60)[1],
+                                    amortize(300000, 6.0, reduced_payment, 60)[1]))
+    assert result['reduced_rate'].tolist() == [6.5, 6.0]
+    np.testing.assert_allclose(result['points_cost'], [0, 6000])
+    np.testing.assert_allclose(result['monthly_savings'], [0, base_payment - reduced_payment], atol=1e-9)
+    np.testing.assert_allclose(result['interest_savings'], [0, savings[-1]], atol=1e-6)
+    assert result['break_even_years'][0] == 0
+    assert result['break_even_years'][1] == (np.argmax(savings >= 6000) + 1) / 12
+    for name in ('investment_median', 'investment_p10', 'investment_p90'):
+        np.testing.assert_allclose(result[name], [0, 6000 * 1.07 ** 5], err_msg=name)
+    assert result['prob_investing_wins'].tolist() == [0, 100 * (6000 * 1.07 ** 5 > savings[-1])]
+
+
+def test_down_payment_matches_scalar_values():
+    house_price, years = 400000, 10
+    result = down_payment_vs_invest(house_price, 6.5, 30, years, 3.0, 1.5, 0, RETURNS)
+
+    house_value = house_price * 1.03 ** years
+    outlays, equity = [], []
+    for i, down_payment in enumerate((0.05, 0.10, 0.15, 0.20)):
+        loan = house_price * (1 - down_payment)
+        monthly_payment = payment(loan, 6.5, 30)
+        balances, _ = amortize(loan, 6.5, monthly_payment, 360)
+        pmi = loan * 0.015 / 12 if down_payment < 0.2 else 0
+        dropoff = next((month for month, balance in enumerate(balances)
+                        if balance / (house_price * 1.03 ** (month / 12)) <= 0.8), 360) if pmi else 0
+        assert result['monthly_payment'][0, i] == pytest.approx(monthly_payment, rel=1e-12)
+        assert result['monthly_pmi'][0, i] == pytest.approx(pmi, rel=1e-12)
+        assert result['pmi_dropoff_months'][0, i] == dropoff
+        outlays.append(12 * years * monthly_payment + pmi * min(dropoff, 12 * years))
+        equity.append(house_value - balances[12 * years])
+
+    net_worth = [equity[i] + outlays[-1] - outlays[i] + (0.2 - down_payment) * house_price * 1.07 ** years
+                 for i, down_payment in enumerate((0.05, 0.10, 0.15, 0.20))]
+    for name in ('net_worth_median', 'net_worth_p10', 'net_worth_p90'):
+        np.testing.assert_allclose(result[name][0], net_worth, rtol=1e-9, err_msg=name)
+    assert result['best_down_payment'][0] == (0.05, 0.10, 0.15, 0.20)[np.argmax(net_worth)]
+
+
+def test_extra_payment_matches_scalar_values():
+    result = extra_payment_vs_invest(300000, 6.5, [0, 500], RETURNS)
+
+    monthly_payment = payment(300000, 6.5, 30)
+    _, regular_interest = amortize(300000, 6.5, monthly_payment, 360)
+    balances, extra_interest = amortize(300000, 6.5, monthly_payment + 500, 360)
+    payoff_month = next(month for month, balance in enumerate(balances) if balance == 0)
+    growth = 1.07 ** (1 / 12)
+
+    # Contributions at the end of each month, grown to the end of the term
+    invested = sum(500 * growth ** (360 - month) for month in range(1, 361))
+    paid_off = sum((monthly_payment + 500) * growth ** (360 - month) for month in range(payoff_month + 1, 361))
+    np.testing.assert_allclose(result['monthly_payment'], monthly_payment, rtol=1e-12)
+    assert result['payoff_months'].tolist() == [360, payoff_month]
+    np.testing.assert_allclose(result['interest_saved'], [0, sum(regular_interest) - sum(extra_interest)],
+                               atol=1e-6)
+    for name in ('invest_median', 'invest_p05', 'invest_p95'):
+        np.testing.assert_allclose(result[name], [300000, 300000 + invested], rtol=1e-9, err_msg=name)
+    for name in ('payoff_median', 'payoff_p05', 'payoff_p95'):
+        np.testing.assert_allclose(result[name], [300000, 300000 + paid_off], rtol=1e-9, err_msg=name)
+    assert result['prob_investing_wins'].tolist() == [0, 100 * (invested > paid_off)]
+
+
+@pytest.mark.parametrize("planned_ownership", [0, -5, 1 / 24])
+def test_points_need_an_ownership_period(planned_ownership):
+    with pytest.raises(ValueError, match="at least one month"):
+        points_vs_invest(300000, 30, 6.5, 1.0, 0.25, [1, 2], [10, planned_ownership], RETURNS)
@@ -0,0 +1,50 @@
+"""The binary bundle of the embedded historical data."""
+import numpy as np
+import pandas as pd
+
+from data_bundle import (BUNDLE_ARRAYS, BUNDLE_PATH, DataBundle, build_bundle, current_sources, load_bundle,
+                         source_digest, write_bundle)
+from rate_data import EMBEDDED_GS1_DATA, HistoricalRateModel, embedded_historical_rates, resample_embedded_rates
+
+
+def test_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    # Odd lengths, so some arrays need padding to stay aligned
+    arrays = {name: (rng.integers(-1000, 1000, 7 + i) if dtype == '<i4' else rng.normal(size=3 + 2 * i))
+              for i, (name, dtype) in enumerate(BUNDLE_ARRAYS.items())}
+    arrays['gs1_point_changes'] = np.empty(0)
+    sources = {'gs1': source_digest([1, 2]), 'sp500': source_digest(b"returns")}
+    path = str(tmp_path / "bundle.bin")
+    write_bundle(path, arrays, sources)
+
+    bundle = DataBundle(path)
+    assert bundle.sources == sources
+    for name, dtype in BUNDLE_ARRAYS.items():
+        assert bundle[name].dtype == np.dtype(dtype)
+        np.testing.assert_array_equal(bundle[name], arrays[name], err_msg=name)
+    assert load_bundle(path, **sources) is not None
+    assert load_bundle(path, gs1=source_digest([1, 3])) is None
+
+
+def test_unreadable_bundles_are_ignored(tmp_path):
+    assert load_bundle(str(tmp_path / "missing.bin")) is None
+    path = tmp_path / "bundle.bin"
+    path.write_bytes(b"NOTABUNDLE" + bytes(100))
+    assert load_bundle(str(path)) is None
+
+
+def test_shipped_bundle_is_current(tmp_path):
+    assert load_bundle(BUNDLE_PATH, **current_sources()) is not None
+    rebuilt = DataBundle(build_bundle(str(tmp_path / "bundle.bin")))
+    shipped = DataBundle(BUNDLE_PATH)
+    for name in BUNDLE_ARRAYS:
+        np.testing.assert_array_equal(rebuilt[name], shipped[name], err_msg=name)
+
+
+def test_embedded_rates_from_the_bundle_match_resampling():
+    assert load_bundle(gs1=source_digest(EMBEDDED_GS1_DATA)) is not None
+    from_bundle = embedded_historical_rates()
+    resampled = resample_embedded_rates()
+    pd.testing.assert_frame_equal(from_bundle, resampled, check_exact=True)
+    # Results cached for either are found for the other
+    assert HistoricalRateModel(from_bundle).fingerprint == HistoricalRateModel(resampled).fingerprint
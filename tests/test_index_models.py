@@ -0,0 +1,45 @@
+"""The service simulates the ARM calculator page's rate model when asked to."""
+from http import HTTPStatus
+
+import numpy as np
+import pytest
+
+from arm_engine import simulate_arm_rate_paths
+from arm_service import HTTPError, SimulationService
+from rate_data import EMBEDDED_GS1_DATA, HistoricalLevelModel
+
+
+def page_arm_rates(levels, initial_rate, margin, initial_cap, annual_cap, lifetime_cap, years):
+    """simulateArmRates of mortgage-simulation-v2.js, with the sampled levels given."""
+    annual_rates = [initial_rate] * 5
+    last_arm_rate = initial_rate
+    for year in range(years - 5):
+        new_arm_rate = max(0.5, levels[year]) + margin
+        max_increase = initial_cap if year == 0 else annual_cap
+        new_arm_rate = min(new_arm_rate, last_arm_rate + max_increase, initial_rate + lifetime_cap)
+        annual_rates.append(max(new_arm_rate, 0.5))
+        last_arm_rate = new_arm_rate
+    return annual_rates
+
+
+def test_level_model_follows_the_page():
+    model = HistoricalLevelModel.embedded()
+    assert model.index_levels.tolist() == [rate for _, rate in EMBEDDED_GS1_DATA]
+
+    paths = simulate_arm_rate_paths(None, model.current_index_rate, 6.25, 2.75, 2, 2, 5, 30, 200,
+                                    np.random.default_rng(5), index_levels=model.index_levels)
+    levels = np.random.default_rng(5).choice(model.index_levels, size=(200, 25))
+    expected = [page_arm_rates(path_levels, 6.25, 2.75, 2, 2, 5, 30) for path_levels in levels]
+    np.testing.assert_allclose(paths, expected)
+
+
+def test_service_index_model_parameter():
+    service = SimulationService(HistoricalLevelModel.embedded(), 1)
+    try:
+        assert service.arm_parameters({})['index_model'] == "changes"
+        assert service.arm_parameters({'index_model': "levels"})['index_model'] == "levels"
+        with pytest.raises(HTTPError) as error:
+            service.arm_parameters({'index_model': "forecast"})
+        assert error.value.status == HTTPStatus.BAD_REQUEST
+    finally:
+        service.close()
@@ -0,0 +1,41 @@
+"""JSON written by the CLI and the local service must parse with a strict parser."""
+import json
+
+import pytest
+
+import arm_cli
+from arm_engine import (calculate_fixed_cost, calculate_fixed_horizon_costs, json_ready,
+                        run_arm_simulation_incremental)
+from arm_service import result_event, summary_event
+from rate_data import HistoricalRateModel, load_historical_rates
+
+
+def strict_loads(text):
+    def reject(constant):
+        raise ValueError(f"Invalid JSON constant {constant}")
+    return json.loads(text, parse_constant=reject)
+
+
+def test_cli_default_run_writes_valid_json(capsys):
+    # 1000 paths make fewer than two sampling blocks, so the block standard errors are undefined
+    assert arm_cli.main(["--json", "--data", "embedded", "--workers", "1", "--seed", "1", "--no-cache"]) == 0
+    convergence = strict_loads(capsys.readouterr().out)['convergence']
+
+    assert convergence['simulations_run'] == 1000
+    assert convergence['median_standard_error'] > 0
+    assert all(error is None for error in convergence['block_standard_errors'].values())
+    assert convergence['sampling_efficiency'] == {'arm_median': None, 'prob_arm_cheaper': None}
+
+
+@pytest.mark.parametrize("sampling", ["antithetic", "stratified"])
+def test_service_events_of_a_small_run_are_valid_json(sampling):
+    rate_model = HistoricalRateModel(load_historical_rates("embedded"))
+    fixed_cost = calculate_fixed_cost(300000, 6.75, 30)
+    run = run_arm_simulation_incremental(
+        fixed_cost, 300000, 30, 6.25, 2.75, 2, 2, 5, 1000, rate_model, seed=1, sampling=sampling,
+        fixed_horizon_costs=calculate_fixed_horizon_costs(300000, 6.75, 30))
+
+    partial = strict_loads(json.dumps(json_ready(summary_event(run.summary, sampling)), allow_nan=False))
+    result = strict_loads(json.dumps(json_ready(result_event(run, sampling)), allow_nan=False))
+    assert partial['median_standard_error'] is None and result['prob_standard_error'] is None
+    assert all(row['prob_standard_error'] is None for row in result['horizons'])
@@ -0,0 +1,58 @@
+"""The NumPy and Numba backends of arm_kernels give the same numbers."""
+import numpy as np
+import pytest
+
+import arm_kernels
+from arm_engine import (amortize_arm_adjoint, amortize_arm_horizons, amortize_arm_yearly, apply_arm_caps,
+                        sample_index_paths)
+from synthetic_rates import generate_rate_histories
+
+NUM_PATHS = 500
+YEARS = 30
+
+requires_numba = pytest.mark.skipif("numba" not in arm_kernels.available_backends(), reason="Numba is not installed")
+
+
+@pytest.fixture
+def backend():
+    selected = arm_kernels.get_backend()
+    yield arm_kernels.set_backend
+    arm_kernels.set_backend(selected)
+
+
+def kernel_outputs():
+    """The result of every kernel, through the arm_engine and synthetic_rates functions that call it."""
+    rng = np.random.default_rng(7)
+    changes = rng.normal(0, 1.5, 60)
+    index_paths = sample_index_paths(changes, 3.0, NUM_PATHS, YEARS, rng)
+    annual_rates = apply_arm_caps(index_paths, 6.25, 2.75, 2, 2, 5, YEARS)
+
+    monthly_rates = annual_rates / 100 / 12
+    # Zero-rate years on some paths
+    monthly_rates[::7, 5:9] = 0
+    yearly = amortize_arm_yearly(300000, monthly_rates)
+    horizons = amortize_arm_horizons(300000, monthly_rates)
+    cost, gradient = amortize_arm_adjoint(300000, monthly_rates)
+
+    histories = generate_rate_histories(100, YEARS * 12, 3.0, shock_probability=0.01, rng=np.random.default_rng(7))
+    return {
+        'floor_index_paths': index_paths,
+        'cap_arm_rates': annual_rates,
+        'amortize_yearly': yearly,
+        'amortize_horizons': horizons,
+        'amortize_adjoint': cost,
+        'amortize_adjoint_gradient': gradient,
+        'mean_reverting_rates': histories,
+    }
+
+
+@pytest.mark.parametrize("name", ["numpy", pytest.param("numba", marks=requires_numba)])
+def test_backends_agree(backend, name):
+    backend("numpy")
+    reference = kernel_outputs()
+    backend(name)
+    outputs = kernel_outputs()
+
+    assert outputs.keys() == reference.keys()
+    for kernel, expected in reference.items():
+        np.testing.assert_allclose(outputs[kernel], expected, rtol=1e-9, atol=1e-9, err_msg=kernel)
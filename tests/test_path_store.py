@@ -0,0 +1,56 @@
+"""Paths written to a store during a run, read back with PathStore."""
+import numpy as np
+import pytest
+
+import arm_cli
+from arm_engine import calculate_arm_cost, calculate_fixed_cost, run_arm_simulation_incremental
+from path_store import PathStore, create_path_store
+from rate_data import HistoricalRateModel, embedded_historical_rates
+
+LOAN = (300000, 30, 6.25, 2.75, 2, 2, 5)
+NUM_PATHS = 12000  # More than one chunk
+
+
+@pytest.fixture(scope="module")
+def stored_run(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("store"))
+    loan_amount, loan_term, arm_rate, arm_margin, initial_cap, annual_cap, lifetime_cap = LOAN
+    create_path_store(directory, NUM_PATHS, loan_term, loan_amount=loan_amount, fixed_rate=6.75, arm_rate=arm_rate,
+                      arm_margin=arm_margin, initial_cap=initial_cap, annual_cap=annual_cap,
+                      lifetime_cap=lifetime_cap, seed=5)
+    run = run_arm_simulation_incremental(
+        calculate_fixed_cost(loan_amount, 6.75, loan_term), *LOAN, NUM_PATHS,
+        HistoricalRateModel(embedded_historical_rates()), seed=5, store_directory=directory)
+    return directory, run
+
+
+def test_store_holds_every_path(stored_run):
+    directory, run = stored_run
+    store = PathStore(directory)
+    assert len(store) == NUM_PATHS and store.complete
+    assert store.loan_term == 30 and store.parameters['arm_rate'] == 6.25
+    assert store.rates.shape == (NUM_PATHS, 30) and store.balances.shape == (NUM_PATHS, 360)
+    np.testing.assert_array_equal(store.costs, run.arm_costs)
+    # The rate paths the run kept for plotting are among the stored ones
+    np.testing.assert_allclose(store.rates[::50], run.arm_rate_paths, rtol=1e-6)
+
+
+def test_schedules_match_scalar_costs(stored_run):
+    directory, _ = stored_run
+    store = PathStore(directory)
+    for path in np.random.default_rng(0).choice(NUM_PATHS, 20, replace=False):
+        rates, balances, payments = store.schedule(path)
+        cost = calculate_arm_cost(LOAN[0], np.repeat(rates, 12) / 100 / 12)
+        # Rates, balances and payments are stored as float32
+        assert store.costs[path] == pytest.approx(cost, rel=1e-5)
+        assert payments.sum() == pytest.approx(cost, rel=1e-5)
+        assert balances[-1] == pytest.approx(0, abs=0.05)
+        assert np.all(np.diff(balances) <= 0)
+
+
+def test_plot_from_store(stored_run):
+    pytest.importorskip("matplotlib")
+    directory, _ = stored_run
+    assert arm_cli.main(["--plot-store", directory]) == 0
+    with open(f"{directory}/{arm_cli.STORE_PLOT_FILE}", "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
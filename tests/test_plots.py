@@ -0,0 +1,35 @@
+"""The result figure is updated in place between runs."""
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")
+from matplotlib.backend_bases import ResizeEvent
+from matplotlib.figure import Figure
+
+from arm_engine import summarize_arm_costs
+from arm_plots import ComparisonFigure, PlotData
+
+
+def plot_data(loan_term, seed):
+    rng = np.random.default_rng(seed)
+    costs = rng.normal(700000, 80000, 5000)
+    rates = rng.uniform(4, 11, (100, loan_term))
+    return PlotData(690000, 6.75, 6.25, loan_term, summarize_arm_costs(690000, costs), rates, arm_costs=costs)
+
+
+def test_updates_reuse_the_legend_and_layout(monkeypatch):
+    fig = Figure(figsize=(10, 8))
+    plots = ComparisonFigure(fig)
+    layouts = []
+    monkeypatch.setattr(fig, 'tight_layout', lambda **kwargs: layouts.append(kwargs))
+    legend = plots.rates_ax.get_legend()
+
+    plots.update(plot_data(30, 0))
+    plots.update(plot_data(15, 1))
+    assert plots.title.get_text().startswith("15-Year Cost Comparison")
+    assert plots.rates_ax.get_legend() is legend
+    assert [text.get_text() for text in legend.get_texts()] == ['Median ARM Rate', 'Fixed Rate', '95% CI']
+    assert len(layouts) == 1
+
+    ResizeEvent('resize_event', fig.canvas)._process()
+    assert len(layouts) == 2
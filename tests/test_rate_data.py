@@ -0,0 +1,137 @@
+"""The FRED download cache of rate_data, against a local stand-in for the server."""
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import rate_data
+from rate_data import fetch_live_historical_rates, load_historical_rates
+
+GS1_CSV = "DATE,GS1\n2023-01-01,4.65\n2023-02-01,4.80\n2023-03-01,4.68\n"
+ETAG = '"gs1-v1"'
+LAST_MODIFIED = "Mon, 02 Jan 2023 00:00:00 GMT"
+
+# Short enough for the tests, long enough for a local server that answers at once
+TIMEOUT = 0.5
+
+
+class StandIn:
+    """What the stand-in server answers, and the headers of the requests it got."""
+
+    def __init__(self):
+        self.status = 200
+        self.delay = 0
+        self.requests = []
+
+
+@pytest.fixture
+def server():
+    stand_in = StandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stand_in.requests.append(dict(self.headers))
+            time.sleep(stand_in.delay)
+            if stand_in.status == 200 and self.headers.get('If-None-Match') == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(stand_in.status)
+            body = GS1_CSV.encode() if stand_in.status == 200 else b"Server error"
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", ETAG)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    stand_in.url = f"http://127.0.0.1:{httpd.server_address[1]}/fredgraph.csv?id=GS1"
+    yield stand_in
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetch(server, tmp_path):
+    return partial(fetch_live_historical_rates, url=server.url, timeout=TIMEOUT, cache_dir=str(tmp_path))
+
+
+def test_fresh_fetch_is_cached(server, fetch, tmp_path):
+    data, origin = fetch()
+    assert origin == 'network'
+    assert data['rate'].tolist() == [4.65, 4.80, 4.68]
+
+    cached, metadata = rate_data.read_cached_rates(str(tmp_path))
+    assert cached['rate'].tolist() == [4.65, 4.80, 4.68]
+    assert metadata['etag'] == ETAG and metadata['last_modified'] == LAST_MODIFIED
+
+    # Within the TTL the cache is used without a request
+    data, origin = fetch()
+    assert origin == 'cache' and len(server.requests) == 1
+
+
+def test_expired_cache_is_revalidated(server, fetch, tmp_path):
+    fetch()
+    _, before = rate_data.read_cached_rates(str(tmp_path))
+
+    data, origin = fetch(ttl=0)
+    assert origin == 'cache'
+    assert data['rate'].tolist() == [4.65, 4.80, 4.68]
+    assert server.requests[-1]['If-None-Match'] == ETAG
+    assert server.requests[-1]['If-Modified-Since'] == LAST_MODIFIED
+
+    # A 304 marks the cache as validated again
+    _, after = rate_data.read_cached_rates(str(tmp_path))
+    assert after['fetched_at'] > before['fetched_at']
+
+
+@pytest.mark.parametrize("status", [500, 503])
+def test_server_error_uses_stale_cache(server, fetch, status):
+    fetch()
+    server.status = status
+
+    data, origin = fetch(ttl=0)
+    assert origin == 'stale-cache'
+    assert data['rate'].tolist() == [4.65, 4.80, 4.68]
+
+
+def test_timeout_uses_stale_cache(server, fetch):
+    fetch()
+    server.delay = 2 * TIMEOUT
+
+    data, origin = fetch(ttl=0)
+    assert origin == 'stale-cache'
+    assert data['rate'].tolist() == [4.65, 4.80, 4.68]
+
+
+def test_server_error_without_cache(server, fetch):
+    server.status = 500
+    assert fetch() == (None, None)
+
+
+def test_timeout_without_cache_raises(server, fetch):
+    import requests
+
+    server.delay = 2 * TIMEOUT
+    with pytest.raises(requests.Timeout):
+        fetch()
+
+
+@pytest.mark.parametrize("status, delay", [(500, 0), (200, 2 * TIMEOUT)])
+def test_embedded_fallback_without_cache(server, fetch, monkeypatch, status, delay):
+    server.status, server.delay = status, delay
+    monkeypatch.setattr(rate_data, "fetch_live_historical_rates", fetch)
+
+    messages = []
+    data = load_historical_rates("live", status=messages.append)
+    assert messages[-1] == "Using embedded historical data. Ready to run simulation."
+    assert data.equals(rate_data.embedded_historical_rates())
@@ -0,0 +1,81 @@
+"""Keys and entries of the simulation result cache."""
+import numpy as np
+import pytest
+
+import result_cache
+from arm_engine import calculate_fixed_horizon_costs, run_arm_simulation_incremental
+from rate_data import HistoricalRateModel, embedded_historical_rates
+from result_cache import ResultCache, simulation_key
+
+INPUTS = (300000, 30, 6.5, 5.5, 2.75, 2, 1, 5, 10000)
+SETTINGS = {'median_tolerance': None, 'prob_tolerance': None, 'streaming': False, 'sampling': "random",
+            'sensitivities': False}
+
+
+def key(seed=42, data="data", **settings):
+    return simulation_key(*INPUTS, seed, data, **dict(SETTINGS, **settings))
+
+
+def test_key_covers_every_setting():
+    assert key() == key()
+    assert key() == simulation_key(300000.0, 30, 6.5, 5.5, 2.75, 2.0, 1.0, 5.0, 10000, 42, "data", **SETTINGS)
+    variants = [key(seed=43), key(seed=None), key(data="other"), key(median_tolerance=0.01),
+                key(prob_tolerance=0.01), key(streaming=True), key(sampling="sobol"), key(sensitivities=True)]
+    assert len({key(), *variants}) == len(variants) + 1
+
+
+LOAN = (300000, 30, 6.25, 2.75, 2, 2, 5)
+
+
+@pytest.fixture(scope="module")
+def rate_model():
+    return HistoricalRateModel(embedded_historical_rates())
+
+
+def run_key(rate_model, seed=4):
+    return simulation_key(300000, 30, 6.75, *LOAN[2:], 15000, seed, rate_model.fingerprint, **SETTINGS)
+
+
+def simulate(rate_model, seed=4):
+    fixed_horizon_costs = calculate_fixed_horizon_costs(300000, 6.75, 30)
+    return run_arm_simulation_incremental(fixed_horizon_costs[-1], *LOAN, 15000, rate_model, seed=seed,
+                                          fixed_horizon_costs=fixed_horizon_costs)
+
+
+def test_hit_matches_a_fresh_run(tmp_path, rate_model):
+    ResultCache(str(tmp_path)).put(run_key(rate_model), simulate(rate_model))
+
+    # A new cache reads the entry from disk
+    cached = ResultCache(str(tmp_path)).get(run_key(rate_model))
+    fresh = simulate(rate_model)
+    assert cached.stop_reason == fresh.stop_reason
+    assert cached.statistics() == fresh.statistics()
+    np.testing.assert_array_equal(cached.arm_costs, fresh.arm_costs)
+    np.testing.assert_array_equal(cached.arm_rate_paths, fresh.arm_rate_paths)
+    assert cached.summary.horizons.rows() == fresh.summary.horizons.rows()
+    cached_arrays, fresh_arrays = cached.summary.to_arrays(), fresh.summary.to_arrays()
+    assert cached_arrays.keys() == fresh_arrays.keys()
+    for name, values in fresh_arrays.items():
+        np.testing.assert_array_equal(cached_arrays[name], values, err_msg=name)
+
+
+def test_new_data_misses(tmp_path, rate_model):
+    cache = ResultCache(str(tmp_path))
+    cache.put(run_key(rate_model), simulate(rate_model))
+
+    # One revised month of data
+    historical_rates = embedded_historical_rates()
+    historical_rates.loc[len(historical_rates) - 1, 'rate'] += 0.01
+    revised = HistoricalRateModel(historical_rates)
+    assert revised.fingerprint != rate_model.fingerprint
+    assert cache.get(run_key(revised)) is None
+    assert ResultCache(str(tmp_path)).get(run_key(revised)) is None
+    assert cache.get(run_key(rate_model)) is not None
+
+
+def test_version_bump_misses(tmp_path, rate_model, monkeypatch):
+    ResultCache(str(tmp_path)).put(run_key(rate_model), simulate(rate_model))
+    assert ResultCache(str(tmp_path)).get(run_key(rate_model)) is not None
+
+    monkeypatch.setattr(result_cache, 'RESULT_CACHE_VERSION', result_cache.RESULT_CACHE_VERSION + 1)
+    assert ResultCache(str(tmp_path)).get(run_key(rate_model)) is None
@@ -0,0 +1,46 @@
+"""Pathwise cost derivatives against finite differences of the simulated mean cost."""
+import numpy as np
+import pytest
+
+from arm_engine import (SENSITIVITY_PARAMETERS, arm_rate_adjoints, calculate_fixed_cost,
+                        run_arm_simulation_incremental)
+from synthetic_rates import SyntheticRateModel
+
+PARAMETERS = {'loan_amount': 300000, 'loan_term': 30, 'arm_initial_rate': 6.25, 'arm_margin': 2.75,
+              'initial_cap': 2, 'annual_cap': 1, 'lifetime_cap': 5}
+NUM_PATHS = 20000
+# Small, so few paths cross a kink of the caps between the two runs
+STEP = 0.002
+
+
+@pytest.fixture(scope="module")
+def rate_model():
+    # Continuous index histories, so ties between the rate bounds have probability zero
+    return SyntheticRateModel.generate(2000, 30, 4.0, seed=11, volatility=1.5)
+
+
+def simulate(rate_model, sensitivities=False, **changes):
+    parameters = dict(PARAMETERS, **changes)
+    fixed_cost = calculate_fixed_cost(parameters['loan_amount'], 6.75, parameters['loan_term'])
+    return run_arm_simulation_incremental(fixed_cost, *parameters.values(), NUM_PATHS, rate_model, seed=3,
+                                          sensitivities=sensitivities).summary
+
+
+def test_means_match_central_differences(rate_model):
+    summary = simulate(rate_model, sensitivities=True)
+    means = summary.sensitivities.means()
+    for name, mean in zip(SENSITIVITY_PARAMETERS, means):
+        # The same seed draws the same index paths, whatever the parameters
+        up = simulate(rate_model, **{name: PARAMETERS[name] + STEP}).moments.mean
+        down = simulate(rate_model, **{name: PARAMETERS[name] - STEP}).moments.mean
+        assert mean == pytest.approx((up - down) / (2 * STEP), rel=1e-3, abs=1.0), name
+
+
+def test_ties_go_to_the_lifetime_cap_then_the_adjustment_cap():
+    # Year 6: index + margin equals the last rate + the initial cap (8).
+    # Year 7: the last rate + the annual cap equals the lifetime maximum (9).
+    rates = np.array([[6.0] * 5 + [8.0, 9.0, 7.0]])
+    derivatives = arm_rate_adjoints(rates, np.ones_like(rates), 6.0, 2, 1, 3, fixed_years=5)
+    initial, margin, first_cap, later_cap, lifetime = derivatives[:, 0]
+    assert (margin, first_cap, later_cap, lifetime) == (1, 1, 0, 1)
+    assert initial == 5 + 1 + 1  # The fixed years, year 6 through the cap and year 7 through the lifetime cap
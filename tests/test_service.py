@@ -0,0 +1,99 @@
+"""Request handling of the local simulation service."""
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from arm_service import HTTPError, SimulationService
+from rate_data import HistoricalLevelModel
+
+
+@pytest.fixture
+def service():
+    service = SimulationService(HistoricalLevelModel.embedded(), 1, token="launch-token")
+    yield service
+    service.close()
+
+
+def forbidden(service, method, headers):
+    with pytest.raises(HTTPError) as error:
+        service.check_access(method, headers)
+    return error.value.status == HTTPStatus.FORBIDDEN
+
+
+def test_access_from_localhost_pages(service):
+    assert service.check_access("POST", {'host': "127.0.0.1:8765"}) is None
+    assert service.check_access("POST", {'host': "localhost:8765", 'origin': "http://localhost:8000"}) == (
+        "http://localhost:8000")
+    assert forbidden(service, "POST", {'host': "127.0.0.1:8765", 'origin': "https://example.com"})
+    assert forbidden(service, "POST", {'host': "example.com", 'origin': "http://localhost:8000"})
+
+
+def test_null_origin_needs_the_token(service):
+    # Sandboxed frames and data: pages on any site have the origin null as well
+    assert forbidden(service, "POST", {'host': "127.0.0.1:8765", 'origin': "null"})
+    assert forbidden(service, "GET", {'host': "127.0.0.1:8765", 'origin': "null", 'x-service-token': "guess"})
+    assert service.check_access("POST", {'host': "127.0.0.1:8765", 'origin': "null",
+                                         'x-service-token': "launch-token"}) == "null"
+    # Preflights carry no custom headers, and only say which requests may follow
+    assert service.check_access("OPTIONS", {'host': "127.0.0.1:8765", 'origin': "null"}) == "null"
+
+
+def test_every_launch_has_its_own_token():
+    first = SimulationService(HistoricalLevelModel.embedded(), 1)
+    second = SimulationService(HistoricalLevelModel.embedded(), 1)
+    try:
+        assert first.token != second.token and len(first.token) >= 16
+    finally:
+        first.close()
+        second.close()
+
+
+@pytest.mark.parametrize("body, message", [
+    ({'paths': 0}, "paths must be"), ({'paths': -5}, "paths must be"), ({'paths': 10_000_000}, "paths must be"),
+    ({'block_length': 0}, "block_length must be"), ({'block_length': -1}, "block_length must be"),
+    ({'block_length': 1000}, "block_length must be"),
+    ({'returns': "bootstrap", 'paths': 100_000, 'loan_amount': list(range(1000, 2000))}, "profiles times paths"),
+])
+def test_scenario_limits(service, body, message):
+    with pytest.raises(HTTPError, match=message) as error:
+        asyncio.run(service.run_scenario("points", body))
+    assert error.value.status == HTTPStatus.BAD_REQUEST
+    # Refused before anything was submitted to the process pool
+    assert not service.scenarios
+
+
+class Writer:
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_handler_errors_are_answered(service, monkeypatch, capsys):
+    def broken():
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(service, 'health', broken)
+
+    async def request():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"GET /health HTTP/1.1\r\nHost: 127.0.0.1:8765\r\n\r\n")
+        reader.feed_eof()
+        writer = Writer()
+        await service.handle_connection(reader, writer)
+        return writer
+
+    writer = asyncio.run(request())
+    assert writer.data.startswith(b"HTTP/1.1 500 Internal Server Error\r\n")
+    assert writer.data.endswith(b'{"error": "Internal server error"}')
+    assert writer.closed
+    assert "RuntimeError: bug" in capsys.readouterr().err
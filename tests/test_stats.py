@@ -0,0 +1,82 @@
+"""Streaming statistics merged over chunks, against one pass and exact NumPy values."""
+import numpy as np
+import pytest
+
+from arm_sampling import SAMPLING_BLOCK_SIZE
+from arm_stats import FixedBinHistogram, RunningMoments, StreamingCostSummary
+
+FIXED_COST = 700000
+COST_LOW, COST_HIGH = 500000, 950000
+YEARS = 30
+PARAMETERS = ('arm_initial_rate', 'arm_margin')
+
+
+def simulated_values(num_paths, seed=0):
+    rng = np.random.default_rng(seed)
+    costs = np.clip(rng.normal(720000, 90000, num_paths), COST_LOW, COST_HIGH)
+    annual_rates = rng.uniform(4, 11, (num_paths, YEARS))
+    horizon_costs = costs[:, np.newaxis] * np.linspace(0.1, 1, YEARS)
+    derivatives = rng.normal(20000, 5000, (len(PARAMETERS), num_paths))
+    return costs, annual_rates, horizon_costs, derivatives
+
+
+def new_summary(seed=None):
+    return StreamingCostSummary(FIXED_COST, COST_LOW, COST_HIGH, seed=seed,
+                                fixed_horizon_costs=np.linspace(70000, FIXED_COST, YEARS),
+                                sensitivity_parameters=PARAMETERS)
+
+
+def test_merged_chunks_equal_one_pass():
+    costs, annual_rates, horizon_costs, derivatives = simulated_values(10 * SAMPLING_BLOCK_SIZE + 300)
+    one_pass = new_summary(seed=1)
+    one_pass.update(costs, annual_rates, horizon_costs, derivatives)
+
+    # Chunks of whole sampling blocks, as the engine makes them, except the last
+    bounds = np.array([0, 3, 4, 8, 10]) * SAMPLING_BLOCK_SIZE
+    merged = new_summary(seed=1)
+    for i, (start, end) in enumerate(zip(bounds, list(bounds[1:]) + [len(costs)])):
+        chunk = new_summary(seed=10 + i)
+        chunk.update(costs[start:end], annual_rates[start:end], horizon_costs[start:end], derivatives[:, start:end])
+        merged.merge(chunk)
+
+    expected, arrays = one_pass.to_arrays(), merged.to_arrays()
+    assert arrays.keys() == expected.keys()
+    # The reservoirs hold different but equally likely samples of the rate paths
+    del expected['reservoir_paths'], arrays['reservoir_paths']
+    for name, values in expected.items():
+        if values.dtype.kind in "iU":
+            np.testing.assert_array_equal(arrays[name], values, err_msg=name)
+        else:
+            np.testing.assert_allclose(arrays[name], values, rtol=1e-10, err_msg=name)
+    assert merged.rate_paths.paths.shape == one_pass.rate_paths.paths.shape
+    assert merged.summary() == pytest.approx(one_pass.summary(), rel=1e-12)
+
+
+def test_moments_match_numpy():
+    values = np.random.default_rng(2).lognormal(13, 0.2, 50001)
+    moments = RunningMoments()
+    for chunk in np.array_split(values, 7):
+        part = RunningMoments()
+        part.update(chunk)
+        moments.merge(part)
+    assert moments.count == len(values)
+    assert moments.mean == pytest.approx(np.mean(values), rel=1e-12)
+    assert moments.std == pytest.approx(np.std(values), rel=1e-10)
+    assert (moments.min, moments.max) == (values.min(), values.max())
+
+
+@pytest.mark.parametrize("num_values", [1, 2, 999, 100000])
+def test_histogram_quantiles_within_a_bin(num_values):
+    values = np.clip(np.random.default_rng(3).normal(720000, 90000, num_values), COST_LOW, COST_HIGH)
+    histogram = FixedBinHistogram(COST_LOW, COST_HIGH)
+    histogram.update(values)
+    bin_width = (COST_HIGH - COST_LOW) / len(histogram.counts)
+
+    # The quantile lies in the bin of the order statistic the empirical distribution puts there
+    for q in (0.025, 0.25, 0.5, 0.75, 0.975):
+        assert abs(histogram.quantile(q) - np.quantile(values, q, method="inverted_cdf")) <= bin_width, q
+    # With many paths the neighbouring order statistics are closer than a bin
+    if num_values >= 100000:
+        assert abs(histogram.quantile(0.5) - np.median(values)) <= bin_width
+        for q in (0.025, 0.25, 0.75, 0.975):
+            assert abs(histogram.quantile(q) - np.quantile(values, q)) <= bin_width, q
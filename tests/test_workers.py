@@ -0,0 +1,36 @@
+"""Runs with the same seed give the same results for any number of worker processes."""
+import numpy as np
+import pytest
+
+from arm_engine import calculate_fixed_cost, calculate_fixed_horizon_costs, run_arm_simulation_incremental
+from rate_data import HistoricalRateModel, embedded_historical_rates
+
+LOAN = (300000, 30, 6.25, 2.75, 2, 2, 5)
+NUM_PATHS = 25000  # Three chunks
+
+
+@pytest.fixture(scope="module")
+def rate_model():
+    return HistoricalRateModel(embedded_historical_rates())
+
+
+def simulate(rate_model, num_workers, **options):
+    fixed_cost = calculate_fixed_cost(300000, 6.75, 30)
+    return run_arm_simulation_incremental(fixed_cost, *LOAN, NUM_PATHS, rate_model, num_workers, seed=21,
+                                          fixed_horizon_costs=calculate_fixed_horizon_costs(300000, 6.75, 30),
+                                          sensitivities=True, **options)
+
+
+@pytest.mark.parametrize("options", [{}, {'streaming': True}, {'sampling': "antithetic"}])
+def test_one_and_two_workers_agree(rate_model, options):
+    one, two = simulate(rate_model, 1, **options), simulate(rate_model, 2, **options)
+
+    assert one.num_simulations == two.num_simulations == NUM_PATHS
+    if one.arm_costs is not None:
+        np.testing.assert_array_equal(one.arm_costs, two.arm_costs)
+    np.testing.assert_array_equal(one.arm_rate_paths, two.arm_rate_paths)
+    assert one.statistics() == two.statistics()
+    one_arrays, two_arrays = one.summary.to_arrays(), two.summary.to_arrays()
+    assert one_arrays.keys() == two_arrays.keys()
+    for name, values in one_arrays.items():
+        np.testing.assert_array_equal(values, two_arrays[name], err_msg=name)
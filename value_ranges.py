@@ -0,0 +1,18 @@
+"""Parsing of the swept parameter values given on the command lines of arm_sweep and buyer_scenarios."""
+import argparse
+
+import numpy as np
+
+
+def parse_values(text):
+    """Parse a sweep range: 'start:stop:step' (stop included), a comma-separated list, or one value."""
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        if step <= 0 or stop < start:
+            raise argparse.ArgumentTypeError(f"invalid range {text!r}")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        return [round(start + step * i, 10) for i in range(count)]
+    try:
+        return [float(part) for part in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid value list {text!r}")